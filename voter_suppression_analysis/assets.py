@@ -0,0 +1,392 @@
+''' CODE TO PROVIDE MAP GEOMETRY AND VEGA LIBRARIES WITHOUT A NETWORK '''
+
+import glob
+import json
+import os
+import re
+import shutil
+
+from voter_suppression_analysis import cache, processing
+from voter_suppression_analysis.lazy import lazy_import
+
+# imported on first use
+alt = lazy_import('altair')
+request = lazy_import('urllib.request')
+
+try:
+    altair_viewer = lazy_import('altair_viewer')
+except ImportError:
+    altair_viewer = None
+
+
+# pre-simplified US states TopoJSON shipped with the package, keyed by the
+# same Census IDs as processing.STATE_NUMS
+GEOMETRY_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'data',
+    'geo',
+    'us_states.json'
+)
+
+# TopoJSON object holding the state shapes
+GEOMETRY_OBJECT = 'states'
+
+# downloaded and re-quantized geometry
+GEOMETRY_CACHE_PATH = os.path.join(cache.CACHE_PATH, 'geo')
+
+# seconds to wait for a remote geometry source
+DOWNLOAD_TIMEOUT = 30
+
+# Vega libraries loaded by the dashboard page, by the Altair attribute
+# holding the version Altair uses
+VEGA_LIBRARIES = {
+    'vega': 'VEGA_VERSION',
+    'vega-lite': 'VEGALITE_VERSION',
+    'vega-embed': 'VEGAEMBED_VERSION'
+}
+
+# ways of shipping the libraries with an offline page
+OFFLINE_MODES = ['embed', 'sideload']
+
+# folder next to a side-loaded page holding the libraries
+VENDOR_DIR_NAME = 'vendor'
+
+
+def ring_area(arc_points, ring):
+    '''
+    Signed area of a TopoJSON ring, in grid units.
+
+    Args:
+        arc_points: list of lists of (x, y), absolute arc positions
+        ring: list of int, arc indices, negative (~i) for reversed arcs
+
+    Returns:
+        float, twice the signed area, 0 for a collapsed ring
+    '''
+
+    points = []
+
+    for index in ring:
+        arc = arc_points[index] if index >= 0 else arc_points[~index][::-1]
+        points.extend(arc[1:] if points else arc)
+
+    return sum(
+        x_one * y_two - x_two * y_one
+        for (x_one, y_one), (x_two, y_two) in zip(points, points[1:])
+    )
+
+
+def keep_rings(geometry, old_points, new_points):
+    '''
+    Drop rings of a geometry that collapsed or turned inside out on a
+    coarser grid, which renderers would otherwise fill across the globe.
+    Polygons losing their outer ring are dropped whole.
+
+    Args:
+        geometry: dict, TopoJSON geometry
+        old_points: list of lists of (x, y), arc positions before
+        new_points: list of lists of (x, y), arc positions after
+
+    Returns:
+        dict, geometry with valid rings only
+    '''
+
+    def valid(ring):
+        old_area = ring_area(old_points, ring)
+        new_area = ring_area(new_points, ring)
+        return new_area != 0 and (new_area > 0) == (old_area > 0)
+
+    def polygon_rings(rings):
+        if not rings or not valid(rings[0]):
+            return []
+        return [ring for ring in rings if valid(ring)]
+
+    geometry = dict(geometry)
+
+    if geometry.get('type') == 'GeometryCollection':
+        geometry['geometries'] = [
+            keep_rings(child, old_points, new_points)
+            for child in geometry['geometries']
+        ]
+    elif geometry.get('type') == 'Polygon':
+        geometry['arcs'] = polygon_rings(geometry['arcs'])
+    elif geometry.get('type') == 'MultiPolygon':
+        polygons = [polygon_rings(rings) for rings in geometry['arcs']]
+        geometry['arcs'] = [rings for rings in polygons if rings]
+
+    return geometry
+
+
+def quantize_topology(topology, quantization):
+    '''
+    Re-quantize a quantized TopoJSON topology onto a coarser grid, trading
+    fidelity for size. Points that fall onto the same grid cell as their
+    predecessor are dropped, as are rings too small for the new grid.
+
+    Args:
+        topology: dict, quantized TopoJSON topology (has a 'transform')
+        quantization: int, number of grid steps along each axis
+
+    Returns:
+        dict, new topology, the input is left unchanged
+    '''
+
+    if 'transform' not in topology:
+        raise ValueError('Topology must be quantized to re-quantize it.')
+
+    if quantization < 2:
+        raise ValueError('Quantization %s must be at least 2.' % quantization)
+
+    # decode delta-encoded arcs into absolute grid positions
+    old_points = []
+    for arc in topology['arcs']:
+        x_pos, y_pos, points = 0, 0, []
+
+        for x_delta, y_delta in arc:
+            x_pos += x_delta
+            y_pos += y_delta
+            points.append((x_pos, y_pos))
+
+        old_points.append(points)
+
+    x_max = max(max(x_pos for x_pos, _ in arc) for arc in old_points) or 1
+    y_max = max(max(y_pos for _, y_pos in arc) for arc in old_points) or 1
+
+    # grid steps shrink by the same ratio the coordinate extent is divided
+    x_ratio = (quantization - 1) / x_max
+    y_ratio = (quantization - 1) / y_max
+    x_scale, y_scale = topology['transform']['scale']
+
+    new_points = [
+        [(round(x_pos * x_ratio), round(y_pos * y_ratio))
+         for x_pos, y_pos in arc]
+        for arc in old_points
+    ]
+
+    # delta-encode again, arcs keep at least two points
+    new_arcs = []
+    for arc in new_points:
+        prev_x, prev_y, new_arc = 0, 0, []
+
+        for new_x, new_y in arc:
+            if new_arc and (new_x, new_y) == (prev_x, prev_y):
+                continue
+
+            new_arc.append([new_x - prev_x, new_y - prev_y])
+            prev_x, prev_y = new_x, new_y
+
+        if len(new_arc) < 2:
+            new_arc.append([0, 0])
+
+        new_arcs.append(new_arc)
+
+    new_topology = dict(topology)
+    new_topology['arcs'] = new_arcs
+    new_topology['transform'] = {
+        'scale': [x_scale / x_ratio, y_scale / y_ratio],
+        'translate': topology['transform']['translate']
+    }
+    new_topology['objects'] = {
+        name: keep_rings(geometry, old_points, new_points)
+        for name, geometry in topology['objects'].items()
+    }
+
+    return new_topology
+
+
+def write_json(file_path, content):
+    '''
+    Write JSON compactly, then rename, so readers never see a partial file.
+
+    Args:
+        file_path: str, destination
+        content: JSON-serializable object
+
+    No return value. File is written at file_path.
+    '''
+
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    tmp_path = file_path + '.tmp'
+
+    with open(tmp_path, 'w') as file:
+        json.dump(content, file, separators=(',', ':'))
+
+    os.replace(tmp_path, file_path)
+
+
+def fetch_geometry(url, cache_dir=GEOMETRY_CACHE_PATH):
+    '''
+    Download a remote TopoJSON file once, serving later calls from disk.
+
+    Args:
+        url: str, location of the TopoJSON file
+        cache_dir: str, cache directory
+
+    Returns:
+        str, path of the local copy
+    '''
+
+    file_path = os.path.join(cache_dir, cache.cache_key('url', url) + '.json')
+
+    if not os.path.isfile(file_path):
+        with request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+            topology = json.load(response)
+
+        write_json(file_path, topology)
+
+    return file_path
+
+
+def states_topology(precision=None, source=GEOMETRY_PATH,
+                    cache_dir=GEOMETRY_CACHE_PATH):
+    '''
+    Load US states geometry from a local file, or a URL that is downloaded
+    on first use, optionally re-quantized. Re-quantized versions are cached
+    by source content and precision.
+
+    Args:
+        precision: int, grid steps along each axis (e.g. 1000 for small and
+            coarse, 100000 for large and exact), None to keep the source's
+        source: str, TopoJSON file or URL with a 'states' object
+        cache_dir: str, cache directory
+
+    Returns:
+        dict, TopoJSON topology
+    '''
+
+    if re.match(r'https?://', source):
+        source = fetch_geometry(source, cache_dir)
+
+    if precision is None:
+        with open(source) as file:
+            return json.load(file)
+
+    key = cache.cache_key(
+        'geometry',
+        processing.file_digest(source),
+        str(int(precision))
+    )
+    file_path = os.path.join(cache_dir, key + '.json')
+
+    if not os.path.isfile(file_path):
+        with open(source) as file:
+            topology = quantize_topology(json.load(file), int(precision))
+
+        write_json(file_path, topology)
+        return topology
+
+    with open(file_path) as file:
+        return json.load(file)
+
+
+def geometry_data(topology):
+    '''
+    Wrap a topology as inline chart data. Altair stores inline data once at
+    the top of the spec, so every map of a dashboard shares one copy.
+
+    Args:
+        topology: dict, TopoJSON topology, see states_topology()
+
+    Returns:
+        altair.InlineData: state shapes for alt.Chart()
+    '''
+
+    return alt.InlineData(
+        values=topology,
+        format=alt.DataFormat(type='topojson', feature=GEOMETRY_OBJECT)
+    )
+
+
+def vendor_scripts():
+    '''
+    Find local copies of the Vega libraries, bundled with altair_viewer,
+    matching the versions Altair writes into pages.
+
+    Returns:
+        dict, library name to (version, file path)
+    '''
+
+    if altair_viewer is None:
+        raise ImportError('Offline pages need altair_viewer for the Vega '
+                          'libraries.')
+
+    package_dir = os.path.dirname(altair_viewer.__file__)
+    script_dir = os.path.join(package_dir, 'scripts')
+    scripts = {}
+
+    for name, version_attr in VEGA_LIBRARIES.items():
+        wanted = getattr(alt, version_attr)
+        found = []
+
+        for file_path in glob.glob(os.path.join(script_dir, name + '-*.js')):
+            version = os.path.basename(file_path)[len(name) + 1:-len('.js')]
+
+            if re.fullmatch(r'[\d.]+', version) and \
+                    (version + '.').startswith(wanted + '.'):
+                found.append((tuple(map(int, version.split('.'))), version,
+                              file_path))
+
+        if not found:
+            raise ValueError('No local %s %s library found.' % (name, wanted))
+
+        _, version, file_path = max(found)
+        scripts[name] = (version, file_path)
+
+    return scripts
+
+
+def save_html(spec, output_file_path, mode='embed'):
+    '''
+    Save a chart as an HTML page that needs no network to display: the Vega
+    libraries are either embedded in the page or copied next to it.
+
+    Args:
+        spec: dict, Vega-Lite spec, e.g. from chart.to_dict()
+        output_file_path: str, location at which to store HTML file
+        mode: str, 'embed' or 'sideload', see OFFLINE_MODES
+
+    No return value. HTML file (and libraries) are stored in provided path.
+    '''
+
+    if mode not in OFFLINE_MODES:
+        raise ValueError('Mode %s must be embed/sideload.' % mode)
+
+    scripts = vendor_scripts()
+    versions = {name: version for name, (version, _) in scripts.items()}
+    output_dir = os.path.dirname(output_file_path)
+
+    html = alt.utils.html.spec_to_html(
+        spec,
+        mode='vega-lite',
+        vega_version=versions['vega'],
+        vegalite_version=versions['vega-lite'],
+        vegaembed_version=versions['vega-embed'],
+        base_url=VENDOR_DIR_NAME
+    )
+
+    vendor_dir = os.path.join(output_dir, VENDOR_DIR_NAME)
+
+    for name, (version, file_path) in scripts.items():
+        script_name = '%s@%s' % (name, version)
+
+        if mode == 'sideload':
+            vendor_path = os.path.join(vendor_dir, script_name)
+            os.makedirs(vendor_dir, exist_ok=True)
+            shutil.copyfile(file_path, vendor_path)
+            continue
+
+        # inline the library in place of its script tag
+        with open(file_path, encoding='utf-8') as file:
+            script = file.read().replace('</script', '<\\/script')
+
+        tag = '<script type="text/javascript" src="%s/%s"></script>' % (
+            VENDOR_DIR_NAME,
+            script_name
+        )
+        html = html.replace(
+            tag,
+            '<script type="text/javascript">\n%s\n</script>' % script
+        )
+
+    with open(output_file_path, 'w', encoding='utf-8') as file:
+        file.write(html)
@@ -0,0 +1,398 @@
+''' CODE TO BENCHMARK THE PROCESSING AND CHART GENERATION PIPELINE '''
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# run as a script from the package folder
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath('..'))
+
+from voter_suppression_analysis import \
+    generate, instrument, processing, synthetic
+from voter_suppression_analysis.lazy import lazy_import
+
+# imported on first use
+pd = lazy_import('pandas')
+alt = lazy_import('altair')
+
+
+# benchmark results, with the baseline later runs are compared against
+BENCHMARK_PATH = os.path.join('data', 'benchmarks')
+BASELINE_PATH = os.path.join(BENCHMARK_PATH, 'baseline.json')
+
+# benchmarked pipeline stages, in pipeline order
+BENCHMARKS = [
+    'get_age_df', 'get_sexrace_df',
+    'combine_age_data', 'combine_sexrace_data',
+    'homogenize_age_data', 'homogenize_sexrace_data',
+    'generate_map', 'generate_chart', 'generate_html'
+]
+
+# synthetic input sizes, roughly as multiples of the rows of the real
+# inputs, split into (election years, sub-state areas per state, groups
+# beyond the Census layouts); areas inherit their state's laws, see
+# scale_laws(), and are processed as states, see run_suite()
+SCALES = {
+    10: (10, 8, 1),
+    100: (20, 44, 2),
+    1000: (50, 179, 4)
+}
+DEFAULT_SCALES = [10, 100]
+
+# seed of the synthetic inputs, so that every run measures the same data
+SCALE_SEED = 0
+
+
+def scale_laws(law_path, output_path, areas):
+    '''
+    Write a copy of a law table in which every sub-state area of the
+    synthetic inputs (e.g. 'ALABAMA COUNTY 2') has the laws of its state.
+    Areas then keep their laws through the law merge and the sexrace
+    pivot, as sub-state data would.
+
+    Args:
+        law_path: str, flat or time-versioned law table
+        output_path: str, destination of the copy
+        areas: int, sub-state areas per state
+
+    Returns:
+        str, output_path
+    '''
+
+    df_laws = pd.read_csv(law_path)
+    states = processing.normalize_states(df_laws['STATE'])
+    df_states = df_laws.loc[states != processing.NATIONAL_NAME]
+    state_names = states[df_states.index]
+
+    df_areas = [
+        df_states.assign(STATE=[synthetic.AREA_NAME % (name, num)
+                                for name in state_names])
+        for num in range(1, areas + 1)
+    ]
+
+    pd.concat([df_laws] + df_areas, ignore_index=True).to_csv(
+        output_path,
+        index=False
+    )
+
+    return output_path
+
+
+def scale_inputs(output_dir, scale, law_path=generate.DATA_PATH_LAW):
+    '''
+    Write synthetic inputs of one scale: Census-shaped year files of every
+    known state and group, each followed by its sub-state areas, plus
+    extra groups, see synthetic.write_synthetic_data(), and a law table
+    covering the areas. Processed inside processing.known_places() with
+    synthetic.area_places(), both streams keep the areas as states to the
+    end; the extra groups are dropped when homogenizing.
+
+    Args:
+        output_dir: str, folder receiving the inputs
+        scale: int, one of SCALES
+        law_path: str, law table the areas inherit from
+
+    Returns:
+        tuple of str, (age year files, sexrace year files) glob patterns
+        and the law table path
+    '''
+
+    if scale not in SCALES:
+        raise ValueError('Scale %s must be one of %s.' % (scale, list(SCALES)))
+
+    years, areas, extra_groups = SCALES[scale]
+    expressions = synthetic.write_synthetic_data(
+        output_dir,
+        years=years,
+        areas=areas,
+        extra_groups=extra_groups,
+        seed=SCALE_SEED
+    )
+
+    scaled_law_path = scale_laws(
+        law_path,
+        os.path.join(output_dir, os.path.basename(law_path)),
+        areas
+    )
+
+    return expressions['age'], expressions['sexrace'], scaled_law_path
+
+
+def measure(function, repeat=3):
+    '''
+    Time a call, keeping the best of several runs, and trace its peak
+    memory in one more run first. Tracing slows that run down, so it is
+    not timed. An untraced run goes before both, so that one-time costs
+    (imports, schema loading, warm caches) count in neither.
+
+    Args:
+        function: function, called without arguments
+        repeat: int, number of timed runs
+
+    Returns:
+        dict, {'seconds': best time, 'peak_mb': peak traced memory}
+    '''
+
+    if repeat < 1:
+        raise ValueError('Repeat %s must be at least 1.' % repeat)
+
+    # progress messages of the stages would drown the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+
+    return {'seconds': min(times), 'peak_mb': peak / 2 ** 20}
+
+
+def pipeline_calls(age_expression, sex_expression, law_path, output_dir):
+    '''
+    Build the benchmarked call of every stage on one set of inputs. Each
+    stage's inputs are prepared up front, so that a call times its own
+    stage only.
+
+    Args:
+        age_expression: str, glob pattern of the raw age year files
+        sex_expression: str, glob pattern of the raw sexrace year files
+        law_path: str, voter ID law file
+        output_dir: str, folder receiving the generated dashboard
+
+    Returns:
+        tuple, (dict, benchmark name (see BENCHMARKS) to function of no
+        arguments, dict, rows of each stream once combined and once
+        homogenized)
+    '''
+
+    age_paths = processing.sort_by_year(glob.glob(age_expression))
+    sex_paths = processing.sort_by_year(glob.glob(sex_expression))
+
+    df_age_raw = processing.combine_age_data(age_expression, law_path)
+    df_sex_raw = processing.combine_sexrace_data(sex_expression, law_path)
+    df_age = processing.homogenize_age_data(df_age_raw)
+    df_sex = processing.homogenize_sexrace_data(df_sex_raw)
+
+    output_path = os.path.join(output_dir, 'dashboard.html')
+    map_params = generate.FIGURE_PARAMS['voted']
+    chart_params = generate.FIGURE_PARAMS['sexrace']
+
+    def generate_map():
+        with alt.data_transformers.enable('default', max_rows=None):
+            return generate.generate_map(df_age, **map_params).to_dict()
+
+    def generate_chart():
+        with alt.data_transformers.enable('default', max_rows=None):
+            return generate.generate_chart(df_sex, **chart_params).to_dict()
+
+    rows = {
+        'age': {'combined': len(df_age_raw), 'homogenized': len(df_age)},
+        'sexrace': {'combined': len(df_sex_raw), 'homogenized': len(df_sex)}
+    }
+
+    calls = {
+        'get_age_df': lambda: [processing.get_age_df(path)
+                               for path in age_paths],
+        'get_sexrace_df': lambda: [processing.get_sexrace_df(path)
+                                   for path in sex_paths],
+        'combine_age_data': lambda: processing.combine_age_data(
+            age_expression, law_path
+        ),
+        'combine_sexrace_data': lambda: processing.combine_sexrace_data(
+            sex_expression, law_path
+        ),
+        'homogenize_age_data': lambda: processing.homogenize_age_data(
+            df_age_raw
+        ),
+        'homogenize_sexrace_data': lambda: processing.homogenize_sexrace_data(
+            df_sex_raw
+        ),
+        'generate_map': generate_map,
+        'generate_chart': generate_chart,
+        'generate_html': lambda: generate.generate_html(
+            df_age, df_sex, output_path
+        )
+    }
+
+    return calls, rows
+
+
+def run_suite(age_expression=generate.DATA_PATH_AGE,
+              sex_expression=generate.DATA_PATH_SEX,
+              law_path=generate.DATA_PATH_LAW,
+              scales=DEFAULT_SCALES, benchmarks=BENCHMARKS, repeat=3):
+    '''
+    Benchmark the pipeline on the real inputs, then on synthetic inputs of
+    each scale, see scale_inputs(). Synthetic inputs live in a temporary
+    folder, and their areas are known places throughout, so that every
+    stage down to the charts and maps works on them. The rows each input set holds once combined and homogenized
+    are kept with the results, as they show what a scale actually puts
+    through each stage.
+
+    Args:
+        age_expression: str, glob pattern of the raw age year files
+        sex_expression: str, glob pattern of the raw sexrace year files
+        law_path: str, voter ID law file
+        scales: list of int, synthetic input sizes, see SCALES
+        benchmarks: list of str, stages to run, see BENCHMARKS
+        repeat: int, number of timed runs of each stage
+
+    Returns:
+        dict, {'meta': instrument.run_metadata(), 'results': {scale label:
+        {benchmark name: measure() result}}, 'rows': {scale label: rows
+        per stream}}, labelled 'real', '10x', ...
+    '''
+
+    for name in benchmarks:
+        if name not in BENCHMARKS:
+            raise ValueError('Benchmark %s must be one of %s.' % (
+                name, BENCHMARKS
+            ))
+
+    results = {}
+    rows = {}
+    areas = max([SCALES[scale][1] for scale in scales], default=0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            processing.known_places(synthetic.area_places(areas)):
+        inputs = {'real': (age_expression, sex_expression, law_path)}
+
+        for scale in scales:
+            inputs['%dx' % scale] = scale_inputs(
+                os.path.join(tmp_dir, '%dx' % scale),
+                scale,
+                law_path
+            )
+
+        for label, (age_input, sex_input, law_input) in inputs.items():
+            calls, rows[label] = pipeline_calls(age_input, sex_input,
+                                                law_input, tmp_dir)
+            results[label] = {
+                name: measure(calls[name], repeat) for name in benchmarks
+            }
+
+    return {
+        'meta': instrument.run_metadata(),
+        'results': results,
+        'rows': rows
+    }
+
+
+def compare_results(results, baseline):
+    '''
+    Line up benchmark results with a baseline run.
+
+    Args:
+        results: dict, output of run_suite()
+        baseline: dict, earlier output of run_suite()
+
+    Returns:
+        pd.DataFrame, one row per scale and benchmark, with the baseline
+        columns empty where the baseline did not run them
+    '''
+
+    rows = []
+
+    for label, measures in results['results'].items():
+        for name, result in measures.items():
+            base = baseline.get('results', {}).get(label, {}).get(name, {})
+            rows.append({
+                'scale': label,
+                'benchmark': name,
+                'seconds': result['seconds'],
+                'baseline_seconds': base.get('seconds'),
+                'peak_mb': result['peak_mb'],
+                'baseline_peak_mb': base.get('peak_mb')
+            })
+
+    df_out = pd.DataFrame(rows).astype({
+        'baseline_seconds': float,
+        'baseline_peak_mb': float
+    })
+    df_out['ratio'] = df_out['seconds'] / df_out['baseline_seconds']
+
+    return df_out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--scales',
+        type=int,
+        nargs='*',
+        choices=list(SCALES),
+        default=DEFAULT_SCALES,
+        help='synthetic input sizes, roughly as multiples of the rows of '
+             'the real inputs'
+    )
+    parser.add_argument(
+        '--benchmarks',
+        nargs='+',
+        choices=BENCHMARKS,
+        default=BENCHMARKS,
+        help='pipeline stages to run'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='timed runs of each stage, the best is kept'
+    )
+    parser.add_argument(
+        '--baseline',
+        default=BASELINE_PATH,
+        help='earlier results to compare against'
+    )
+    parser.add_argument(
+        '--output',
+        default=None,
+        help='file to save the results to, e.g. the baseline'
+    )
+    args = parser.parse_args()
+
+    suite = run_suite(
+        scales=args.scales,
+        benchmarks=args.benchmarks,
+        repeat=args.repeat
+    )
+
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as file:
+            baseline_suite = json.load(file)
+    else:
+        baseline_suite = {}
+
+    with pd.option_context('display.width', 120,
+                           'display.float_format', '{:.3f}'.format):
+        print(compare_results(suite, baseline_suite).to_string(index=False))
+        print(pd.DataFrame({
+            (label, stream): counts
+            for label, streams in suite['rows'].items()
+            for stream, counts in streams.items()
+        }).to_string())
+
+    if args.output is not None:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+
+        with open(args.output, 'w') as file:
+            json.dump(suite, file, indent=2)
+            file.write('\n')
+
+        print('Benchmark results saved, location: %s.' % args.output)
@@ -0,0 +1,320 @@
+''' CODE TO CACHE CLEANED AND HOMOGENIZED DATA ON DISK '''
+
+import functools
+import glob
+import hashlib
+import json
+import os
+
+from voter_suppression_analysis import processing
+from voter_suppression_analysis.lazy import lazy_import
+
+# imported on first use
+pd = lazy_import('pandas')
+
+
+# default location of cached frames
+data_path = 'data'
+CACHE_PATH = os.path.join(data_path, 'cache')
+
+# supported on-disk formats and their file extensions
+CACHE_FORMATS = {
+    'feather': '.feather',
+    'parquet': '.parquet',
+    'pickle': '.pkl'
+}
+
+# format used for frames the columnar formats cannot represent
+FALLBACK_FORMAT = 'pickle'
+
+# bump to invalidate every entry when the cache layout itself changes
+CACHE_VERSION = '1'
+
+# per-stream loaders and homogenizers
+STREAMS = {
+    'age': (processing.get_age_df, processing.homogenize_age_data),
+    'sexrace': (processing.get_sexrace_df, processing.homogenize_sexrace_data)
+}
+
+
+def code_version():
+    '''
+    Identify the current processing code, so that editing any cleaning
+    or homogenizing step invalidates frames produced by older code.
+
+    Returns:
+        str, hex digest of the processing module source and cache version
+    '''
+
+    source_digest = processing.file_digest(processing.__file__)
+    return cache_key(CACHE_VERSION, source_digest)
+
+
+def cache_key(*parts):
+    '''
+    Combine any number of string parts into a single cache key.
+
+    Args:
+        parts: str, components identifying a cached frame
+
+    Returns:
+        str, hex SHA-256 digest of the joined parts
+    '''
+
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def frame_digest(df_in):
+    '''
+    Fingerprint the contents of a frame, so that derived results can be
+    cached by the data itself rather than by the files it came from.
+
+    Args:
+        df_in: pd.DataFrame, frame to fingerprint
+
+    Returns:
+        str, hex digest of the values, index, column names and dtypes
+    '''
+
+    row_hashes = pd.util.hash_pandas_object(df_in, index=True)
+    labels = repr([(str(col), str(dtype))
+                   for col, dtype in df_in.dtypes.items()])
+
+    return cache_key(
+        hashlib.sha256(row_hashes.values.tobytes()).hexdigest(),
+        labels
+    )
+
+
+def read_cached(cache_dir, key, fmt='feather'):
+    '''
+    Load a cached frame, checking the requested format and the fallback.
+
+    Args:
+        cache_dir: str, cache directory
+        key: str, cache key from cache_key()
+        fmt: str, preferred format, one of CACHE_FORMATS
+
+    Returns:
+        pd.DataFrame or None if nothing is cached under key
+    '''
+
+    readers = {
+        'feather': pd.read_feather,
+        'parquet': pd.read_parquet,
+        'pickle': pd.read_pickle
+    }
+
+    for curr_fmt in dict.fromkeys([fmt, FALLBACK_FORMAT]):
+        file_path = os.path.join(cache_dir, key + CACHE_FORMATS[curr_fmt])
+
+        if os.path.isfile(file_path):
+            return readers[curr_fmt](file_path)
+
+    return None
+
+
+def write_cached(cache_dir, key, df_in, fmt='feather'):
+    '''
+    Store a frame in the cache. Frames that the columnar formats cannot hold
+    exactly (mixed-type columns, non-default index) or a missing pyarrow
+    install fall back to pickle, so a cache hit always returns the same frame.
+
+    Args:
+        cache_dir: str, cache directory
+        key: str, cache key from cache_key()
+        df_in: pd.DataFrame, frame to store
+        fmt: str, preferred format, one of CACHE_FORMATS
+
+    No return value. Frame is written under cache_dir.
+    '''
+
+    if fmt not in CACHE_FORMATS:
+        raise ValueError('Format %s must be feather/parquet/pickle.' % fmt)
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    writers = {
+        'feather': df_in.to_feather,
+        'parquet': df_in.to_parquet,
+        'pickle': df_in.to_pickle
+    }
+
+    for curr_fmt in dict.fromkeys([fmt, FALLBACK_FORMAT]):
+        file_path = os.path.join(cache_dir, key + CACHE_FORMATS[curr_fmt])
+        tmp_path = file_path + '.tmp'
+
+        # write then rename, so readers never see a partial file
+        try:
+            writers[curr_fmt](tmp_path)
+        except (ImportError, TypeError, ValueError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            continue
+
+        os.replace(tmp_path, file_path)
+        return
+
+
+def cached_frame(cache_dir, key, builder, fmt='feather'):
+    '''
+    Return the frame cached under key, building and storing it on a miss.
+
+    Args:
+        cache_dir: str, cache directory
+        key: str, cache key from cache_key()
+        builder: function, no-argument callable producing the frame
+        fmt: str, preferred format, one of CACHE_FORMATS
+
+    Returns:
+        pd.DataFrame, cached or freshly built frame
+    '''
+
+    df_out = read_cached(cache_dir, key, fmt)
+
+    if df_out is None:
+        df_out = builder()
+        write_cached(cache_dir, key, df_out, fmt)
+
+    return df_out
+
+
+def read_spec(cache_dir, key):
+    '''
+    Load a cached chart spec.
+
+    Args:
+        cache_dir: str, cache directory
+        key: str, cache key from cache_key()
+
+    Returns:
+        dict, Vega-Lite spec or None if nothing is cached under key
+    '''
+
+    file_path = os.path.join(cache_dir, key + '.json')
+
+    if not os.path.isfile(file_path):
+        return None
+
+    with open(file_path) as file:
+        return json.load(file)
+
+
+def write_spec(cache_dir, key, spec):
+    '''
+    Store a chart spec in the cache. Specs are plain JSON, so they are
+    stored as such.
+
+    Args:
+        cache_dir: str, cache directory
+        key: str, cache key from cache_key()
+        spec: dict, Vega-Lite spec
+
+    No return value. Spec is written under cache_dir.
+    '''
+
+    os.makedirs(cache_dir, exist_ok=True)
+    file_path = os.path.join(cache_dir, key + '.json')
+    tmp_path = file_path + '.tmp'
+
+    # write then rename, so readers never see a partial file
+    with open(tmp_path, 'w') as file:
+        json.dump(spec, file, separators=(',', ':'))
+
+    os.replace(tmp_path, file_path)
+
+
+def load_cached_file(file_path, loader, cache_dir, fmt, version):
+    '''
+    Load a single year file through the cache. Module-level so that it can
+    be handed to a process pool via functools.partial.
+
+    Args:
+        file_path: str, year file to load
+        loader: function, get_age_df() or get_sexrace_df()
+        cache_dir: str, cache directory
+        fmt: str, preferred format, one of CACHE_FORMATS
+        version: str, code version from code_version()
+
+    Returns:
+        pd.DataFrame, processed data for that year
+    '''
+
+    key = cache_key(
+        'file',
+        loader.__name__,
+        version,
+        processing.file_digest(file_path)
+    )
+
+    return cached_frame(cache_dir, key, lambda: loader(file_path), fmt)
+
+
+def load_stream(stream, file_expression, law_filepath=processing.PATH_LAWS,
+                cache_dir=CACHE_PATH, fmt='feather', executor='serial',
+                max_workers=None, backend='pandas'):
+    '''
+    Combine and homogenize one data stream, reusing cached frames wherever
+    the inputs and processing code are unchanged. A changed year file only
+    re-parses that year before recombining; a changed law file re-runs the
+    law merge and homogenizing but none of the parsing.
+
+    Args:
+        stream: str, 'age' or 'sexrace'
+        file_expression: str, regex to capture desired year files
+        law_filepath: str, filepath to legislation data
+        cache_dir: str, cache directory
+        fmt: str, preferred format, one of CACHE_FORMATS
+        executor: str, 'serial', 'thread' or 'process' file loading
+        max_workers: int, pool size for threaded/process loading
+        backend: str, engine homogenizing with, see processing.BACKENDS;
+            every engine gives the same frame, so it shares cache entries
+
+    Returns:
+        pd.DataFrame, homogenized data for all years
+    '''
+
+    if stream not in STREAMS:
+        raise ValueError('Stream %s must be age/sexrace.' % stream)
+
+    loader, homogenize = STREAMS[stream]
+
+    # keys depend on the code version and every input file
+    file_paths = processing.sort_by_year(glob.glob(file_expression))
+    version = code_version()
+    digests = [processing.file_digest(file_path) for file_path in file_paths]
+
+    combined_key = cache_key(
+        stream,
+        'combined',
+        version,
+        processing.file_digest(law_filepath),
+        *digests
+    )
+
+    homogenized_key = cache_key(stream, 'homogenized', combined_key)
+
+    def build_combined():
+        cached_loader = functools.partial(
+            load_cached_file,
+            loader=loader,
+            cache_dir=cache_dir,
+            fmt=fmt,
+            version=version
+        )
+
+        df_list = processing.load_files(
+            file_paths,
+            cached_loader,
+            executor,
+            max_workers
+        )
+
+        combined = processing.concat_frames(df_list)
+        return processing.attach_laws(combined, law_filepath)
+
+    def build_homogenized():
+        combined = cached_frame(cache_dir, combined_key, build_combined, fmt)
+        return homogenize(combined, backend=backend)
+
+    return cached_frame(cache_dir, homogenized_key, build_homogenized, fmt)
@@ -1,14 +1,24 @@
 ''' CODE TO GENERATE VISUALIZATIONS '''
 
+import argparse
+import contextlib
+import functools
+import glob
+import hashlib
+import json
 import os
 import sys
 
-import pandas as pd
-import altair as alt
-from vega_datasets import data
+# run as a script from the package folder
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath('..'))
+
+from voter_suppression_analysis import assets, cache, instrument, processing
+from voter_suppression_analysis.lazy import lazy_import
 
-sys.path.insert(0, os.path.abspath('..'))
-from voter_suppression_analysis import processing
+# imported on first use, so that constants load without Altair or pandas
+pd = lazy_import('pandas')
+alt = lazy_import('altair')
 
 
 # data and visualization locations
@@ -22,6 +32,26 @@ DATA_PATH_LAW = os.path.join(data_path, 'clean', 'suppression.csv')
 #OUTPUT_FILE_PATH = 'figures/dashboard.html'
 OUTPUT_FILE_PATH = os.path.join('figures', 'dashboard.html')
 
+# suffix of the folder holding sidecar data files next to a dashboard
+SIDECAR_SUFFIX = '_data'
+
+# compiled figure specs, keyed by data fingerprint and figure parameters
+CHART_CACHE_PATH = os.path.join(cache.CACHE_PATH, 'charts')
+
+# keys only allowed at the top level of a Vega-Lite spec
+TOP_LEVEL_KEYS = ['$schema', 'config', 'datasets']
+
+# columns encoded, filtered on or shown by the scatter-bar charts
+CHART_COLUMNS = [
+    'STATE', 'Year', 'Group', 'Total', 'Total Registered', 'Total Voted',
+    'Percent Registered', 'Percent Voted', 'restrictive_id_laws'
+]
+
+# count and percent columns, and decimals kept for percents (0.01 points)
+COUNT_COLUMNS = ['Total', 'Total Registered', 'Total Voted']
+PERCENT_COLUMNS = ['Percent Registered', 'Percent Voted']
+PERCENT_DECIMALS = 4
+
 # fixed lists of interactive feature labels
 CATEGORIES_AGE = [
     'Total', '18 to 44', '45 to 65', '65+'
@@ -32,6 +62,45 @@ CATEGORIES_SEX = [
     'Asian & Pacific Islander', 'Hispanic'
 ]
 
+# parameters of every dashboard figure, maps are those with a map_type,
+# drawing the 'Total' group unless they name a map_group
+FIGURE_PARAMS = {
+    'age': {
+        'x': 'Percent Registered:Q',
+        'y': 'Percent Voted:Q',
+        'x_lbl': '% Registered',
+        'y_lbl': '% Voted',
+        'title': 'Age Groups',
+        'clr_setting': 'restrictive_id_laws:N',
+        'chart_type': 'age'
+    },
+    'sexrace': {
+        'x': 'Percent Registered:Q',
+        'y': 'Percent Voted:Q',
+        'x_lbl': '% Registered',
+        'y_lbl': '% Voted',
+        'title': 'Demographics',
+        'clr_setting': 'restrictive_id_laws:N',
+        'chart_type': 'sexrace'
+    },
+    'voted': {
+        'map_type': 'Percent Voted',
+        'map_title': '% Voted'
+    },
+    'registered': {
+        'map_type': 'Percent Registered',
+        'map_title': '% Registered'
+    }
+}
+
+# data stream drawn by each figure
+FIGURE_STREAMS = {
+    'age': 'age',
+    'sexrace': 'sexrace',
+    'voted': 'age',
+    'registered': 'age'
+}
+
 # useful constants for mapping
 GEOJSON_STATES_URL = ('https://raw.githubusercontent.com/'
                       'vega/vega/master/docs/data/us-10m.json')
@@ -43,104 +112,239 @@ COLOR_SCHEME = 'yellowgreenblue'
 START_YEAR = 2000
 END_YEAR = 2018
 
-# fixed dropdown objects and selection options
-DROPDOWN_OBJ_AGE = alt.binding_select(options=CATEGORIES_AGE)
-DROPDOWN_OBJ_SEX = alt.binding_select(options=CATEGORIES_SEX)
-
-# accompanying selection options
-SELECT_OBJ_AGE = alt.selection_single(
-    fields=['Group'],
-    bind=DROPDOWN_OBJ_AGE,
-    name='Age',
-    init={'Group':'Total'}
-)
-
-SELECT_OBJ_SEX = alt.selection_single(
-    fields=['Group'],
-    bind=DROPDOWN_OBJ_SEX,
-    name='Demographics',
-    init={'Group':'Total'}
-)
-
-# slider for year and accompanying selection options
-SLIDER = alt.binding_range(
-    min=START_YEAR,
-    max=END_YEAR,
-    step=2,
-    name='Election Year'
-)
-
-SELECT_OBJ_YR = alt.selection_single(
-    name='SelectorName',
-    fields=['Year'],
-    bind=SLIDER,
-    init={'Year':START_YEAR}
-)
-
-
-def generate_map(df_in, map_title, map_type):
-    '''
-    Generate US map for given voting or registration data.
+# names of the shared dropdown and slider selections
+SELECT_NAME_AGE = 'Age'
+SELECT_NAME_SEX = 'Demographics'
+SELECT_NAME_YR = 'SelectorName'
 
-    Args:
-        - df_in: pd.DataFrame, data to be mappd
-        - map_type: str, name of column in df_in to map (vote/reg)
-        - map_title: str
+
+@functools.lru_cache(maxsize=None)
+def selection_objects():
+    '''
+    Builds the fixed dropdown and slider objects, and their selections,
+    shared by all figures. They are built on first use rather than at
+    import, and are also available as module attributes of the same name
+    (e.g. generate.SELECT_OBJ_YR).
 
     Returns:
-        - altair.vegalite.v4.api.Chart: complete map visualization
+        - dict: object name ('DROPDOWN_OBJ_AGE', 'DROPDOWN_OBJ_SEX',
+          'SELECT_OBJ_AGE', 'SELECT_OBJ_SEX', 'SLIDER', 'SELECT_OBJ_YR')
+          to Altair object
     '''
-    df_copy = df_in.copy()
 
-    # establish relevant columns from data
-    pivot_columns = ['STATE', 'id', 'Group', 'Year']
-    kept_columns = pivot_columns + [map_type]
-    year_columns = [str(yr) for yr in range(START_YEAR, END_YEAR+1, 2)]
+    # fixed dropdown objects and selection options
+    dropdown_age = alt.binding_select(options=CATEGORIES_AGE)
+    dropdown_sex = alt.binding_select(options=CATEGORIES_SEX)
 
-    # perform pivot
-    df_pivot = df_copy[kept_columns].pivot_table(
-        index=['id', 'STATE', 'Group'],
-        columns='Year',
-        values=map_type
+    # accompanying selection options
+    select_age = alt.selection_single(
+        fields=['Group'],
+        bind=dropdown_age,
+        name=SELECT_NAME_AGE,
+        init={'Group':'Total'}
     )
 
-    # create map viz-ready DataFrame
-    df_map = df_pivot.reset_index()
-    df_map.columns = df_map.columns.astype(str)
+    select_sex = alt.selection_single(
+        fields=['Group'],
+        bind=dropdown_sex,
+        name=SELECT_NAME_SEX,
+        init={'Group':'Total'}
+    )
 
-    # Altair settings for US map
-    states = alt.topo_feature(data.us_10m.url, 'states')
-    states['url'] = GEOJSON_STATES_URL
+    # slider for year and accompanying selection options
+    slider = alt.binding_range(
+        min=START_YEAR,
+        max=END_YEAR,
+        step=2,
+        name='Election Year'
+    )
 
-    # create and return final map chart object
-    map_chart = alt.Chart(states).mark_geoshape(
-        stroke='black',
-        strokeWidth=0.05
+    select_yr = alt.selection_single(
+        name=SELECT_NAME_YR,
+        fields=['Year'],
+        bind=slider,
+        init={'Year':START_YEAR}
     )
 
-    # map-logistics args
-    projection = map_chart.project(type=MAP_PROJECTION)
-    scale = alt.Scale(domain=[0.2, .9], scheme=COLOR_SCHEME, type='linear')
-    lookup_idxs = df_map.loc[df_map.Group == 'Total']
-    lookup_data = alt.LookupData(lookup_idxs, 'id', ['STATE']+year_columns)
+    return {
+        'DROPDOWN_OBJ_AGE': dropdown_age,
+        'DROPDOWN_OBJ_SEX': dropdown_sex,
+        'SELECT_OBJ_AGE': select_age,
+        'SELECT_OBJ_SEX': select_sex,
+        'SLIDER': slider,
+        'SELECT_OBJ_YR': select_yr
+    }
 
-    # start manipulating map aesthetic
-    transform = projection.transform_lookup(
-        lookup='id',
-        from_=lookup_data
-    )
 
-    transform = transform.transform_fold(
-        year_columns,
-        as_=['Year', 'Percent']
-    )
+def __getattr__(name):
+    '''
+    Module attribute fallback, building selection objects on first use.
+    '''
 
-    transform = transform.transform_calculate(
-        Year='parseInt(datum.Year)',
-        Percent='isValid(datum.Percent) ? datum.Percent : -1'
+    if name in ('DROPDOWN_OBJ_AGE', 'DROPDOWN_OBJ_SEX', 'SELECT_OBJ_AGE',
+                'SELECT_OBJ_SEX', 'SLIDER', 'SELECT_OBJ_YR'):
+        return selection_objects()[name]
+
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def to_sidecar(data, data_dir, url_path):
+    '''
+    Write a dataset to its own compact JSON file, named by content hash,
+    and return a reference to it by URL. Datasets shared by several charts
+    are hence written only once. Called by externalize_datasets() on each
+    dataset of a compiled spec, as inline values.
+
+    Args:
+        - data: pd.DataFrame or dict of inline values, data to write
+        - data_dir: str, folder in which to write data files
+        - url_path: str, URL of data_dir relative to the dashboard
+
+    Returns:
+        - dict: Vega-Lite URL data reference
+    '''
+
+    values = alt.utils.data.to_values(data)['values']
+    data_json = json.dumps(values, separators=(',', ':'))
+    data_hash = hashlib.sha256(data_json.encode('utf-8')).hexdigest()[:16]
+
+    file_name = data_hash + '.json'
+    file_path = os.path.join(data_dir, file_name)
+
+    if not os.path.isfile(file_path):
+        os.makedirs(data_dir, exist_ok=True)
+        with open(file_path, 'w') as file:
+            file.write(data_json)
+
+    return {'url': url_path + '/' + file_name, 'format': {'type': 'json'}}
+
+
+def prepare_chart_data(df_in):
+    '''
+    Reduce homogenized data to what the scatter-bar charts draw: state
+    rows for every plotted year and group, the encoded columns only,
+    whole counts and rounded percents, sorted into per-year, per-group
+    slices. National rows and rows no selection can reach are dropped.
+
+    Args:
+        - df_in: pd.DataFrame, homogenized age or sexrace data
+
+    Returns:
+        - pd.DataFrame: chart-ready data
+    '''
+
+    kept = (df_in.STATE != processing.NATIONAL_NAME)
+    kept &= df_in.Year.notna() & df_in.Group.notna()
+
+    df_chart = df_in.loc[kept, CHART_COLUMNS]
+
+    counts = {col: df_chart[col].round().astype('Int64')
+              for col in COUNT_COLUMNS}
+    # 32-bit floats would serialize with noise digits even once rounded
+    percents = {col: df_chart[col].astype('float64').round(PERCENT_DECIMALS)
+                for col in PERCENT_COLUMNS}
+
+    df_chart = df_chart.assign(
+        Year=df_chart.Year.astype(int),
+        Group=df_chart.Group.astype(str),
+        **counts,
+        **percents
     )
 
-    # color and interactivity args
+    return df_chart.sort_values(['Year', 'Group'], kind='mergesort')
+
+
+def generate_maps(df_in, map_types, map_titles, geometry=None,
+                  map_groups=None):
+    '''
+    Generate US maps for several measures and groups of the same data, e.g.
+    voting and registration, or turnout of each demographic group. The data
+    is pivoted once into a single lookup table of every measure of every
+    group for every year, which all maps share, each picking the columns
+    of its own measure and group.
+
+    Args:
+        - df_in: pd.DataFrame, data to be mapped
+        - map_types: list of str, names of columns in df_in to map
+        - map_titles: list of str, one title per map
+        - geometry: altair data of state shapes, e.g. from
+          assets.geometry_data(), loaded from GEOJSON_STATES_URL if None
+        - map_groups: list of str, group of df_in each map draws, e.g.
+          'Female', all maps draw 'Total' if None
+
+    Returns:
+        - list of altair.vegalite.v4.api.Chart: one map per measure
+    '''
+
+    if map_groups is None:
+        map_groups = ['Total'] * len(map_types)
+
+    if not len(map_types) == len(map_titles) == len(map_groups):
+        raise ValueError('Map titles %s and groups %s must match map types '
+                         '%s.' % (map_titles, map_groups, map_types))
+
+    # establish relevant rows and columns from data, each map drawing one
+    # measure of one group
+    variants = list(dict.fromkeys(zip(map_types, map_groups)))
+    measures = list(dict.fromkeys(map_types))
+    year_columns = [str(yr) for yr in range(START_YEAR, END_YEAR+1, 2)]
+
+    df_kept = df_in.loc[
+        df_in.Group.isin(map_groups),
+        ['STATE', 'Year', 'Group'] + measures
+    ]
+
+    # map shapes are keyed on the state IDs from the shared state index
+    df_kept = df_kept.assign(id=processing.state_ids(df_kept['STATE']))
+
+    # perform single pivot of all measures and groups
+    with instrument.stage('pivot', len(df_kept), 'map lookup') as record:
+        df_pivot = df_kept.pivot_table(
+            index=['id', 'STATE'],
+            columns=['Group', 'Year'],
+            values=measures,
+            observed=True
+        )
+        record['rows_out'] = len(df_pivot)
+
+    # keep the measures of each group that a map draws
+    positions = {variant: pos for pos, variant in enumerate(variants)}
+    df_pivot = df_pivot.loc[:, [
+        (measure, group) in positions
+        for measure, group, _ in df_pivot.columns
+    ]]
+
+    # create map viz-ready DataFrame, one column per year and map variant,
+    # named '<year>_<variant position>': short, as names repeat in every
+    # row, and year first, so that the year can be parsed back from the name
+    df_pivot.columns = [
+        '%s_%d' % (year, positions[measure, group])
+        for measure, group, year in df_pivot.columns
+    ]
+
+    variant_fields = {
+        variant: ['%s_%d' % (year, pos) for year in year_columns]
+        for variant, pos in positions.items()
+    }
+
+    lookup_columns = ['id', 'STATE'] + [
+        field for fields in variant_fields.values() for field in fields
+    ]
+
+    df_lookup = df_pivot.reset_index().round(PERCENT_DECIMALS)
+    df_lookup = df_lookup.reindex(columns=lookup_columns)
+
+    # Altair settings for US map
+    if geometry is None:
+        states = alt.topo_feature(GEOJSON_STATES_URL, 'states')
+    else:
+        states = geometry
+
+    select_yr = selection_objects()['SELECT_OBJ_YR']
+
+    # color and interactivity args, the same for every map
+    scale = alt.Scale(domain=[0.2, .9], scheme=COLOR_SCHEME, type='linear')
+
     clr = alt.condition(
         'datum.Percent > 0',
         alt.Color('Percent:Q', scale=scale),
@@ -148,13 +352,66 @@ def generate_map(df_in, map_title, map_type):
     )
 
     tool = ['STATE:N', alt.Tooltip('Percent:Q', format='.0%')]
+    maps = []
+
+    for map_type, map_title, map_group in zip(map_types, map_titles,
+                                              map_groups):
+        fields = variant_fields[map_type, map_group]
+
+        # create final map chart object
+        map_chart = alt.Chart(states).mark_geoshape(
+            stroke='black',
+            strokeWidth=0.05
+        )
+
+        # map-logistics args, every map looks up the same dataset
+        projection = map_chart.project(type=MAP_PROJECTION)
+        lookup_fields = ['STATE'] + fields
+        lookup_data = alt.LookupData(df_lookup, 'id', lookup_fields)
+
+        # start manipulating map aesthetic
+        transform = projection.transform_lookup(
+            lookup='id',
+            from_=lookup_data
+        )
+
+        transform = transform.transform_fold(
+            fields,
+            as_=['Year', 'Percent']
+        )
+
+        transform = transform.transform_calculate(
+            Year='parseInt(datum.Year)',
+            Percent='isValid(datum.Percent) ? datum.Percent : -1'
+        )
+
+        # final customizations
+        encoding = transform.encode(tooltip=tool, color=clr)
+        encoding = encoding.add_selection(select_yr)
+        encoding = encoding.properties(title=map_title, width=415, height=200)
+        maps.append(encoding.transform_filter(select_yr))
+
+    return maps
+
+
+def generate_map(df_in, map_title, map_type, geometry=None,
+                 map_group='Total'):
+    '''
+    Generate US map for given voting or registration data.
 
-    # final customizations and finish
-    encoding = transform.encode(tooltip=tool, color=clr)
-    encoding = encoding.add_selection(SELECT_OBJ_YR)
-    encoding = encoding.properties(title=map_title, width=415, height=200)
-    filtered = encoding.transform_filter(SELECT_OBJ_YR)
-    return filtered
+    Args:
+        - df_in: pd.DataFrame, data to be mappd
+        - map_type: str, name of column in df_in to map (vote/reg)
+        - map_title: str
+        - geometry: altair data of state shapes, see generate_maps()
+        - map_group: str, group of df_in to map, e.g. 'Female'
+
+    Returns:
+        - altair.vegalite.v4.api.Chart: complete map visualization
+    '''
+
+    return generate_maps(df_in, [map_type], [map_title], geometry,
+                         [map_group])[0]
 
 
 def generate_chart(df_in, x, y, x_lbl, y_lbl, title, clr_setting, chart_type):
@@ -179,20 +436,26 @@ def generate_chart(df_in, x, y, x_lbl, y_lbl, title, clr_setting, chart_type):
 
     # set dropdown option based on type of chart to be plotted
     if chart_type == 'age':
-        dropdown_box = SELECT_OBJ_AGE
+        dropdown_box = selection_objects()['SELECT_OBJ_AGE']
     elif chart_type == 'sexrace':
-        dropdown_box = SELECT_OBJ_SEX
+        dropdown_box = selection_objects()['SELECT_OBJ_SEX']
     else:
         raise ValueError('Type %s must be age/sexrace.' % chart_type)
 
-    # interval highlighting on charts
-    highlight = alt.selection_interval(encodings=['x'])
+    # interval highlighting on charts, named per chart so that separately
+    # compiled (and cached) charts never share a selection name
+    highlight = alt.selection_interval(
+        encodings=['x'],
+        name=chart_type + '_highlight'
+    )
     color = alt.Color(clr_setting)
-    click = alt.selection_multi(encodings=['color'])
+    click = alt.selection_multi(
+        encodings=['color'],
+        name=chart_type + '_click'
+    )
 
-    # remove national numbers
-    copy = df_in.copy(deep=True)
-    copy = copy.loc[copy.STATE != 'NATIONAL']
+    # only send the rows and columns the charts draw
+    copy = prepare_chart_data(df_in)
 
     # scatter portion
     scatter = alt.Chart().mark_point()
@@ -223,8 +486,10 @@ def generate_chart(df_in, x, y, x_lbl, y_lbl, title, clr_setting, chart_type):
         tooltip=tools
     )
 
-    scatter = scatter.add_selection(SELECT_OBJ_YR)
-    scatter = scatter.transform_filter(SELECT_OBJ_YR)
+    select_yr = selection_objects()['SELECT_OBJ_YR']
+
+    scatter = scatter.add_selection(select_yr)
+    scatter = scatter.transform_filter(select_yr)
     scatter = scatter.add_selection(dropdown_box)
     scatter = scatter.transform_filter(dropdown_box)
     scatter = scatter.add_selection(highlight)
@@ -243,7 +508,7 @@ def generate_chart(df_in, x, y, x_lbl, y_lbl, title, clr_setting, chart_type):
     bars = alt.Chart().mark_bar()
     bars = bars.encode(x=x_var, y=y_var, color=clr)
     bars = bars.transform_filter(highlight)
-    bars = bars.transform_filter(SELECT_OBJ_YR)
+    bars = bars.transform_filter(select_yr)
     bars = bars.transform_filter(dropdown_box)
     bars = bars.properties(width=400, height=80)
     bars = bars.add_selection(click)
@@ -253,7 +518,308 @@ def generate_chart(df_in, x, y, x_lbl, y_lbl, title, clr_setting, chart_type):
     return chart
 
 
-def generate_html(df_age, df_sex, output_file_path):
+def generate_figures(figures, frames, geometry=None):
+    '''
+    Generates figures of the dashboard from their FIGURE_PARAMS. Maps of
+    the same data stream are built together, sharing one pivot and one
+    lookup dataset, see generate_maps().
+
+    Args:
+        - figures: list of str, figure names, from FIGURE_PARAMS
+        - frames: dict, stream name ('age', 'sexrace') to its data (cleaned)
+        - geometry: altair data of state shapes, see generate_maps()
+
+    Returns:
+        - dict: figure name to Altair chart, in the order of figures
+    '''
+
+    charts = {}
+    map_figures = {}
+
+    for figure in figures:
+        if figure not in FIGURE_PARAMS:
+            raise ValueError('Figure %s must be age/sexrace/voted/registered.'
+                             % figure)
+
+        params = FIGURE_PARAMS[figure]
+        stream = FIGURE_STREAMS[figure]
+
+        if 'map_type' in params:
+            map_figures.setdefault(stream, []).append(figure)
+        else:
+            charts[figure] = generate_chart(frames[stream], **params)
+
+    for stream, stream_figures in map_figures.items():
+        params = [FIGURE_PARAMS[figure] for figure in stream_figures]
+        maps = generate_maps(
+            frames[stream],
+            map_types=[map_params['map_type'] for map_params in params],
+            map_titles=[map_params['map_title'] for map_params in params],
+            geometry=geometry,
+            map_groups=[map_params.get('map_group', 'Total')
+                        for map_params in params]
+        )
+        charts.update(zip(stream_figures, maps))
+
+    return {figure: charts[figure] for figure in figures}
+
+
+def generate_charts(df_age, df_sex, geometry=None):
+    '''
+    Generates every figure of the dashboard, given compiled age and sexrace
+    data.
+
+    Args:
+        - df_age: pd.DataFrame, all years of age data (cleaned)
+        - df_sex: pd.DataFrame, all years of sexrace data (cleaned)
+        - geometry: altair data of state shapes, see generate_maps()
+
+    Returns:
+        - dict: figure name ('age', 'sexrace', 'voted', 'registered') to
+          Altair chart
+    '''
+
+    frames = {'age': df_age, 'sexrace': df_sex}
+    return generate_figures(list(FIGURE_PARAMS), frames, geometry)
+
+
+def spec_version():
+    '''
+    Identify the code compiling figure specs, so that editing it (or the
+    processing it relies on, or upgrading Altair) invalidates cached specs.
+
+    Returns:
+        - str: hex digest of this module, processing and the Altair version
+    '''
+
+    return cache.cache_key(
+        cache.CACHE_VERSION,
+        processing.file_digest(os.path.abspath(__file__)),
+        processing.file_digest(processing.__file__),
+        alt.__version__
+    )
+
+
+def generate_specs(df_age, df_sex, geometry=None, cache_dir=None):
+    '''
+    Compiles every figure of the dashboard to a Vega-Lite spec. Specs are
+    cached by a fingerprint of the figure's data stream, its parameters,
+    the map geometry and the code version, so that a change to one stream
+    only rebuilds the figures drawing it.
+
+    Args:
+        - df_age: pd.DataFrame, all years of age data (cleaned)
+        - df_sex: pd.DataFrame, all years of sexrace data (cleaned)
+        - geometry: altair data of state shapes, see generate_maps()
+        - cache_dir: str, spec cache directory (e.g. CHART_CACHE_PATH),
+          None to compile every figure
+
+    Returns:
+        - dict: figure name to Vega-Lite spec dict
+    '''
+
+    frames = {'age': df_age, 'sexrace': df_sex}
+    specs = dict.fromkeys(FIGURE_PARAMS)
+    keys = {}
+
+    if cache_dir is not None:
+        version = spec_version()
+        digests = {
+            stream: cache.frame_digest(df_in)
+            for stream, df_in in frames.items()
+        }
+
+        if geometry is None:
+            geometry_digest = GEOJSON_STATES_URL
+        else:
+            geometry_json = json.dumps(geometry.to_dict(), sort_keys=True)
+            geometry_digest = cache.cache_key(geometry_json)
+
+        for figure, params in FIGURE_PARAMS.items():
+            keys[figure] = cache.cache_key(
+                'spec',
+                figure,
+                version,
+                digests[FIGURE_STREAMS[figure]],
+                json.dumps(params, sort_keys=True),
+                geometry_digest if 'map_type' in params else ''
+            )
+            specs[figure] = cache.read_spec(cache_dir, keys[figure])
+
+    # compile the missing figures together, with inline data whatever
+    # transformer is active
+    missing = [figure for figure, spec in specs.items() if spec is None]
+
+    rows_in = sum(len(frames[FIGURE_STREAMS[figure]]) for figure in missing)
+
+    with alt.data_transformers.enable('default', max_rows=None), \
+            instrument.stage('chart build', rows_in, ', '.join(missing)) \
+            as record:
+        charts = generate_figures(missing, frames, geometry)
+
+        for figure, chart in charts.items():
+            specs[figure] = chart.to_dict()
+
+            if cache_dir is not None:
+                cache.write_spec(cache_dir, keys[figure], specs[figure])
+
+        # inline rows of the compiled figures
+        record['rows_out'] = sum(
+            len(values) for figure in missing
+            for values in specs[figure].get('datasets', {}).values()
+        )
+
+    return specs
+
+
+def concat_views(key, views):
+    '''
+    Concatenates views, moving data they all share up to the container, as
+    Altair does, so that it is written out once.
+
+    Args:
+        - key: str, 'hconcat' or 'vconcat'
+        - views: list of dict, Vega-Lite views
+
+    Returns:
+        - dict: concatenated view
+    '''
+
+    shared = views[0].get('data')
+
+    if shared is None or any(view.get('data') != shared for view in views):
+        return {key: views}
+
+    views = [{name: value for name, value in view.items() if name != 'data'}
+             for view in views]
+
+    return {key: views, 'data': shared}
+
+
+def compose_dashboard(specs):
+    '''
+    Lays out compiled figure specs as the dashboard: both scatter-bar
+    charts side by side, followed by the two maps one above the other.
+    Datasets of all figures are gathered at the top, as Altair does when
+    composing charts.
+
+    Args:
+        - specs: dict, figure name to Vega-Lite spec, see generate_specs()
+
+    Returns:
+        - dict: Vega-Lite spec of the dashboard
+    '''
+
+    views = {}
+    datasets = {}
+
+    for figure, spec in specs.items():
+        views[figure] = {key: value for key, value in spec.items()
+                         if key not in TOP_LEVEL_KEYS}
+        datasets.update(spec.get('datasets', {}))
+
+    dashboard = {
+        'config': specs['age']['config'],
+        'hconcat': [
+            views['age'],
+            views['sexrace'],
+            concat_views('vconcat', [views['voted'], views['registered']])
+        ],
+        '$schema': specs['age']['$schema']
+    }
+
+    if datasets:
+        dashboard['datasets'] = datasets
+
+    return dashboard
+
+
+def link_datasets(spec, references):
+    '''
+    Replaces the named datasets of a compiled spec by other data
+    references, e.g. URLs, pointing every use of a dataset at its
+    replacement.
+
+    Args:
+        - spec: dict, Vega-Lite spec with top-level datasets
+        - references: dict, dataset name to Vega-Lite data reference
+
+    Returns:
+        - dict: spec without the replaced datasets
+    '''
+
+    def relink(node):
+        if isinstance(node, list):
+            return [relink(value) for value in node]
+
+        if not isinstance(node, dict):
+            return node
+
+        if list(node) == ['name'] and node['name'] in references:
+            return references[node['name']]
+
+        return {key: relink(value) for key, value in node.items()}
+
+    linked = relink({key: value for key, value in spec.items()
+                     if key != 'datasets'})
+
+    datasets = {name: values for name, values
+                in spec.get('datasets', {}).items() if name not in references}
+
+    if datasets:
+        linked['datasets'] = datasets
+
+    return linked
+
+
+def externalize_datasets(spec, data_dir, url_path):
+    '''
+    Moves the datasets of a compiled spec to sidecar files, see
+    to_sidecar(), pointing every reference to them at the file's URL.
+
+    Args:
+        - spec: dict, Vega-Lite spec with top-level datasets
+        - data_dir: str, folder in which to write data files
+        - url_path: str, URL of data_dir relative to the dashboard
+
+    Returns:
+        - dict: spec without inline datasets
+    '''
+
+    urls = {
+        name: to_sidecar({'values': values}, data_dir, url_path)
+        for name, values in spec.get('datasets', {}).items()
+    }
+
+    return link_datasets(spec, urls)
+
+
+def save_spec(spec, output_file_path):
+    '''
+    Saves a compiled spec as an HTML page loading the Vega libraries from
+    the web, as Altair's chart.save() does.
+
+    Args:
+        - spec: dict, Vega-Lite spec
+        - output_file_path: str, location at which to store HTML file
+
+    No return value. HTML file is stored in provided path.
+    '''
+
+    html = alt.utils.html.spec_to_html(
+        spec,
+        mode='vega-lite',
+        vega_version=alt.VEGA_VERSION,
+        vegalite_version=alt.VEGALITE_VERSION,
+        vegaembed_version=alt.VEGAEMBED_VERSION
+    )
+
+    with open(output_file_path, 'w') as file:
+        file.write(html)
+
+
+def generate_html(df_age, df_sex, output_file_path, external_data=False,
+                  offline=None, precision=None, cache_dir=None):
     '''
     Generates HTML file containing dynamic compilation of all required
     figures, given compiled age and sexrace data and a destination.
@@ -262,62 +828,153 @@ def generate_html(df_age, df_sex, output_file_path):
         - df_age: pd.DataFrame, all years of age data (cleaned)
         - df_sex: pd.DataFrame, all years of sexrace data (cleaned)
         - output_file_path: str, location at which to store HTML file
+        - external_data: bool, whether to write datasets to sidecar files
+          in a folder next to the HTML file instead of inlining them;
+          browsers then need the dashboard served over HTTP
+        - offline: str, 'embed' or 'sideload' to bundle map geometry and
+          embed or copy the Vega libraries, None to load both from the web
+        - precision: int, grid steps of offline map geometry, see
+          assets.states_topology()
+        - cache_dir: str, spec cache directory, see generate_specs()
 
     No return value. HTML file is stored in provided path.
     '''
 
-    # generate maps for voting and registered populations
-    map_voted = generate_map(
-        df_age,
-        map_type='Percent Voted',
-        map_title='% Voted'
-    )
+    geometry = None
 
-    map_regis = generate_map(
-        df_age,
-        map_type='Percent Registered',
-        map_title='% Registered'
-    )
+    if offline is not None:
+        topology = assets.states_topology(precision)
+        geometry = assets.geometry_data(topology)
 
-    # generate scatter-bar chart of turnout + laws data for age, sexrace
-    chart_age = generate_chart(
-        df_in=df_age,
-        x='Percent Registered:Q',
-        y='Percent Voted:Q',
-        x_lbl='% Registered',
-        y_lbl='% Voted',
-        title='Age Groups',
-        clr_setting='restrictive_id_laws:N',
-        chart_type='age'
-    )
+    # compile (or reuse) every figure and combine
+    specs = generate_specs(df_age, df_sex, geometry, cache_dir)
+    dashboard = compose_dashboard(specs)
 
-    chart_sexrace = generate_chart(
-        df_in=df_sex,
-        x='Percent Registered:Q',
-        y='Percent Voted:Q',
-        x_lbl='% Registered',
-        y_lbl='% Voted',
-        title='Demographics',
-        clr_setting='restrictive_id_laws:N',
-        chart_type='sexrace'
-    )
+    if external_data:
+        # sidecar folder sits next to the HTML file, drop stale datasets
+        output_dir, output_name = os.path.split(output_file_path)
+        url_path = os.path.splitext(output_name)[0] + SIDECAR_SUFFIX
+        data_dir = os.path.join(output_dir, url_path)
+
+        for stale_path in glob.glob(os.path.join(data_dir, '*.json')):
+            os.remove(stale_path)
+
+        dashboard = externalize_datasets(dashboard, data_dir, url_path)
+
+    # write to file, finish
+    with instrument.stage('save', label=os.path.basename(output_file_path)):
+        if offline is None:
+            save_spec(dashboard, output_file_path)
+        else:
+            assets.save_html(dashboard, output_file_path, offline)
 
-    # combine and write to file, finish
-    dashboard = (chart_age | chart_sexrace) | (map_voted & map_regis)
-    dashboard.save(output_file_path)
     print('Dashboard generated, location: /%s.' % output_file_path)
 
 
 if __name__ == '__main__':
-    # temporarily suppress warning for deprecated pandas slice function
-    pd.options.mode.chained_assignment = None
-
-    # retrieve and process data
-    age_data = processing.combine_age_data(DATA_PATH_AGE, DATA_PATH_LAW)
-    sex_data = processing.combine_sexrace_data(DATA_PATH_SEX, DATA_PATH_LAW)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='keep processed data in compact dtypes'
+    )
+    parser.add_argument(
+        '--external-data',
+        action='store_true',
+        help='write datasets to sidecar files referenced by URL'
+    )
+    parser.add_argument(
+        '--offline',
+        choices=assets.OFFLINE_MODES,
+        default=None,
+        help='bundle map geometry and embed or side-load Vega libraries'
+    )
+    parser.add_argument(
+        '--precision',
+        type=int,
+        default=None,
+        help='grid steps of offline map geometry, e.g. 10000'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='process inputs a chunk of rows at a time, for inputs too '
+             'large for memory (skips the cache of processed data)'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=processing.CHUNK_SIZE,
+        help='rows read at a time with --stream'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=processing.BACKENDS,
+        default='pandas',
+        help='engine grouping rows while homogenizing, duckdb uses every '
+             'core (needs duckdb); engines give the same frames and share '
+             'the cache of processed data, so a cache hit runs neither, '
+             'and --stream groups its chunks with pandas'
+    )
+    parser.add_argument(
+        '--report',
+        default=None,
+        help='file to save a JSON report of the time and memory of each '
+             'build stage to, e.g. figures/build_report.json'
+    )
+    parser.add_argument(
+        '--profile',
+        default=None,
+        help='folder to save a cProfile file of each build stage to'
+    )
+    args = parser.parse_args()
 
-    df_age_cleaned = processing.homogenize_age_data(age_data)
-    df_sex_cleaned = processing.homogenize_sexrace_data(sex_data)
+    # streaming groups each chunk as it is read, with pandas only
+    if args.stream and args.backend != 'pandas':
+        parser.error('--stream runs on the pandas backend only, not %s.'
+                     % args.backend)
 
-    # generate output file and finish
-    generate_html(df_age_cleaned, df_sex_cleaned, OUTPUT_FILE_PATH)
+    # record the build stages when asked, stages served from the caches
+    # do not run and so are not recorded
+    if args.report is not None or args.profile is not None:
+        run_context = instrument.instrumented(args.profile)
+    else:
+        run_context = contextlib.nullcontext()
+
+    with run_context as run:
+        # retrieve and process data, chunk by chunk or reusing cached
+        # frames for unchanged inputs
+        if args.stream:
+            df_age_cleaned = processing.stream_age_data(
+                DATA_PATH_AGE, DATA_PATH_LAW, args.chunk_size
+            )
+            df_sex_cleaned = processing.stream_sexrace_data(
+                DATA_PATH_SEX, DATA_PATH_LAW, args.chunk_size
+            )
+        else:
+            df_age_cleaned = cache.load_stream('age', DATA_PATH_AGE,
+                                               DATA_PATH_LAW,
+                                               backend=args.backend)
+            df_sex_cleaned = cache.load_stream('sexrace', DATA_PATH_SEX,
+                                               DATA_PATH_LAW,
+                                               backend=args.backend)
+
+        if args.compact:
+            df_age_cleaned = processing.compact_frame(df_age_cleaned)
+            df_sex_cleaned = processing.compact_frame(df_sex_cleaned)
+
+        # generate output file and finish
+        generate_html(
+            df_age_cleaned,
+            df_sex_cleaned,
+            OUTPUT_FILE_PATH,
+            external_data=args.external_data,
+            offline=args.offline,
+            precision=args.precision,
+            cache_dir=CHART_CACHE_PATH
+        )
+
+    if run is not None:
+        report_path = args.report or os.path.join(args.profile, 'report.json')
+        instrument.write_report(run.report(), report_path)
+        print('Build report saved, location: %s.' % report_path)
@@ -0,0 +1,363 @@
+''' CODE TO TIME AND MEASURE THE STAGES OF A DASHBOARD BUILD '''
+
+import contextlib
+import cProfile
+import functools
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# instrumented stages of a build, in pipeline order
+STAGES = [
+    'load', 'clean', 'concat', 'law merge', 'homogenize', 'pivot',
+    'chart build', 'save'
+]
+
+# bytes per megabyte, and per unit of resource.getrusage() peak RSS
+MEGABYTE = 2 ** 20
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+# run being recorded, None while instrumentation is off
+ACTIVE_RUN = None
+
+
+class StageRun:
+    '''
+    Records of the stages of one instrumented run, see instrumented().
+    Each thread keeps its own stack of open stages, so that stages run in
+    a thread pool are recorded too. Only stages of the main thread measure
+    traced memory: tracemalloc keeps a single peak for the whole process,
+    which a stage resets as it starts. The figures of a main thread stage
+    include what worker threads allocate meanwhile. Stages run in other
+    processes are not recorded.
+
+    Args:
+        profile_dir: str, folder receiving a cProfile file per stage, None
+            to not profile
+        trace_memory: bool, whether to trace memory with tracemalloc
+    '''
+
+    def __init__(self, profile_dir=None, trace_memory=True):
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.records = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.start = time.perf_counter()
+
+    def stack(self):
+        '''
+        list of dict, open stages of the calling thread, innermost last
+        '''
+
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+
+        return self.local.stack
+
+    def add(self, record):
+        '''
+        Keep the record of a finished stage, numbering it.
+
+        Args:
+            record: dict, stage record, see stage()
+
+        Returns:
+            int, number of records kept so far
+        '''
+
+        with self.lock:
+            self.records.append(record)
+            return len(self.records)
+
+    def report(self):
+        '''
+        Build the run report: stage records in order of their start, and
+        totals per stage. Nested stages (e.g. a pivot while homogenizing)
+        count in their own totals and in those of the enclosing stage.
+
+        Returns:
+            dict, {'meta': run_metadata(), 'stages': list of records,
+            'totals': {stage: calls, seconds, rows in and out, peak MB}}
+        '''
+
+        records = sorted(self.records, key=lambda record: record['started'])
+        totals = {}
+
+        for record in records:
+            total = totals.setdefault(record['stage'], {
+                'calls': 0, 'seconds': 0.0, 'rows_in': 0, 'rows_out': 0,
+                'peak_mb': None
+            })
+            total['calls'] += 1
+            total['seconds'] += record['seconds']
+            total['rows_in'] += record['rows_in'] or 0
+            total['rows_out'] += record['rows_out'] or 0
+
+            if record.get('peak_mb') is not None:
+                total['peak_mb'] = max(total['peak_mb'] or 0,
+                                       record['peak_mb'])
+
+        return {
+            'meta': run_metadata(),
+            'stages': records,
+            'totals': {name: totals[name] for name in STAGES
+                       if name in totals}
+        }
+
+
+def run_metadata():
+    '''
+    Describe the code and machine a run or benchmark used, so that results
+    of different commits can be told apart.
+
+    Returns:
+        dict, commit, date, platform and library versions
+    '''
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    meta = {
+        'commit': commit,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'python': platform.python_version()
+    }
+
+    # versions of the libraries the run has loaded
+    for name in ['pandas', 'altair']:
+        if name in sys.modules:
+            meta[name] = sys.modules[name].__version__
+
+    return meta
+
+
+def peak_rss_mb():
+    '''
+    Peak resident memory of the process so far.
+
+    Returns:
+        float, megabytes, None where the platform does not report it
+    '''
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak * RSS_UNIT / MEGABYTE
+
+
+@contextlib.contextmanager
+def instrumented(profile_dir=None, trace_memory=True):
+    '''
+    Record every stage run inside the block, see stage(). Instrumentation
+    is off otherwise, and stages then cost next to nothing. Only stages of
+    this process are recorded: with the 'process' executor of
+    processing.load_files(), loading and cleaning run in worker processes
+    and are missing from the report, which load_files() warns about.
+
+    Args:
+        profile_dir: str, folder receiving a cProfile file per stage, None
+            to not profile
+        trace_memory: bool, whether to trace memory with tracemalloc,
+            which slows the run down
+
+    Yields:
+        StageRun, whose report() describes the run once the block ends
+    '''
+
+    global ACTIVE_RUN
+
+    if ACTIVE_RUN is not None:
+        raise ValueError('Instrumentation must not be nested.')
+
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+
+    run = StageRun(profile_dir, trace_memory)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+
+    if started_tracing:
+        tracemalloc.start()
+
+    ACTIVE_RUN = run
+
+    try:
+        yield run
+    finally:
+        ACTIVE_RUN = None
+
+        if started_tracing:
+            tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def stage(name, rows_in=None, label=None):
+    '''
+    Time a stage of the build, and measure its memory, when an instrumented
+    run is recording. Memory is the peak traced above the stage's start,
+    and the peak RSS of the process at its end. Stages of other threads
+    than the main one leave the traced peak out, see StageRun. A profile of
+    the stage leaves out the stages nested in it, which have their own.
+
+    Args:
+        name: str, one of STAGES
+        rows_in: int, rows the stage receives
+        label: str, what the stage works on, e.g. a file name
+
+    Yields:
+        dict, record of the stage, set its 'rows_out' before the block ends
+    '''
+
+    run = ACTIVE_RUN
+
+    if run is None:
+        yield {}
+        return
+
+    if name not in STAGES:
+        raise ValueError('Stage %s must be one of %s.' % (name, STAGES))
+
+    record = {
+        'stage': name,
+        'label': label,
+        'rows_in': rows_in,
+        'rows_out': None
+    }
+
+    stack = run.stack()
+    parent = stack[-1] if stack else None
+    frame = {'profiler': None}
+    trace_memory = (run.trace_memory and
+                    threading.current_thread() is threading.main_thread())
+
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+
+        if parent is not None:
+            parent['peak'] = max(parent['peak'], peak)
+
+        tracemalloc.reset_peak()
+        frame['start'] = frame['peak'] = current
+
+    if run.profile_dir is not None:
+        if parent is not None:
+            parent['profiler'].disable()
+
+        frame['profiler'] = cProfile.Profile()
+        frame['profiler'].enable()
+
+    stack.append(frame)
+    start = time.perf_counter()
+
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+
+        record['started'] = start - run.start
+        record['seconds'] = seconds
+        record['depth'] = len(stack)
+
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            frame['peak'] = max(frame['peak'], peak)
+            record['peak_mb'] = (frame['peak'] - frame['start']) / MEGABYTE
+
+            if parent is not None:
+                parent['peak'] = max(parent['peak'], frame['peak'])
+
+        record['peak_rss_mb'] = peak_rss_mb()
+
+        if frame['profiler'] is not None:
+            frame['profiler'].disable()
+
+        number = run.add(record)
+
+        if frame['profiler'] is not None:
+            record['profile'] = os.path.join(
+                run.profile_dir,
+                '%03d_%s.prof' % (number, name.replace(' ', '_'))
+            )
+            frame['profiler'].dump_stats(record['profile'])
+
+            if parent is not None:
+                parent['profiler'].enable()
+
+
+def staged(name):
+    '''
+    Record every call of a function as a stage, see stage(), counting rows
+    in its first argument, positional or keyword, and in its result.
+
+    Args:
+        name: str, one of STAGES
+
+    Returns:
+        function, decorator
+    '''
+
+    def decorate(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if ACTIVE_RUN is None:
+                return function(*args, **kwargs)
+
+            if args:
+                df_in = args[0]
+            else:
+                bound = signature.bind(*args, **kwargs)
+                df_in = next(iter(bound.arguments.values()))
+
+            with stage(name, len(df_in), function.__name__) as record:
+                result = function(*args, **kwargs)
+                record['rows_out'] = len(result)
+
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def write_report(report, file_path):
+    '''
+    Save a run report as JSON.
+
+    Args:
+        report: dict, see StageRun.report()
+        file_path: str, destination
+
+    No return value. Report is written at file_path.
+    '''
+
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+
+    with open(file_path, 'w') as file:
+        json.dump(report, file, indent=2)
+        file.write('\n')
@@ -0,0 +1,53 @@
+''' CODE TO DEFER IMPORTING HEAVY DEPENDENCIES UNTIL FIRST USE '''
+
+import importlib
+import importlib.util
+
+
+class LazyModule:
+    '''
+    Stand-in for a module, which is imported on first attribute access, so
+    that importing this package stays fast for callers who never use it.
+    Imports go through the regular (locked) import system, so first use
+    from several threads at once is safe.
+
+    Args:
+        name: str, full module name, e.g. 'pandas'
+    '''
+
+    def __init__(self, name):
+        self.__dict__['_module_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attr):
+        module = self.__dict__['_module']
+
+        if module is None:
+            module = importlib.import_module(self._module_name)
+            self.__dict__['_module'] = module
+
+        return getattr(module, attr)
+
+    def __setattr__(self, attr, value):
+        setattr(importlib.import_module(self._module_name), attr, value)
+
+    def __repr__(self):
+        return '<lazy module %r>' % self._module_name
+
+
+def lazy_import(name):
+    '''
+    Import a module on first use. Missing modules still fail right away,
+    so optional dependencies can be checked with try/except ImportError.
+
+    Args:
+        name: str, full module name, e.g. 'pandas'
+
+    Returns:
+        LazyModule, standing in for the module
+    '''
+
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError('No module named %s.' % name, name=name)
+
+    return LazyModule(name)
@@ -1,8 +1,26 @@
 ''' CODE TO CLEAN AND STANDARDIZE ALL DATA '''
 
+import contextlib
+import functools
 import glob
+import hashlib
+import json
 import os
-import pandas as pd
+import re
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from voter_suppression_analysis import instrument
+from voter_suppression_analysis.lazy import lazy_import
+
+# imported on first use, so that constants load without pandas
+pd = lazy_import('pandas')
+
+# optional columnar engine for homogenizing, see engine_aggregate()
+try:
+    duckdb = lazy_import('duckdb')
+except ImportError:
+    duckdb = None
 
 
 # filepath expressions for data
@@ -14,6 +32,16 @@ PATH_ALL_SEX = os.path.join(data_path, 'clean', '*_sexrace.csv')
 #PATH_LAWS = 'data/clean/suppression.csv'
 PATH_LAWS = os.path.join(data_path, 'clean', 'suppression.csv')
 
+# columns of a time-versioned law table, one row per state, law and regime
+LAW_VERSION_COLUMNS = [
+    'STATE', 'law', 'value', 'effective_from', 'effective_to'
+]
+
+# materialized outputs of incremental processing
+PATH_OUT_AGE = os.path.join(data_path, 'processed', 'age.pkl')
+PATH_OUT_SEX = os.path.join(data_path, 'processed', 'sexrace.pkl')
+MANIFEST_SUFFIX = '.manifest.json'
+
 # useful constants for renaming and removing columns
 SEX_COLUMNS = [
     'STATE', 'Group', 'Population (18+)', 'Total Citizen', 'Percent Citizen',
@@ -39,6 +67,41 @@ NEW_SEX_GROUPS = [
     'Black', 'Asian & Pacific Islander', 'Hispanic'
 ]
 
+# uniform sexrace groups in display order, and every raw or uniform label
+# mapped to its uniform group
+SEX_GROUP_ORDER = list(dict.fromkeys(NEW_SEX_GROUPS))
+
+SEX_GROUPS = {
+    **dict(zip(SEX_GROUP_ORDER, SEX_GROUP_ORDER)),
+    **dict(zip(ORIGINAL_SEX_GROUPS, NEW_SEX_GROUPS))
+}
+
+# raw Census age labels and the uniform brackets they are combined into
+AGE_BRACKETS = {
+    'Total': 'Total',
+    '18 to 24': '18 to 44', '18 to 25': '18 to 44', '25 to 44': '18 to 44',
+    '25 to 35': '18 to 44', '35 to 45': '18 to 44', '25 to 45': '18 to 44',
+    '25 to 34': '18 to 44', '35 to 44': '18 to 44',
+    '45 to 64': '45 to 65', '45 to 55': '45 to 65', '55 to 65': '45 to 65',
+    '45 to 65': '45 to 65',
+    '65 to 74': '65+', '75+': '65+', '65 to 75': '65+', '65+': '65+'
+}
+
+AGE_BRACKET_ORDER = ['Total', '18 to 44', '45 to 65', '65+']
+
+# opt-in compact dtypes for homogenized frames, see compact_frame()
+COMPACT_DTYPES = {
+    'STATE': 'category',
+    'Group': 'category',
+    'restrictive_id_laws': 'category',
+    'felony_disenfranchisement': 'category',
+    'Year': 'int16',
+    'id': 'int16',
+    'Total': 'Int32',
+    'Total Registered': 'Int32',
+    'Total Voted': 'Int32'
+}
+
 # useful constants for state names and IDs
 STATE_NAMES = [
     'ALABAMA', 'ALASKA', 'ARIZONA', 'ARKANSAS', 'CALIFORNIA',
@@ -62,71 +125,182 @@ STATE_NUMS = [
 
 STATES_TABLE = list(zip(STATE_NAMES, STATE_NUMS))
 
+# postal abbreviations, in the same order as STATE_NAMES
+STATE_ABBREVS = [
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI',
+    'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN',
+    'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH',
+    'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA',
+    'WV', 'WI', 'WY', 'US'
+]
+
+# label used for nationwide rows, and the spellings found in sources
+NATIONAL_NAME = 'NATIONAL'
+NATIONAL_ALIASES = ['UNITED STATES', 'USA']
+
+# places treated as states besides those of STATES_TABLE, as (name, ID)
+# pairs, see known_places()
+EXTRA_PLACES = []
+
+# ways of fanning out per-file loading in combine_*_data
+EXECUTORS = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor
+}
+
+# rows read at a time in streaming mode, see stream_age_data()
+CHUNK_SIZE = 100000
+
+# engines homogenizing can group rows with, see engine_aggregate()
+BACKENDS = ['pandas', 'duckdb']
+
+# leading digits of a file name, used to order files by year
+YEAR_PATTERN = re.compile(r'\d+')
+
+# bytes read at a time when hashing input files
+HASH_BLOCK_SIZE = 1 << 20
+
 # punctuation symbols to handle in data cleaning
 COMMA_SYMBOL = ','
 PERIOD_SYMBOL = '.'
 EMPTY_STR = ''
 
+# declared read-time schema for each stream: column names, explicit dtypes,
+# thousands-separated count columns and the label column to strip
+AGE_SCHEMA = {
+    'columns': AGE_COLUMNS,
+    'dtypes': {
+        'STATE': str, 'Age': str, 'Total': str, 'Total Registered': str,
+        'Total Voted': str
+    },
+    'counts': ['Total', 'Total Registered', 'Total Voted'],
+    'label': 'Age'
+}
+
+SEX_SCHEMA = {
+    'columns': SEX_COLUMNS,
+    'dtypes': {
+        'STATE': str, 'Group': str, 'Total Citizen': str,
+        'Total Registered': str, 'Total Voted': str
+    },
+    'counts': ['Total Citizen', 'Total Registered', 'Total Voted'],
+    'label': 'Group'
+}
+
+
+def read_census_file(file_path, schema):
+    '''
+    Load a single Census turnout file according to a stream schema. Count
+    columns are read as raw strings and converted in one vectorized pass per
+    column; other columns keep the types inferred by the parser.
 
-def get_age_df(file_path):
+    Args:
+        file_path: str, designating file to retrieve for a given year
+        schema: dict, stream schema such as AGE_SCHEMA or SEX_SCHEMA
+
+    Returns:
+        pd.DataFrame, processed data for that year
     '''
-    Load age data by file name into pd.DataFrame and
-    return DataFrame object with select columns and cleaned
-    values.
 
-    Note: NaN values are kept for possible use in viz.
+    file_name = os.path.basename(file_path)
+
+    # load with declared column names and dtypes
+    with instrument.stage('load', label=file_name) as record:
+        df_out = pd.read_csv(
+            file_path,
+            header=0,
+            names=schema['columns'],
+            dtype=schema['dtypes']
+        )
+        record['rows_out'] = len(df_out)
+
+    return clean_census_frame(df_out, schema, file_name)
+
+
+def read_census_chunks(file_path, schema, chunksize=CHUNK_SIZE):
+    '''
+    Load a single Census turnout file a chunk of rows at a time, each chunk
+    cleaned as read_census_file() cleans whole files.
 
     Args:
         file_path: str, designating file to retrieve for a given year
+        schema: dict, stream schema such as AGE_SCHEMA or SEX_SCHEMA
+        chunksize: int, rows per chunk
+
+    Yields:
+        pd.DataFrame, processed rows of that year
+    '''
+
+    file_name = os.path.basename(file_path)
+
+    with pd.read_csv(
+        file_path,
+        header=0,
+        names=schema['columns'],
+        dtype=schema['dtypes'],
+        chunksize=chunksize
+    ) as reader:
+        chunks = iter(reader)
+
+        while True:
+            with instrument.stage('load', label=file_name) as record:
+                df_chunk = next(chunks, None)
+                record['rows_out'] = 0 if df_chunk is None else len(df_chunk)
+
+            if df_chunk is None:
+                return
+
+            yield clean_census_frame(df_chunk, schema, file_name)
+
+
+def clean_census_frame(df_in, schema, label=None):
+    '''
+    Clean up freshly read Census turnout rows in place: upper case states,
+    labels without leading dots, and numeric counts.
+
+    Args:
+        df_in: pd.DataFrame, rows read with a stream schema
+        schema: dict, stream schema such as AGE_SCHEMA or SEX_SCHEMA
+        label: str, name of the rows' file, for instrumentation
 
     Returns:
-        pd.DataFrame, processed age data for that year
+        pd.DataFrame, the cleaned rows
     '''
 
-    # load and subset data
-    df_age = pd.read_csv(file_path, header=0, names=AGE_COLUMNS)
+    with instrument.stage('clean', len(df_in), label) as record:
+        # clean up format and unwanted punctuation
+        group_col = schema['label']
+        df_in['STATE'] = df_in['STATE'].str.upper()
+        df_in['Year'] = df_in['Year'].astype(str)
+        df_in[group_col] = df_in[group_col].str.lstrip(PERIOD_SYMBOL)
 
-    # clean up format and unwanted punctuation
-    df_age['STATE'] = df_age['STATE'].str.upper()
-    df_age['Year'] = df_age['Year'].astype(str)
-    df_age['Age'] = df_age['Age'].map(lambda x: x.lstrip(PERIOD_SYMBOL))
+        # strip thousands separators and type cast numeric data
+        for col in schema['counts']:
+            values = df_in[col].str.replace(COMMA_SYMBOL, EMPTY_STR,
+                                            regex=False)
+            df_in[col] = pd.to_numeric(values, errors='coerce')
 
-    df_age['Total'] = df_age['Total'].replace(
-        COMMA_SYMBOL,
-        EMPTY_STR,
-        regex=True
-    )
+        record['rows_out'] = len(df_in)
 
-    df_age['Total Registered'] = df_age['Total Registered'].replace(
-        COMMA_SYMBOL,
-        EMPTY_STR,
-        regex=True
-    )
+    return df_in
 
-    df_age['Total Voted'] = df_age['Total Voted'].replace(
-        COMMA_SYMBOL,
-        EMPTY_STR,
-        regex=True
-    )
 
-    # type cast numeric data
-    df_age['Total'] = df_age['Total'].apply(
-        pd.to_numeric,
-        errors='coerce'
-    )
+def get_age_df(file_path):
+    '''
+    Load age data by file name into pd.DataFrame and
+    return DataFrame object with select columns and cleaned
+    values.
 
-    df_age['Total Registered'] = df_age['Total Registered'].apply(
-        pd.to_numeric,
-        errors='coerce'
-    )
+    Note: NaN values are kept for possible use in viz.
 
-    df_age['Total Voted'] = df_age['Total Voted'].apply(
-        pd.to_numeric,
-        errors='coerce'
-    )
+    Args:
+        file_path: str, designating file to retrieve for a given year
+
+    Returns:
+        pd.DataFrame, processed age data for that year
+    '''
 
-    # finish
-    return df_age
+    return read_census_file(file_path, AGE_SCHEMA)
 
 
 def get_sexrace_df(file_path):
@@ -144,53 +318,408 @@ def get_sexrace_df(file_path):
         pd.DataFrame, processed sexrace data for that year
     '''
 
-    # load and subset data
-    df_sex = pd.read_csv(file_path, header=0, names=SEX_COLUMNS)
+    return read_census_file(file_path, SEX_SCHEMA)
 
-    # clean up format and unwanted punctuation
-    df_sex['STATE'] = df_sex['STATE'].str.upper()
-    df_sex['Year'] = df_sex['Year'].astype(str)
-    df_sex['Group'] = df_sex['Group'].map(lambda x: x.lstrip(PERIOD_SYMBOL))
 
-    df_sex['Total Citizen'] = df_sex['Total Citizen'].replace(
-        COMMA_SYMBOL,
-        EMPTY_STR,
-        regex=True
-    )
+def sort_by_year(file_paths):
+    '''
+    Order data files by the year in their file name, e.g. '2000_age.csv',
+    rather than by the arbitrary order returned from glob. Files without a
+    number in their name are placed last, alphabetically.
+
+    Args:
+        file_paths: list of str, data files to order
 
-    df_sex['Total Registered'] = df_sex['Total Registered'].replace(
-        COMMA_SYMBOL,
-        EMPTY_STR,
-        regex=True
+    Returns:
+        list of str, file paths in year order
+    '''
+
+    def year_key(file_path):
+        name = os.path.basename(file_path)
+        match = YEAR_PATTERN.search(name)
+
+        if match is None:
+            return (1, 0, name)
+
+        return (0, int(match.group()), name)
+
+    return sorted(file_paths, key=year_key)
+
+
+def file_digest(file_path):
+    '''
+    Hash the contents of a file, so that changes are detected from the data
+    rather than file names or modification times.
+
+    Args:
+        file_path: str, file to hash
+
+    Returns:
+        str, hex SHA-256 digest of the file contents
+    '''
+
+    digest = hashlib.sha256()
+
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def load_files(file_paths, loader, executor='serial', max_workers=None):
+    '''
+    Apply a single-file loader to each of the given files, either serially
+    or fanned out over a thread or process pool. Results keep the order of
+    file_paths regardless of which file finishes first.
+
+    Args:
+        file_paths: list of str, files to load
+        loader: function, module-level loader such as get_age_df()
+        executor: str, one of 'serial', 'thread' or 'process'
+        max_workers: int, pool size (None lets the pool decide)
+
+    Returns:
+        list of pd.DataFrame, one per file
+    '''
+
+    if executor == 'serial':
+        return [loader(file_path) for file_path in file_paths]
+
+    if executor not in EXECUTORS:
+        raise ValueError(
+            'Executor %s must be serial/thread/process.' % executor
+        )
+
+    # worker processes do not share the instrumented run of this one
+    if executor == 'process' and instrument.ACTIVE_RUN is not None:
+        warnings.warn(
+            'Stages of files loaded in worker processes are not recorded, '
+            'use the serial or thread executor to record them.',
+            RuntimeWarning,
+            stacklevel=2
+        )
+
+    with EXECUTORS[executor](max_workers=max_workers) as pool:
+        return list(pool.map(loader, file_paths))
+
+
+def concat_frames(df_list):
+    '''
+    Stack the frames of several year files into one.
+
+    Args:
+        df_list: list of pd.DataFrame, e.g. from load_files()
+
+    Returns:
+        pd.DataFrame, all rows, with a fresh index
+    '''
+
+    rows_in = sum(len(df_year) for df_year in df_list)
+
+    with instrument.stage('concat', rows_in) as record:
+        combined = pd.concat(df_list, axis=0, ignore_index=True)
+        record['rows_out'] = len(combined)
+
+    return combined
+
+
+@functools.lru_cache(maxsize=None)
+def state_index():
+    '''
+    Build the lookup from every known state spelling (full name, postal
+    abbreviation, nationwide aliases) to its canonical name and Census ID,
+    plus any EXTRA_PLACES. Built on first use and shared by every caller
+    afterwards.
+
+    Returns:
+        pd.DataFrame, indexed by upper-case alias, columns 'STATE' and 'id'
+    '''
+
+    df_states = pd.DataFrame(STATES_TABLE, columns=['STATE', 'id'])
+
+    aliases = [
+        df_states.set_index('STATE', drop=False),
+        df_states.set_index(pd.Index(STATE_ABBREVS)),
+        df_states.loc[[len(STATE_NAMES) - 1] * len(NATIONAL_ALIASES)]
+        .set_index(pd.Index(NATIONAL_ALIASES))
+    ]
+
+    if EXTRA_PLACES:
+        aliases.append(
+            pd.DataFrame(EXTRA_PLACES, columns=['STATE', 'id'])
+            .set_index('STATE', drop=False)
+        )
+
+    return pd.concat(aliases)
+
+
+@contextlib.contextmanager
+def known_places(places):
+    '''
+    Treat extra places as states inside the block, e.g. the sub-state areas
+    of synthetic inputs: they get IDs, so that homogenizing keeps them and
+    maps look them up, rather than being dropped as unknown states. Only
+    this process knows them, not the workers of load_files().
+
+    Args:
+        places: list of (str, int) pairs, upper-case name and ID of each
+            place, IDs apart from those of STATES_TABLE
+
+    Yields:
+        None
+    '''
+
+    global EXTRA_PLACES
+
+    previous = EXTRA_PLACES
+    EXTRA_PLACES = previous + list(places)
+    state_index.cache_clear()
+
+    try:
+        yield
+    finally:
+        EXTRA_PLACES = previous
+        state_index.cache_clear()
+
+
+def normalize_states(states):
+    '''
+    Map state labels onto canonical names. Only the distinct labels are
+    cleaned, the full column is relabeled in one map. Unknown labels are
+    kept upper-cased.
+
+    Args:
+        states: pd.Series, state labels in any known spelling
+
+    Returns:
+        pd.Series, canonical state names
+    '''
+
+    labels = pd.Series(states.dropna().unique())
+    cleaned = labels.str.strip().str.upper()
+    canonical = cleaned.map(state_index()['STATE']).fillna(cleaned)
+
+    return states.map(dict(zip(labels, canonical)))
+
+
+def state_ids(states):
+    '''
+    Look up Census IDs for canonical state names.
+
+    Args:
+        states: pd.Series, canonical state names, see normalize_states()
+
+    Returns:
+        pd.Series, state IDs, NaN for unknown states
+    '''
+
+    return states.map(state_index()['id'])
+
+
+def load_laws(law_filepath=PATH_LAWS):
+    '''
+    Load legislative data once per file version. Repeated calls for an
+    unchanged file return the same in-memory table, which callers must
+    treat as read-only.
+
+    Args:
+        law_filepath: str, filepath to legislation data
+
+    Returns:
+        pd.DataFrame, legislative data indexed by canonical state name
+    '''
+
+    file_stat = os.stat(law_filepath)
+
+    return read_law_table(
+        os.path.abspath(law_filepath),
+        file_stat.st_mtime_ns,
+        file_stat.st_size
     )
 
-    df_sex['Total Voted'] = df_sex['Total Voted'].replace(
-        COMMA_SYMBOL,
-        EMPTY_STR,
-        regex=True
+
+@functools.lru_cache(maxsize=8)
+def read_law_table(law_filepath, mtime, size):
+    '''
+    Read and index legislative data. Memoized on the file's modification
+    time and size as well as its path, so an edited file is read again.
+
+    Args:
+        law_filepath: str, absolute filepath to legislation data
+        mtime: int, modification time of the file in nanoseconds
+        size: int, size of the file in bytes
+
+    Returns:
+        pd.DataFrame, legislative data indexed by canonical state name
+    '''
+
+    df_laws = pd.read_csv(law_filepath)
+    df_laws['STATE'] = normalize_states(df_laws['STATE'])
+
+    if 'effective_from' in df_laws.columns:
+        return law_regimes(df_laws)
+
+    return df_laws.set_index('STATE')
+
+
+def law_regimes(df_versions):
+    '''
+    Turn a time-versioned law table into the sequence of law regimes in
+    each state: one row per state and year in which any law changed,
+    holding the value of every law in force from that year on. Laws are
+    in force from effective_from through effective_to (inclusive), an
+    empty effective_to means still in force.
+
+    Args:
+        df_versions: pd.DataFrame, with LAW_VERSION_COLUMNS
+
+    Returns:
+        pd.DataFrame, columns 'STATE', 'effective_from' and one column per
+        law, sorted by effective_from for as-of joins
+    '''
+
+    missing = set(LAW_VERSION_COLUMNS) - set(df_versions.columns)
+
+    if missing:
+        raise ValueError('Law table is missing columns %s.' % sorted(missing))
+
+    versions = df_versions.reset_index(drop=True)
+    laws = list(versions['law'].unique())
+
+    # every start and end of a law is an event pointing at its version row,
+    # ends point nowhere; at equal years starts override ends
+    starts = versions[['STATE', 'law', 'effective_from']].assign(
+        row=versions.index,
+        order=1
     )
 
-    # type cast numeric data
-    df_sex['Total Citizen'] = df_sex['Total Citizen'].apply(
-        pd.to_numeric,
-        errors='coerce'
+    ended = versions.loc[versions['effective_to'].notna()]
+    ends = ended[['STATE', 'law']].assign(
+        effective_from=ended['effective_to'] + 1,
+        row=-1,
+        order=0
     )
 
-    df_sex['Total Registered'] = df_sex['Total Registered'].apply(
-        pd.to_numeric,
-        errors='coerce'
+    events = pd.concat([starts, ends], ignore_index=True)
+    events['effective_from'] = events['effective_from'].astype('int64')
+    events = events.sort_values(
+        ['STATE', 'effective_from', 'order'],
+        kind='mergesort'
+    ).drop_duplicates(['STATE', 'effective_from', 'law'], keep='last')
+
+    # carry the version in force forward to each later change in the state
+    rows = events.pivot(
+        index=['STATE', 'effective_from'],
+        columns='law',
+        values='row'
     )
+    rows = rows.groupby(level='STATE').ffill().stack().astype(int)
+
+    # look the values up once, ended laws find no row and become NaN
+    values = versions['value'].reindex(rows.to_numpy()).to_numpy()
+    regimes = pd.Series(values, index=rows.index).unstack('law')
+
+    regimes = regimes.reindex(columns=laws).reset_index()
+    regimes.columns.name = None
+
+    return regimes.sort_values('effective_from', kind='mergesort')
+
+
+@instrument.staged('law merge')
+def attach_laws(combined, law_filepath=PATH_LAWS, keep_missing=True):
+    '''
+    Make nationwide labels consistent and attach legislative data columns
+    to combined turnout data.
+
+    Args:
+        combined: pd.DataFrame, concatenated get_*_df() output
+        law_filepath: str, filepath to legislation data
+        keep_missing: bool, whether to add a row of law data for each state
+            without turnout data, as an outer join would; for time-versioned
+            tables, the row holds the state's latest regime
+
+    Returns:
+        pd.DataFrame, turnout data with legislative columns
+    '''
+
+    df_laws = load_laws(law_filepath)
+
+    # make state and nationwide labels consistent
+    combined['STATE'] = normalize_states(combined['STATE'])
+
+    if 'effective_from' in df_laws.columns:
+        return attach_law_regimes(combined, df_laws, keep_missing)
+
+    # attach legislative rating to turnout data, aligned on state
+    df_result = combined.join(df_laws, on='STATE')
+
+    # keep states with laws but no turnout data, as an outer join would
+    missing = df_laws.index.difference(combined['STATE'].unique())
+
+    if keep_missing and len(missing) > 0:
+        df_result = pd.concat(
+            [df_result, df_laws.loc[missing].reset_index()],
+            ignore_index=True
+        )
+
+    return df_result
+
+
+def attach_law_regimes(combined, regimes, keep_missing=True):
+    '''
+    Attach the laws in force in each state and election year, with a sorted
+    as-of join keyed by state. Rows without a year, or dated before a
+    state's first regime, get no law values.
+
+    Args:
+        combined: pd.DataFrame, concatenated get_*_df() output
+        regimes: pd.DataFrame, created by law_regimes()
+        keep_missing: bool, whether to add a row of the latest regime for
+            each state without turnout data, as attach_laws() does for flat
+            tables
 
-    df_sex['Total Voted'] = df_sex['Total Voted'].apply(
-        pd.to_numeric,
-        errors='coerce'
+    Returns:
+        pd.DataFrame, turnout data with legislative columns, rows in the
+        same order as combined, followed by any states without turnout data
+    '''
+
+    # as-of joins need both sides sorted on the join key, rows without a
+    # year cannot be placed in any regime
+    years = pd.to_numeric(combined['Year'], errors='coerce')
+    dated = years.notna()
+
+    left = combined.loc[dated].assign(law_year=years[dated].astype('int64'))
+    left = left.sort_values('law_year', kind='mergesort')
+
+    df_result = pd.merge_asof(
+        left,
+        regimes,
+        left_on='law_year',
+        right_on='effective_from',
+        by='STATE'
     )
 
-    # finish
-    return df_sex
+    df_result.index = left.index
+    df_result = df_result.drop(columns=['law_year', 'effective_from'])
+
+    df_result = pd.concat([df_result, combined.loc[~dated]]).sort_index()
+
+    # keep states with laws but no turnout data, under their latest regime
+    latest = regimes.drop_duplicates('STATE', keep='last')
+    latest = latest.loc[~latest['STATE'].isin(combined['STATE'].unique())]
+
+    if keep_missing and len(latest) > 0:
+        df_result = pd.concat(
+            [df_result, latest.drop(columns='effective_from')],
+            ignore_index=True
+        )
+
+    return df_result
 
 
-def combine_age_data(file_expression=PATH_ALL_AGE, law_filepath=PATH_LAWS):
+def combine_age_data(file_expression=PATH_ALL_AGE, law_filepath=PATH_LAWS,
+                     executor='serial', max_workers=None):
     '''
     Generate all age-related dataframes, combine into one,
     and attach legislative data columns.
@@ -198,43 +727,27 @@ def combine_age_data(file_expression=PATH_ALL_AGE, law_filepath=PATH_LAWS):
     Args:
         file_expression: str, regex to capture desired age files
         law_filepath: str, filepath to legislation data
+        executor: str, 'serial', 'thread' or 'process' file loading
+        max_workers: int, pool size for threaded/process loading
 
     Returns:
         pd.DataFrame, combined age data for all years
     '''
 
-    # retrieve all relevant file paths
-    age_file_paths = glob.glob(file_expression)
-    df_list = []
+    # retrieve all relevant file paths, in year order
+    age_file_paths = sort_by_year(glob.glob(file_expression))
 
     # generate a dataframe from each file and combine
-    for age_file in age_file_paths:
-        df_curr = get_age_df(age_file)
-        df_list.append(df_curr)
+    df_list = load_files(age_file_paths, get_age_df, executor, max_workers)
 
-    combined = pd.concat(df_list, axis=0, ignore_index=True)
+    combined = concat_frames(df_list)
 
-    # load legislative data
-    df_laws = pd.read_csv(law_filepath)
-    df_laws['STATE'] = df_laws['STATE'].str.upper()
-
-    # make nationwide labels consistent
-    combined['STATE'].loc[combined['STATE'] == 'US'] = 'NATIONAL'
-    combined['STATE'].loc[combined['STATE'] == 'UNITED STATES'] = 'NATIONAL'
-    df_laws['STATE'].loc[df_laws['STATE'] == 'US'] = 'NATIONAL'
-
-    # attach legislative rating to age data and finish
-    df_result = combined.merge(
-        df_laws,
-        how='outer',
-        left_on='STATE',
-        right_on='STATE'
-    )
-
-    return df_result
+    # attach legislative rating and finish
+    return attach_laws(combined, law_filepath)
 
 
-def combine_sexrace_data(file_expression=PATH_ALL_SEX, law_filepath=PATH_LAWS):
+def combine_sexrace_data(file_expression=PATH_ALL_SEX, law_filepath=PATH_LAWS,
+                         executor='serial', max_workers=None):
     '''
     Retrieve all sexrace-related data files, combine into one
     pd.DataFrame object, and attach legislative data columns.
@@ -242,99 +755,204 @@ def combine_sexrace_data(file_expression=PATH_ALL_SEX, law_filepath=PATH_LAWS):
     Args:
         file_expression: str, regex to capture desired age files
         law_filepath: str, filepath to legislation data
+        executor: str, 'serial', 'thread' or 'process' file loading
+        max_workers: int, pool size for threaded/process loading
 
     Returns:
         pd.DataFrame, combined sexrace data for all years
     '''
 
-    # retrieve all relevant file paths
-    sex_file_paths = glob.glob(file_expression)
-    df_list = []
+    # retrieve all relevant file paths, in year order
+    sex_file_paths = sort_by_year(glob.glob(file_expression))
 
     # generate a dataframe from each file and combine
-    for sex_file in sex_file_paths:
-        df_curr = get_sexrace_df(sex_file)
-        df_list.append(df_curr)
+    df_list = load_files(sex_file_paths, get_sexrace_df, executor, max_workers)
 
-    combined = pd.concat(df_list, axis=0, ignore_index=True)
+    combined = concat_frames(df_list)
 
-    # load legislative data
-    df_laws = pd.read_csv(law_filepath)
-    df_laws['STATE'] = df_laws['STATE'].str.upper()
-
-    # make nationwide labels consistent
-    combined['STATE'].loc[combined['STATE'] == 'US'] = 'NATIONAL'
-    combined['STATE'].loc[combined['STATE'] == 'UNITED STATES'] = 'NATIONAL'
-    df_laws['STATE'].loc[df_laws['STATE'] == 'US'] = 'NATIONAL'
-
-    # attach legislative rating to sex/race data
-    df_result = combined.merge(
-        df_laws,
-        how='outer',
-        left_on='STATE',
-        right_on='STATE'
-    )
+    # attach legislative rating and finish
+    return attach_laws(combined, law_filepath)
 
-    return df_result
 
+def read_age_brackets(file_path, brackets=AGE_BRACKETS):
+    '''
+    Extend the raw label to age bracket mapping from a two-column CSV file
+    (raw label, bracket), e.g. for new Census bracket spellings.
 
-def homogenize_age_data(df_in):
+    Args:
+        file_path: str, CSV file of label/bracket pairs with a header row
+        brackets: dict, mapping to extend
+
+    Returns:
+        dict, combined mapping of raw age labels to brackets
     '''
-    Structures the age data by creating the desired age groups
-    of 'Total','18 to 44', '45 to 65', '65+' into a DataFrame.
+
+    df_brackets = pd.read_csv(file_path, dtype=str)
+    labels, targets = df_brackets.columns[:2]
+
+    extended = dict(brackets)
+    extended.update(zip(df_brackets[labels], df_brackets[targets]))
+
+    unknown = set(extended.values()) - set(AGE_BRACKET_ORDER)
+
+    if unknown:
+        raise ValueError('Unknown age brackets: %s.' % sorted(unknown))
+
+    return extended
+
+
+def compact_frame(df_in):
+    '''
+    Cast a homogenized frame to COMPACT_DTYPES: categoricals for labels and
+    laws, small integers for years and IDs, and nullable 32-bit counts.
+    Percentages stay 64-bit, as 32-bit floats serialize to longer, noisier
+    JSON. Integer columns with missing values (e.g. states without data)
+    use the matching nullable type instead.
 
     Args:
-        df_in: pd.Dataframe created by function combine_age_data()
+        df_in: pd.DataFrame, output of a homogenize_*_data() function
 
     Returns:
-        pd.DataFrame, age bracket structured data for all years
+        pd.DataFrame, same data using compact dtypes
     '''
 
-    # set up a table for the states
-    df_states = pd.DataFrame(STATES_TABLE, columns=['STATE', 'id'])
-    df_states['STATE'] = df_states['STATE'].str.upper()
-
-    # combine existing age brackets for uniformity
-    df_65plus = df_in.loc[
-        (df_in['Age'] == '65 to 74')
-        | (df_in['Age'] == '75+')
-        | (df_in['Age'] == '65 to 75')
-        | (df_in['Age'] == '65+'),
-    ]
+    dtypes = {}
 
-    df_45_64 = df_in.loc[
-        (df_in['Age'] == '45 to 64')
-        | (df_in['Age'] == '45 to 55')
-        | (df_in['Age'] == '55 to 65')
-        | (df_in['Age'] == '45 to 65'),
-    ]
+    for col, dtype in COMPACT_DTYPES.items():
+        if col not in df_in.columns:
+            continue
 
-    df_18_44 = df_in.loc[
-        (df_in['Age'] == '18 to 24')
-        | (df_in['Age'] == '18 to 25')
-        | (df_in['Age'] == '25 to 44')
-        | (df_in['Age'] == '25 to 35')
-        | (df_in['Age'] == '35 to 45')
-        | (df_in['Age'] == '25 to 45')
-        | (df_in['Age'] == '25 to 34')
-        | (df_in['Age'] == '35 to 44'),
-    ]
+        if dtype == 'int16' and df_in[col].isna().any():
+            dtype = 'Int16'
 
-    df_total = df_in.loc[df_in['Age'] == 'Total',]
+        dtypes[col] = dtype
 
-    # iteratively group DFs by state and year
-    df_list = [df_total, df_18_44, df_45_64, df_65plus]
-    age_brackets = ['Total', '18 to 44', '45 to 65', '65+']
-    combined = []
+    # nullable integers need whole numbers
+    counts = [col for col, dtype in dtypes.items() if dtype == 'Int32']
+    df_out = df_in.assign(**{col: df_in[col].round() for col in counts})
 
-    for i, data in enumerate(df_list):
-        data = data.groupby(['STATE', 'Year'], sort=False).sum().reset_index()
-        data['Age'] = age_brackets[i]
-        combined.append(data)
+    return df_out.astype(dtypes)
 
-    # recombine all age bracket DFs
-    result = pd.concat(combined, axis=0, ignore_index=True)
-    result.sort_values(['Year', 'STATE'], inplace=True)
+
+def engine_aggregate(df_in, keys, labels, values, backend='duckdb',
+                     mean=False):
+    '''
+    Map raw labels to uniform ones and reduce rows to one per key on a
+    multi-threaded columnar engine, ahead of homogenizing the (much
+    smaller) result in pandas. DuckDB scans the frame in place, without a
+    copy, using every core. Rows missing a key or an unlisted label are
+    dropped, as the pandas groupby and pivot drop them.
+
+    Args:
+        df_in: pd.DataFrame, created by a combine_*_data() function
+        keys: list of str, grouping columns, the last holding raw labels
+        labels: dict, raw label mapped to its uniform label
+        values: list of str, columns to aggregate
+        backend: str, one of BACKENDS other than 'pandas'
+        mean: bool, whether to average values and make years whole, as the
+            sexrace pivot does, rather than sum them, as the age groupby
+            does (empty sums are 0, and keep the dtype of the column)
+
+    Returns:
+        pd.DataFrame, one row per key, with the keys then the values
+    '''
+
+    if backend not in BACKENDS[1:]:
+        raise ValueError('Backend %s must be one of %s.' %
+                         (backend, BACKENDS[1:]))
+
+    if duckdb is None:
+        raise ImportError('The duckdb backend needs the duckdb package.')
+
+    label = keys[-1]
+    df_labels = pd.DataFrame({
+        'raw': list(labels),
+        'uniform': list(labels.values())
+    })
+
+    # uniform labels, whole years, and the aggregate of every value column
+    columns = ['rows."%s"' % key for key in keys[:-1]] + \
+        ['labels.uniform AS "%s"' % label]
+
+    if mean:
+        columns[keys.index('Year')] = (
+            'CAST(CAST(TRUNC(CAST(rows."Year" AS DOUBLE)) AS BIGINT) '
+            'AS VARCHAR) AS "Year"'
+        )
+        columns += ['AVG(rows."%s") AS "%s"' % (col, col) for col in values]
+    else:
+        columns += ['COALESCE(SUM(rows."%s"), 0) AS "%s"' % (col, col)
+                    for col in values]
+
+    query = (
+        'SELECT %s FROM rows JOIN labels ON rows."%s" = labels.raw '
+        'WHERE %s GROUP BY ALL' % (
+            ', '.join(columns),
+            label,
+            ' AND '.join('rows."%s" IS NOT NULL' % key for key in keys[:-1])
+        )
+    )
+
+    with instrument.stage('pivot', len(df_in), '%s groups' % backend) \
+            as record:
+        with duckdb.connect() as connection:
+            connection.register('rows', df_in)
+            connection.register('labels', df_labels)
+            result = connection.execute(query).df()
+
+        record['rows_out'] = len(result)
+
+    if not mean:
+        result = result.astype(df_in[values].dtypes.to_dict())
+
+    return result
+
+
+@instrument.staged('homogenize')
+def homogenize_age_data(df_in, brackets=AGE_BRACKETS, compact=False,
+                        backend='pandas'):
+    '''
+    Structures the age data by creating the desired age groups
+    of 'Total','18 to 44', '45 to 65', '65+' into a DataFrame.
+
+    Args:
+        df_in: pd.Dataframe created by function combine_age_data()
+        brackets: dict, raw age labels mapped to brackets, see
+            read_age_brackets()
+        compact: bool, whether to return compact dtypes, see compact_frame()
+        backend: str, engine grouping the rows, one of BACKENDS, see
+            engine_aggregate()
+
+    Returns:
+        pd.DataFrame, age bracket structured data for all years
+    '''
+
+    # sum the rows of each state, year and bracket on another engine,
+    # leaving one row per bracket to finish below
+    if backend != 'pandas':
+        keys = ['STATE', 'Year', 'Age']
+        values = [col for col in df_in.select_dtypes('number').columns
+                  if col not in keys]
+        df_in = engine_aggregate(df_in, keys, brackets, values, backend)
+        brackets = dict(zip(AGE_BRACKET_ORDER, AGE_BRACKET_ORDER))
+
+    # label every row with its bracket, unlisted labels are dropped
+    bracket_type = pd.CategoricalDtype(AGE_BRACKET_ORDER, ordered=True)
+    df_kept = df_in.assign(Age=df_in['Age'].map(brackets).astype(bracket_type))
+
+    # group all brackets by state and year in a single pass
+    with instrument.stage('pivot', len(df_kept), 'age brackets') as record:
+        result = df_kept.groupby(
+            ['STATE', 'Year', 'Age'],
+            sort=False,
+            observed=True
+        ).sum(numeric_only=True).reset_index()
+        record['rows_out'] = len(result)
+
+    value_columns = list(result.columns[3:])
+    result = result[['STATE', 'Year'] + value_columns + ['Age']]
+    result = result.sort_values(['Year', 'STATE', 'Age'])
+    result['Age'] = result['Age'].astype(str)
 
     # compute voter turnout metric
     result['Percent Registered'] = result['Total Registered'] / result['Total']
@@ -342,20 +960,33 @@ def homogenize_age_data(df_in):
 
     # refomatting
     result['Year'] = result['Year'].astype(int)
-    result['STATE'] = result['STATE'].str.upper()
+    result['STATE'] = normalize_states(result['STATE'])
     result = result.rename(columns={'Age':'Group'})
 
-    # attach our state labels/IDs and finish
-    result = df_states.merge(
-        result,
-        how='outer',
-        left_on='STATE',
-        right_on='STATE'
-    )
+    # list states without data, attach our state IDs and finish
+    present = set(result.STATE)
+    missing = [name for name in STATE_NAMES if name not in present]
+    if missing:
+        result = pd.concat(
+            [result, pd.DataFrame({'STATE': missing})],
+            ignore_index=True
+        )
+
+    result.insert(1, 'id', state_ids(result['STATE']))
+
+    # states in table order, unknown states last
+    state_order = {name: i for i, name in enumerate(STATE_NAMES)}
+    positions = result['STATE'].map(state_order).fillna(len(STATE_NAMES))
+    result = result.iloc[positions.argsort(kind='mergesort')]
+    result = result.reset_index(drop=True)
+
+    if compact:
+        result = compact_frame(result)
 
     return result
 
-def homogenize_sexrace_data(df_in):
+@instrument.staged('homogenize')
+def homogenize_sexrace_data(df_in, compact=False, backend='pandas'):
     '''
     Structures the age data by creating the desired demographic groups
     of 'Total','Male', 'Female', 'White', 'Black', 'Asian & Pacific Islander',
@@ -363,74 +994,63 @@ def homogenize_sexrace_data(df_in):
 
     Args:
         df_in: pd.Dataframe created by function combine_age_data()
+        compact: bool, whether to return compact dtypes, see compact_frame()
+        backend: str, engine grouping the rows, one of BACKENDS, see
+            engine_aggregate()
 
     Returns:
         pd.DataFrame, age bracket structured data for all years
     '''
 
-    # set up a table for the states
-    df_states = pd.DataFrame(STATES_TABLE, columns=['STATE', 'id'])
-    df_states.STATE = df_states.STATE.str.upper()
-
     # all relevant totals
     total_columns = ['Total Citizen', 'Total Registered', 'Total Voted']
 
-    # iteratively renaming demographic groups
-    copy = df_in.copy()
+    idx = [
+        'STATE',
+        'Year',
+        'restrictive_id_laws',
+        'felony_disenfranchisement'
+    ]
+
+    # average the rows of each key and group on another engine, as the
+    # pivot below does, leaving one row per group to finish below
+    if backend != 'pandas':
+        df_in = engine_aggregate(df_in, idx + ['Group'], SEX_GROUPS,
+                                 total_columns, backend, mean=True)
 
-    for (orig, new) in zip(ORIGINAL_SEX_GROUPS, NEW_SEX_GROUPS):
-        copy.Group.loc[copy.Group == orig] = new
+    # rename demographic groups in one pass, unknown groups become NaN
+    group_type = pd.CategoricalDtype(SEX_GROUP_ORDER)
+    groups = df_in.Group.map(SEX_GROUPS).astype(group_type)
 
     # keeping relevant groups and setting years as str
-    df_kept = copy.loc[copy.Group.isin(NEW_SEX_GROUPS)]
-    df_kept.Year = df_kept.Year.astype(float).astype(int).astype(str)
-
-    # iteratively validating the totals values
-    for col in total_columns:
-
-        idx = [
-            'STATE',
-            'Year',
-            'restrictive_id_laws',
-            'felony_disenfranchisement'
-        ]
-
-        merge_key = [
-            'STATE',
-            'Year',
-            'Group',
-            'restrictive_id_laws',
-            'felony_disenfranchisement'
-        ]
-
-        # perform pivot and compute gender-wide totals
-        df_tmp = df_kept.pivot_table(index=idx, columns='Group', values=col)
-        df_tmp = df_tmp.reset_index()
-
-        if ('Male' in df_tmp.columns) & ('Female' in df_tmp.columns):
-            df_tmp.Total = df_tmp[['Male', 'Female']].sum(axis=1)
-
-        # un-pivot
-        df_tmp_unpivot = df_tmp.melt(id_vars=idx, value_name=col)
-
-        # make a copy of un-pivoted table on first iteration
-        if col == 'Total Citizen':
-            df_merge = df_tmp_unpivot.copy()
-
-        # continuously merge using merge key
-        df_merge = pd.merge(
-            df_merge,
-            df_tmp_unpivot,
-            how='left',
-            left_on=merge_key,
-            right_on=merge_key
+    df_kept = df_in.loc[groups.notna()].assign(Group=groups)
+    df_kept['Year'] = df_kept.Year.astype(float).astype(int).astype(str)
+
+    # pivot all totals at once, columns are (total, group) pairs
+    with instrument.stage('pivot', len(df_kept), 'sexrace groups') as record:
+        df_wide = df_kept.pivot_table(
+            index=idx,
+            columns='Group',
+            values=total_columns,
+            observed=True
         )
+        record['rows_out'] = len(df_wide)
+    groups = df_wide.columns.get_level_values('Group')
+
+    # compute gender-wide totals for every measure
+    if ('Male' in groups) & ('Female' in groups):
+        df_wide.loc[:, (slice(None), 'Total')] = (
+            df_wide.xs('Male', axis=1, level='Group').fillna(0)
+            + df_wide.xs('Female', axis=1, level='Group').fillna(0)
+        ).values
 
+    # un-pivot groups back into rows, keeping every state/year/group
+    result = df_wide.stack('Group', dropna=False).reset_index()
+    result = result[idx + ['Group'] + total_columns]
 
     # reformating values, types, and column names
-    result = df_merge.drop('Total Citizen_y', axis=1)
-    result.STATE = result.STATE.str.upper()
-    result = result.rename(columns={'Total Citizen_x':'Total'})
+    result.STATE = normalize_states(result.STATE)
+    result = result.rename(columns={'Total Citizen':'Total'})
     result = result.sort_values(by=['Year', 'STATE']).round()
     result.Year = result.Year.astype(int)
 
@@ -438,12 +1058,352 @@ def homogenize_sexrace_data(df_in):
     result['Percent Registered'] = result['Total Registered'] / result['Total']
     result['Percent Voted'] = result['Total Voted'] / result['Total']
 
-    # attach our state labels/IDs and finish
-    result = pd.merge(
-        result,
-        df_states,
-        left_on='STATE',
-        right_on='STATE'
+    # attach our state IDs, dropping unknown states
+    result['id'] = state_ids(result.STATE)
+    result = result.loc[result.id.notna()].astype({'id': 'int64'})
+
+    # rows grouped by state, each state's years in order, and finish
+    positions, _ = pd.factorize(result.STATE)
+    result = result.iloc[positions.argsort(kind='mergesort')]
+    result = result.reset_index(drop=True)
+
+    if compact:
+        result = compact_frame(result)
+
+    return result
+
+
+def aggregate_chunks(file_paths, schema, law_filepath, labels, law_keys,
+                     chunksize=CHUNK_SIZE):
+    '''
+    Stream year files through cleaning, the law merge and label mapping a
+    chunk at a time, summing each chunk (and counting the values summed)
+    per state, year and uniform label. Partial sums are folded into the
+    running totals once they add up to a chunk's worth of rows, so memory
+    is bounded by the chunk size and the number of distinct keys rather
+    than the size of the input.
+
+    Args:
+        file_paths: list of str, year files in year order
+        schema: dict, stream schema such as AGE_SCHEMA or SEX_SCHEMA
+        law_filepath: str, filepath to legislation data
+        labels: dict, raw label mapped to its uniform label, rows with
+            unlisted labels are dropped
+        law_keys: bool, whether law columns are keys, as in the sexrace
+            pivot, rather than summed values, as in the age groupby
+        chunksize: int, rows read at a time
+
+    Returns:
+        pd.DataFrame, one row per key, with the keys, then a 'sum' and a
+        'count' column level of the count (and summed law) columns
+    '''
+
+    label = schema['label']
+    partials = []
+    partial_rows = 0
+
+    for file_path in file_paths:
+        for df_chunk in read_census_chunks(file_path, schema, chunksize):
+            df_chunk = attach_laws(df_chunk, law_filepath, keep_missing=False)
+            law_columns = [col for col in df_chunk.columns
+                           if col not in schema['columns']]
+
+            # uniform labels and years, as homogenizing would give them
+            mapped = df_chunk[label].map(labels)
+            df_chunk = df_chunk.loc[mapped.notna()].assign(**{label: mapped})
+            df_chunk['Year'] = \
+                df_chunk.Year.astype(float).astype(int).astype(str)
+
+            keys = ['STATE', 'Year', label] + (law_columns if law_keys
+                                               else [])
+            values = schema['counts'] + ([] if law_keys else law_columns)
+
+            with instrument.stage('pivot', len(df_chunk),
+                                  'partial sums') as record:
+                grouped = df_chunk.groupby(keys, sort=False)[values]
+                partials.append(pd.concat(
+                    [grouped.sum(), grouped.count()],
+                    axis=1,
+                    keys=['sum', 'count']
+                ))
+                partial_rows += len(partials[-1])
+
+                if partial_rows >= chunksize:
+                    partials = [fold_partials(partials, keys)]
+                    partial_rows = len(partials[0])
+
+                record['rows_out'] = partial_rows
+
+    if not partials:
+        raise ValueError('Files %s must hold rows to stream.' % file_paths)
+
+    return fold_partials(partials, keys)
+
+
+def fold_partials(partials, keys):
+    '''
+    Add up partial sums of the same keys, see aggregate_chunks().
+
+    Args:
+        partials: list of pd.DataFrame, partial sums indexed by keys
+        keys: list of str, names of the index levels
+
+    Returns:
+        pd.DataFrame, one row per distinct key
+    '''
+
+    if len(partials) == 1:
+        return partials[0]
+
+    return pd.concat(partials).groupby(level=keys, sort=False).sum()
+
+
+def stream_age_data(file_expression=PATH_ALL_AGE, law_filepath=PATH_LAWS,
+                    chunksize=CHUNK_SIZE, brackets=AGE_BRACKETS,
+                    compact=False):
+    '''
+    Combine and homogenize age data a chunk of rows at a time, for inputs
+    (e.g. county or precinct level) too large to hold in memory at once.
+    Gives the same result as homogenize_age_data(combine_age_data()).
+
+    Args:
+        file_expression: str, regex to capture desired age files
+        law_filepath: str, filepath to legislation data
+        chunksize: int, rows read at a time
+        brackets: dict, raw age labels mapped to brackets, see
+            read_age_brackets()
+        compact: bool, whether to return compact dtypes, see compact_frame()
+
+    Returns:
+        pd.DataFrame, age bracket structured data for all years
+    '''
+
+    totals = aggregate_chunks(
+        sort_by_year(glob.glob(file_expression)),
+        AGE_SCHEMA,
+        law_filepath,
+        brackets,
+        law_keys=False,
+        chunksize=chunksize
     )
 
+    # one row per state, year and bracket, homogenized as is
+    df_sums = totals['sum'].reset_index()
+    same_brackets = dict(zip(AGE_BRACKET_ORDER, AGE_BRACKET_ORDER))
+
+    return homogenize_age_data(df_sums, same_brackets, compact)
+
+
+def stream_sexrace_data(file_expression=PATH_ALL_SEX, law_filepath=PATH_LAWS,
+                        chunksize=CHUNK_SIZE, compact=False):
+    '''
+    Combine and homogenize sexrace data a chunk of rows at a time, for
+    inputs (e.g. county or precinct level) too large to hold in memory at
+    once. Raw labels sharing a group are averaged, as the pivot in
+    homogenize_sexrace_data() does, so the result is the same as
+    homogenize_sexrace_data(combine_sexrace_data()).
+
+    Args:
+        file_expression: str, regex to capture desired sexrace files
+        law_filepath: str, filepath to legislation data
+        chunksize: int, rows read at a time
+        compact: bool, whether to return compact dtypes, see compact_frame()
+
+    Returns:
+        pd.DataFrame, demographic group structured data for all years
+    '''
+
+    totals = aggregate_chunks(
+        sort_by_year(glob.glob(file_expression)),
+        SEX_SCHEMA,
+        law_filepath,
+        SEX_GROUPS,
+        law_keys=True,
+        chunksize=chunksize
+    )
+
+    # one row per state, year, law values and group, holding group means
+    counts = totals['count'].where(totals['count'] > 0)
+    df_means = (totals['sum'] / counts).reset_index()
+
+    return homogenize_sexrace_data(df_means, compact)
+
+
+def update_processed_data(file_expression, output_path, loader, homogenize,
+                          law_filepath=PATH_LAWS):
+    '''
+    Incrementally maintain homogenized data for one stream. A manifest next
+    to output_path records the digest and years of every year file that
+    went into it; on each call only new or changed files (plus any unchanged
+    files sharing a year with them) are run through the loader and the
+    homogenize step, and the result replaces those years in the previously
+    materialized output. Changes to the law file or to this module trigger
+    a full rebuild.
+
+    Note: unlike a full homogenize run, rows are only kept for states with
+    data, i.e. no placeholder rows with a missing Year.
+
+    Args:
+        file_expression: str, regex to capture desired year files
+        output_path: str, pickle file holding the materialized output
+        loader: function, get_age_df() or get_sexrace_df()
+        homogenize: function, matching homogenize_*_data()
+        law_filepath: str, filepath to legislation data
+
+    Returns:
+        pd.DataFrame, homogenized data for all years
+    '''
+
+    manifest_path = output_path + MANIFEST_SUFFIX
+    file_paths = sort_by_year(glob.glob(file_expression))
+    digests = {file_path: file_digest(file_path) for file_path in file_paths}
+
+    # anything other than new year files invalidates the whole output
+    inputs = {
+        'loader': loader.__name__,
+        'code': file_digest(__file__),
+        'laws': file_digest(law_filepath)
+    }
+
+    known = {}
+    df_previous = None
+
+    if os.path.isfile(manifest_path) and os.path.isfile(output_path):
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+
+        if manifest['inputs'] == inputs:
+            known = manifest['files']
+            df_previous = pd.read_pickle(output_path)
+
+    # find new/changed files, and files that went away
+    changed = [
+        file_path for file_path in file_paths
+        if known.get(file_path, {}).get('digest') != digests[file_path]
+    ]
+
+    removed = [file_path for file_path in known if file_path not in digests]
+
+    if df_previous is not None and not changed and not removed:
+        return df_previous
+
+    # load changed files, then any unchanged file sharing one of their years
+    loaded = dict(zip(changed, load_files(changed, loader)))
+    years = {file_path: file_years(df) for file_path, df in loaded.items()}
+
+    stale_years = set().union(
+        *years.values(),
+        *(known[file_path]['years'] for file_path in changed + removed
+          if file_path in known)
+    )
+
+    for file_path in file_paths:
+        if file_path in loaded:
+            continue
+
+        if stale_years.intersection(known[file_path]['years']):
+            loaded[file_path] = loader(file_path)
+            years[file_path] = known[file_path]['years']
+
+    # homogenize only the affected years, then merge into previous output
+    df_list = []
+
+    if df_previous is not None:
+        df_list.append(df_previous.loc[~df_previous.Year.isin(stale_years)])
+
+    if loaded:
+        ordered = [loaded[file_path] for file_path in sort_by_year(loaded)]
+        combined = pd.concat(ordered, axis=0, ignore_index=True)
+        df_new = homogenize(attach_laws(combined, law_filepath))
+        df_list.append(df_new.loc[df_new.Year.notna()])
+
+    result = pd.concat(df_list, axis=0, ignore_index=True)
+
+    # same row order as a full run: states in table order, then years
+    state_order = {name: i for i, name in enumerate(STATE_NAMES)}
+    result = result.sort_values(
+        ['STATE', 'Year'],
+        key=lambda col: col.map(state_order) if col.name == 'STATE' else col,
+        kind='mergesort',
+        ignore_index=True
+    )
+
+    # store output and manifest for the next run
+    for file_path in file_paths:
+        if file_path not in years:
+            years[file_path] = known[file_path]['years']
+
+    files = {
+        file_path: {'digest': digests[file_path], 'years': years[file_path]}
+        for file_path in file_paths
+    }
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    result.to_pickle(output_path)
+
+    with open(manifest_path, 'w') as file:
+        json.dump({'inputs': inputs, 'files': files}, file, indent=2)
+
     return result
+
+
+def file_years(df_in):
+    '''
+    List the election years present in a get_*_df() frame.
+
+    Args:
+        df_in: pd.DataFrame, data for one year file
+
+    Returns:
+        list of int, distinct years in the frame
+    '''
+
+    years = pd.to_numeric(df_in['Year'], errors='coerce').dropna()
+    return sorted(years.astype(int).unique().tolist())
+
+
+def update_age_data(file_expression=PATH_ALL_AGE, output_path=PATH_OUT_AGE,
+                    law_filepath=PATH_LAWS):
+    '''
+    Incrementally update homogenized age data, see update_processed_data().
+
+    Args:
+        file_expression: str, regex to capture desired age files
+        output_path: str, pickle file holding the materialized output
+        law_filepath: str, filepath to legislation data
+
+    Returns:
+        pd.DataFrame, age bracket structured data for all years
+    '''
+
+    return update_processed_data(
+        file_expression,
+        output_path,
+        get_age_df,
+        homogenize_age_data,
+        law_filepath
+    )
+
+
+def update_sexrace_data(file_expression=PATH_ALL_SEX, output_path=PATH_OUT_SEX,
+                        law_filepath=PATH_LAWS):
+    '''
+    Incrementally update homogenized sexrace data, see
+    update_processed_data().
+
+    Args:
+        file_expression: str, regex to capture desired sexrace files
+        output_path: str, pickle file holding the materialized output
+        law_filepath: str, filepath to legislation data
+
+    Returns:
+        pd.DataFrame, demographic structured data for all years
+    '''
+
+    return update_processed_data(
+        file_expression,
+        output_path,
+        get_sexrace_df,
+        homogenize_sexrace_data,
+        law_filepath
+    )
@@ -0,0 +1,421 @@
+''' CODE TO INGEST RAW CENSUS SPREADSHEETS DIRECTLY '''
+
+import glob
+import os
+
+from voter_suppression_analysis import cache, processing
+from voter_suppression_analysis.lazy import lazy_import
+
+# imported on first use
+pd = lazy_import('pandas')
+
+
+# filepath expressions for raw data
+data_path = 'data'
+PATH_RAW_AGE = os.path.join(data_path, 'raw', 'turnout_*_age.*')
+PATH_RAW_SEX = os.path.join(data_path, 'raw', 'turnout_*_sexrace.*')
+
+# preferred raw format when a year is published in several
+RAW_FORMATS = ['.csv', '.xlsx', '.xls', '.ods']
+
+# keywords identifying the measure and kind of each raw column, checked
+# in order so that e.g. 'Total Citizen Population' is a citizen count
+MEASURE_KEYWORDS = [
+    ('vote', 'voted'),
+    ('registered', 'registered'),
+    ('citizen', 'citizen'),
+    ('population', 'population')
+]
+
+CI_KEYWORDS = ['confidence', 'margin', 'moe', 'ci_']
+PERCENT_KEYWORD = 'percent'
+
+# raw state labels that differ from the clean files
+RAW_STATE_ALIASES = {'ALL': 'UNITED STATES'}
+
+# tables with state section rows open with national figures, unlabelled
+NATIONAL_LABEL = 'UNITED STATES'
+
+# minimum number of numeric cells marking the first data row
+MIN_DATA_CELLS = 3
+
+# (measure, kind) of raw columns feeding each stream column, in order of
+# preference; columns not listed are left empty
+AGE_FIELDS = {
+    'Total': [('population', 'count'), ('citizen', 'count')],
+    'Total Registered': [('registered', 'count')],
+    'Percent registered (18+)': [('registered', 'percent')],
+    'CI Registered': [('registered', 'ci')],
+    'Total Voted': [('voted', 'count')],
+    'Percent voted (18+)': [('voted', 'percent')],
+    'CI Voted': [('voted', 'ci')]
+}
+
+SEX_FIELDS = {
+    'Population (18+)': [('population', 'count')],
+    'Total Citizen': [('citizen', 'count')],
+    'Percent Citizen': [('citizen', 'percent')],
+    'CI Citizen': [('citizen', 'ci')],
+    'Total Registered': [('registered', 'count')],
+    'Percent Registered (18+)': [('registered', 'percent')],
+    'CI Registered': [('registered', 'ci')],
+    'Total Voted': [('voted', 'count')],
+    'Percent Voted (18+)': [('voted', 'percent')],
+    'CI Voted': [('voted', 'ci')]
+}
+
+STREAMS = {
+    'age': (processing.AGE_SCHEMA, AGE_FIELDS),
+    'sexrace': (processing.SEX_SCHEMA, SEX_FIELDS)
+}
+
+
+def read_raw_sheet(file_path):
+    '''
+    Load the first sheet of a raw Census file as a grid of cells, without
+    interpreting any rows as headers.
+
+    Args:
+        file_path: str, raw .csv, .xls, .xlsx or .ods file
+
+    Returns:
+        pd.DataFrame, raw cells with positional column labels
+    '''
+
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension == '.csv':
+        return pd.read_csv(
+            file_path,
+            header=None,
+            dtype=str,
+            encoding='utf-8-sig',
+            skip_blank_lines=False
+        )
+
+    if extension == '.ods':
+        return pd.read_excel(file_path, header=None, engine='odf')
+
+    if extension in RAW_FORMATS:
+        return pd.read_excel(file_path, header=None)
+
+    raise ValueError('Raw file %s must be csv/xls/xlsx/ods.' % file_path)
+
+
+def to_number(cells):
+    '''
+    Convert raw cells to numbers, dropping thousands separators. Symbols
+    such as '(B)' or '-' become NaN.
+
+    Args:
+        cells: pd.Series or pd.DataFrame, raw cells
+
+    Returns:
+        same type as cells, numeric values
+    '''
+
+    if isinstance(cells, pd.DataFrame):
+        return cells.apply(to_number)
+
+    text = cells.astype(str).str.strip()
+    text = text.str.replace(processing.COMMA_SYMBOL, '', regex=False)
+    return pd.to_numeric(text, errors='coerce')
+
+
+def find_header(df_raw):
+    '''
+    Locate the header block of a raw sheet: the rows above the first data
+    row that label at least two columns. Title, note and blank rows above
+    the table are skipped.
+
+    Args:
+        df_raw: pd.DataFrame, output of read_raw_sheet()
+
+    Returns:
+        (list of int, int), header row positions and first data row position
+    '''
+
+    numeric_cells = to_number(df_raw).notna().sum(axis=1)
+    data_rows = numeric_cells.index[numeric_cells >= MIN_DATA_CELLS]
+
+    if len(data_rows) == 0:
+        raise ValueError('No data rows found in raw sheet.')
+
+    first_data = df_raw.index.get_loc(data_rows[0])
+    labelled = df_raw.iloc[:first_data].notna().sum(axis=1) >= 2
+    header_rows = [i for i, is_header in enumerate(labelled) if is_header]
+
+    return header_rows, first_data
+
+
+def column_labels(df_raw, header_rows):
+    '''
+    Combine a possibly multi-row header into one label per column by joining
+    each column's header cells top to bottom.
+
+    Args:
+        df_raw: pd.DataFrame, output of read_raw_sheet()
+        header_rows: list of int, header row positions from find_header()
+
+    Returns:
+        list of str, lower-case label per column ('' if unlabelled)
+    '''
+
+    df_header = df_raw.iloc[header_rows].fillna('').astype(str)
+
+    return [
+        ' '.join(' '.join(df_header[col]).split()).lower()
+        for col in df_header.columns
+    ]
+
+
+def classify_columns(labels, first_field):
+    '''
+    Determine the (measure, kind) of each value column from its label. Kind
+    is one of 'count', 'percent' or 'ci'. Columns without a measure in their
+    label inherit one from their neighbours: a bare 'Total' takes the
+    measure of the percentage after it, and a confidence interval that of
+    the percentage before it. Citizen-based rates of registering or voting
+    have no place in the clean schema and are marked None, with their CIs.
+
+    Args:
+        labels: list of str, output of column_labels()
+        first_field: int, position of the first value column
+
+    Returns:
+        dict, column position to (measure, kind) or None
+    '''
+
+    def measure_of(label):
+        for keyword, measure in MEASURE_KEYWORDS:
+            if keyword in label:
+                return measure
+        return None
+
+    def kind_of(label):
+        if any(keyword in label for keyword in CI_KEYWORDS):
+            return 'ci'
+        if PERCENT_KEYWORD in label:
+            return 'percent'
+        return 'count'
+
+    fields = {}
+    previous = None
+
+    for pos in range(first_field, len(labels)):
+        label = labels[pos]
+        kind = kind_of(label)
+        measure = measure_of(label)
+
+        if kind == 'ci':
+            field = (previous[0], 'ci') if previous else None
+
+        elif kind == 'count' and measure is None:
+            following = labels[pos + 1] if pos + 1 < len(labels) else ''
+            if kind_of(following) == 'percent' and measure_of(following):
+                measure = measure_of(following)
+            field = (measure or 'population', 'count')
+
+        elif kind == 'percent' and measure in ('registered', 'voted') \
+                and 'citizen' in label:
+            field = None
+
+        else:
+            field = (measure or (previous or (None,))[0], kind)
+
+        fields[pos] = field
+        previous = field
+
+    return fields
+
+
+def parse_raw_sheet(df_raw, stream, year):
+    '''
+    Turn a raw Census sheet into the clean column layout of a stream.
+    Handles state names repeated on every row, given once per block, or on
+    their own section rows with dot-indented groups below (where the rows
+    before the first section row are national figures).
+
+    Args:
+        df_raw: pd.DataFrame, output of read_raw_sheet()
+        stream: str, 'age' or 'sexrace'
+        year: int, election year of the sheet
+
+    Returns:
+        pd.DataFrame, same layout as processing.get_age_df() or
+        processing.get_sexrace_df()
+    '''
+
+    if stream not in STREAMS:
+        raise ValueError('Stream %s must be age/sexrace.' % stream)
+
+    schema, stream_fields = STREAMS[stream]
+
+    # whitespace-only cells are empty
+    df_raw = df_raw.replace(r'^\s*$', float('nan'), regex=True)
+    header_rows, first_data = find_header(df_raw)
+
+    # value columns start at the first number of the first data row
+    first_numbers = to_number(df_raw.iloc[first_data]).notna().tolist()
+    first_field = first_numbers.index(True)
+
+    labels = column_labels(df_raw, header_rows)
+    fields = classify_columns(labels, first_field)
+
+    # walk the rows, tracking the state of the current section
+    known_states = set(processing.state_index().index)
+    known_states |= set(RAW_STATE_ALIASES)
+
+    body = df_raw.iloc[max(header_rows, default=-1) + 1:]
+    has_values = body.iloc[:, first_field:].notna().any(axis=1).tolist()
+
+    rows = []
+    state = NATIONAL_LABEL if first_field == 1 else None
+
+    for values, (_, row) in zip(has_values, body.iterrows()):
+        first = row.iloc[0]
+        first = str(first).strip() if pd.notna(first) else None
+
+        if first_field >= 2:
+            if first is not None and (values or first.upper() in known_states):
+                state = first
+            group = row.iloc[first_field - 1]
+        elif values:
+            group = first
+        else:
+            if first is not None and first.upper() in known_states:
+                state = first
+            continue
+
+        if not values or pd.isna(group) or state is None:
+            continue
+
+        rows.append([state, str(group)] + row.iloc[first_field:].tolist())
+
+    df_body = pd.DataFrame(
+        rows,
+        columns=['STATE', schema['label']] + list(fields)
+    )
+
+    # pick the raw column for each clean column
+    df_out = df_body[['STATE', schema['label']]].copy()
+
+    for col, candidates in stream_fields.items():
+        matches = [
+            pos for candidate in candidates
+            for pos, field in fields.items() if field == candidate
+        ]
+
+        if matches:
+            df_out[col] = to_number(df_body[matches[0]])
+        else:
+            df_out[col] = float('nan')
+
+    # clean up format in the same way as processing.read_census_file()
+    df_out['STATE'] = df_out['STATE'].str.upper().replace(RAW_STATE_ALIASES)
+    df_out[schema['label']] = df_out[schema['label']].str.strip()
+    df_out[schema['label']] = df_out[schema['label']].str.lstrip(
+        processing.PERIOD_SYMBOL
+    )
+    df_out['Year'] = str(year)
+
+    return df_out[schema['columns']]
+
+
+def read_raw_file(file_path, stream, year=None, cache_dir=cache.CACHE_PATH):
+    '''
+    Read and parse one raw Census file, caching the parsed sheet keyed on
+    the file contents and this parser's code.
+
+    Args:
+        file_path: str, raw .csv, .xls, .xlsx or .ods file
+        stream: str, 'age' or 'sexrace'
+        year: int, election year, taken from the file name if None
+        cache_dir: str, cache directory, or None to disable caching
+
+    Returns:
+        pd.DataFrame, same layout as processing.get_age_df() or
+        processing.get_sexrace_df()
+    '''
+
+    if year is None:
+        match = processing.YEAR_PATTERN.search(os.path.basename(file_path))
+
+        if match is None:
+            raise ValueError('No year in raw file name %s.' % file_path)
+
+        year = int(match.group())
+
+    def build():
+        return parse_raw_sheet(read_raw_sheet(file_path), stream, year)
+
+    if cache_dir is None:
+        return build()
+
+    key = cache.cache_key(
+        'raw',
+        stream,
+        str(year),
+        cache.code_version(),
+        processing.file_digest(__file__),
+        processing.file_digest(file_path)
+    )
+
+    return cache.cached_frame(cache_dir, key, build)
+
+
+def raw_file_paths(file_expression):
+    '''
+    Find raw files, keeping one per year where a year was published in
+    several formats (see RAW_FORMATS).
+
+    Args:
+        file_expression: str, regex to capture desired raw files
+
+    Returns:
+        list of str, raw files in year order
+    '''
+
+    by_year = {}
+
+    for file_path in processing.sort_by_year(glob.glob(file_expression)):
+        stem, extension = os.path.splitext(file_path)
+        extension = extension.lower()
+
+        if extension not in RAW_FORMATS:
+            continue
+
+        current = by_year.get(stem)
+        rank = RAW_FORMATS.index(extension)
+
+        if current is None or rank < RAW_FORMATS.index(current[1]):
+            by_year[stem] = (file_path, extension)
+
+    return [file_path for file_path, _ in by_year.values()]
+
+
+def combine_raw_data(stream, file_expression,
+                     law_filepath=processing.PATH_LAWS,
+                     cache_dir=cache.CACHE_PATH):
+    '''
+    Raw-file counterpart of processing.combine_age_data() and
+    processing.combine_sexrace_data(): parse every raw year file, combine
+    into one pd.DataFrame and attach legislative data columns.
+
+    Args:
+        stream: str, 'age' or 'sexrace'
+        file_expression: str, regex to capture desired raw files
+        law_filepath: str, filepath to legislation data
+        cache_dir: str, cache directory, or None to disable caching
+
+    Returns:
+        pd.DataFrame, combined data for all years
+    '''
+
+    df_list = [
+        read_raw_file(file_path, stream, cache_dir=cache_dir)
+        for file_path in raw_file_paths(file_expression)
+    ]
+
+    combined = pd.concat(df_list, axis=0, ignore_index=True)
+    return processing.attach_laws(combined, law_filepath)
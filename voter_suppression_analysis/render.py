@@ -0,0 +1,269 @@
+''' CODE TO RENDER STATIC DASHBOARD SNAPSHOTS '''
+
+import argparse
+import copy
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# run as a script from the package folder
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath('..'))
+
+from voter_suppression_analysis import assets, cache, generate
+from voter_suppression_analysis.lazy import lazy_import
+
+# imported on first use
+pd = lazy_import('pandas')
+vlc = lazy_import('vl_convert')
+
+
+# snapshot location
+#OUTPUT_DIR = 'figures/snapshots'
+OUTPUT_DIR = os.path.join('figures', 'snapshots')
+
+# supported image formats and their vl-convert renderers
+RENDERERS = {
+    'png': 'vegalite_to_png',
+    'svg': 'vegalite_to_svg'
+}
+
+# oldest Vega-Lite bundled with vl-convert, closest to the v4 specs
+VL_VERSION = '5.8'
+
+# selections fixed per snapshot, by figure: (year selection, group selection)
+SNAPSHOT_SELECTIONS = {
+    'age': (generate.SELECT_NAME_YR, generate.SELECT_NAME_AGE),
+    'sexrace': (generate.SELECT_NAME_YR, generate.SELECT_NAME_SEX),
+    'voted': (generate.SELECT_NAME_YR, None),
+    'registered': (generate.SELECT_NAME_YR, None)
+}
+
+# groups offered by each figure's dropdown, maps show totals only
+SNAPSHOT_GROUPS = {
+    'age': generate.CATEGORIES_AGE,
+    'sexrace': generate.CATEGORIES_SEX,
+    'voted': [None],
+    'registered': [None]
+}
+
+# spec keys holding nested views, which may define selections
+COMPOSITION_KEYS = ['vconcat', 'hconcat', 'concat', 'layer', 'spec']
+
+# compiled specs, one per figure, set once in every worker process
+TEMPLATES = {}
+
+
+def set_templates(templates):
+    '''
+    Store compiled spec templates for the current process. Used as the
+    process pool initializer, so each worker receives them only once.
+
+    Args:
+        templates: dict, figure name to Vega-Lite spec dict
+
+    No return value. Templates are kept in TEMPLATES.
+    '''
+
+    TEMPLATES.clear()
+    TEMPLATES.update(templates)
+
+
+def set_selection_state(spec, state):
+    '''
+    Set the initial value of named selections in a spec and its nested
+    views.
+
+    Args:
+        spec: dict, Vega-Lite spec, modified in place
+        state: dict, selection name to initial value, e.g.
+            {'SelectorName': {'Year': 2004}}
+
+    No return value. Spec is modified in place.
+    '''
+
+    for name, selection in spec.get('selection', {}).items():
+        if name in state:
+            selection['init'] = state[name]
+
+    for key in COMPOSITION_KEYS:
+        children = spec.get(key, [])
+
+        for child in children if isinstance(children, list) else [children]:
+            set_selection_state(child, state)
+
+
+def snapshot_name(figure, year, group, fmt):
+    '''
+    Build the file name of a snapshot.
+
+    Args:
+        figure: str, figure name, one of SNAPSHOT_SELECTIONS
+        year: int, election year
+        group: str, demographic group, or None for maps
+        fmt: str, image format, one of RENDERERS
+
+    Returns:
+        str, e.g. 'sexrace_2004_asian_pacific_islander.png'
+    '''
+
+    parts = [figure, str(year)]
+
+    if group is not None:
+        label = group.lower().replace('+', ' plus')
+        parts.append(re.sub(r'[^a-z0-9]+', '_', label).strip('_'))
+
+    return '_'.join(parts) + '.' + fmt
+
+
+def render_snapshot(figure, year, group, file_path, fmt='png'):
+    '''
+    Render one figure for one year and group from its template. Only the
+    selection state differs between snapshots of a figure.
+
+    Args:
+        figure: str, figure name, one of TEMPLATES
+        year: int, election year
+        group: str, demographic group, or None for maps
+        file_path: str, location at which to store the image
+        fmt: str, image format, one of RENDERERS
+
+    Returns:
+        str, file_path
+    '''
+
+    year_name, group_name = SNAPSHOT_SELECTIONS[figure]
+    state = {year_name: {'Year': year}}
+
+    if group_name is not None:
+        state[group_name] = {'Group': group}
+
+    spec = copy.deepcopy(TEMPLATES[figure])
+    set_selection_state(spec, state)
+
+    renderer = getattr(vlc, RENDERERS[fmt])
+    image = renderer(spec, vl_version=VL_VERSION)
+    mode = 'wb' if isinstance(image, bytes) else 'w'
+
+    with open(file_path, mode) as file:
+        file.write(image)
+
+    return file_path
+
+
+def render_snapshots(df_age, df_sex, output_dir=OUTPUT_DIR, fmt='png',
+                     years=None, max_workers=None, precision=None,
+                     cache_dir=None):
+    '''
+    Render every figure for every year and group combination, spread
+    over a process pool. Each figure is compiled (or taken from the spec
+    cache) once into a template, maps use the bundled state geometry.
+
+    Args:
+        df_age: pd.DataFrame, all years of age data (cleaned)
+        df_sex: pd.DataFrame, all years of sexrace data (cleaned)
+        output_dir: str, folder in which to store images
+        fmt: str, image format, one of RENDERERS
+        years: list of int, election years, all dashboard years if None
+        max_workers: int, process pool size
+        precision: int, grid steps of map geometry, see
+            assets.states_topology()
+        cache_dir: str, spec cache directory, see generate.generate_specs()
+
+    Returns:
+        list of str, rendered image locations
+    '''
+
+    if fmt not in RENDERERS:
+        raise ValueError('Format %s must be png/svg.' % fmt)
+
+    if years is None:
+        years = range(generate.START_YEAR, generate.END_YEAR + 1, 2)
+
+    geometry = assets.geometry_data(assets.states_topology(precision))
+    templates = generate.generate_specs(df_age, df_sex, geometry, cache_dir)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    tasks = [
+        (figure, year, group)
+        for figure in templates
+        for year in years
+        for group in SNAPSHOT_GROUPS[figure]
+    ]
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=set_templates,
+        initargs=(templates,)
+    ) as pool:
+        futures = []
+
+        for figure, year, group in tasks:
+            file_name = snapshot_name(figure, year, group, fmt)
+            futures.append(pool.submit(
+                render_snapshot,
+                figure,
+                year,
+                group,
+                os.path.join(output_dir, file_name),
+                fmt
+            ))
+
+        return [future.result() for future in futures]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--format',
+        choices=sorted(RENDERERS),
+        default='png',
+        help='image format of the snapshots'
+    )
+    parser.add_argument(
+        '--output',
+        default=OUTPUT_DIR,
+        help='folder in which to store the snapshots'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='number of rendering processes'
+    )
+    parser.add_argument(
+        '--precision',
+        type=int,
+        default=None,
+        help='grid steps of map geometry, e.g. 10000'
+    )
+    args = parser.parse_args()
+
+    # retrieve and process data, reusing cached frames for unchanged inputs
+    df_age_cleaned = cache.load_stream(
+        'age',
+        generate.DATA_PATH_AGE,
+        generate.DATA_PATH_LAW
+    )
+    df_sex_cleaned = cache.load_stream(
+        'sexrace',
+        generate.DATA_PATH_SEX,
+        generate.DATA_PATH_LAW
+    )
+
+    # render all snapshots and finish
+    file_paths = render_snapshots(
+        df_age_cleaned,
+        df_sex_cleaned,
+        args.output,
+        args.format,
+        max_workers=args.workers,
+        precision=args.precision,
+        cache_dir=generate.CHART_CACHE_PATH
+    )
+    print('%d snapshots rendered, location: /%s.' % (
+        len(file_paths),
+        args.output
+    ))
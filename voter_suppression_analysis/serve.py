@@ -0,0 +1,355 @@
+''' CODE TO SERVE THE DASHBOARD FROM MEMORY OVER HTTP '''
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# run as a script from the package folder
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath('..'))
+
+from voter_suppression_analysis import cache, generate
+from voter_suppression_analysis.lazy import lazy_import
+
+# imported on first use
+pd = lazy_import('pandas')
+alt = lazy_import('altair')
+
+
+# default address of the server
+HOST = '127.0.0.1'
+PORT = 8000
+
+# number of distinct responses kept in memory
+RESPONSE_CACHE_SIZE = 512
+
+# columns every data slice keeps, whichever metric is requested
+SLICE_KEY_COLUMNS = ['STATE', 'Year', 'Group']
+
+# request paths, with the captured name of the requested resource
+ROUTES = {
+    'page': re.compile(r'/(?:index\.html)?'),
+    'spec': re.compile(r'/specs/(?P<name>[\w-]+)\.json'),
+    'dataset': re.compile(r'/datasets/(?P<name>[\w-]+)\.json'),
+    'slice': re.compile(r'/data/(?P<name>[\w-]+)\.json')
+}
+
+# content types of the responses
+HTML_TYPE = 'text/html; charset=utf-8'
+JSON_TYPE = 'application/json'
+
+
+def data_slice(df_chart, year=None, group=None, metric=None):
+    '''
+    Select the chart rows of one year and/or group, keeping one metric or
+    all chart columns.
+
+    Args:
+        df_chart: pd.DataFrame, chart-ready data, see
+            generate.prepare_chart_data()
+        year: int, election year, None for all years
+        group: str, demographic group, None for all groups
+        metric: str, column to keep besides SLICE_KEY_COLUMNS, None for all
+            of generate.CHART_COLUMNS
+
+    Returns:
+        pd.DataFrame, selected rows and columns
+    '''
+
+    metrics = [col for col in generate.CHART_COLUMNS
+               if col not in SLICE_KEY_COLUMNS]
+
+    if metric is not None and metric not in metrics:
+        raise ValueError('Metric %s must be one of %s.' % (metric, metrics))
+
+    kept = pd.Series(True, index=df_chart.index)
+
+    if year is not None:
+        kept &= df_chart.Year == year
+
+    if group is not None:
+        kept &= df_chart.Group == group
+
+    columns = SLICE_KEY_COLUMNS + ([metric] if metric else metrics)
+    return df_chart.loc[kept, columns]
+
+
+def etag(body):
+    '''
+    Build the entity tag of a response body.
+
+    Args:
+        body: bytes, response body
+
+    Returns:
+        str, quoted tag, e.g. '"1f2e..."'
+    '''
+
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def etag_matches(tag, header):
+    '''
+    Check a tag against an If-None-Match header: a comma-separated list of
+    tags, weak ('W/' prefixed) or strong, compared weakly, or '*' to match
+    any tag.
+
+    Args:
+        tag: str, quoted tag of the current response, see etag()
+        header: str, If-None-Match header value, '' when absent
+
+    Returns:
+        bool, whether the client's copy is still valid
+    '''
+
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+
+        if candidate == '*' or candidate == tag:
+            return True
+
+    return False
+
+
+class DashboardServer(ThreadingHTTPServer):
+    '''
+    HTTP server holding homogenized data in memory. Specs are compiled on
+    first request, and every response is built once, then served from
+    memory with an ETag so that clients can revalidate cheaply.
+
+    Args:
+        address: tuple, (host, port) to listen on, port 0 for any
+        df_age: pd.DataFrame, all years of age data (cleaned)
+        df_sex: pd.DataFrame, all years of sexrace data (cleaned)
+        cache_dir: str, spec cache directory, see generate.generate_specs()
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, address, df_age, df_sex, cache_dir=None):
+        super().__init__(address, DashboardHandler)
+
+        self.frames = {'age': df_age, 'sexrace': df_sex}
+        self.cache_dir = cache_dir
+
+        # chart-ready rows of each stream, sliced per request
+        self.chart_frames = {
+            stream: generate.prepare_chart_data(df_in)
+            for stream, df_in in self.frames.items()
+        }
+
+        self.response = functools.lru_cache(maxsize=RESPONSE_CACHE_SIZE)(
+            self.build_response
+        )
+
+    @functools.cached_property
+    def compiled(self):
+        '''
+        dict, figure name to compiled Vega-Lite spec with inline datasets
+        '''
+
+        return generate.generate_specs(
+            self.frames['age'],
+            self.frames['sexrace'],
+            cache_dir=self.cache_dir
+        )
+
+    @functools.cached_property
+    def specs(self):
+        '''
+        dict, figure name to compiled spec, plus the composed 'dashboard',
+        with datasets linked to their URLs on this server
+        '''
+
+        specs = dict(self.compiled)
+        specs['dashboard'] = generate.compose_dashboard(self.compiled)
+
+        return {
+            name: generate.link_datasets(spec, {
+                dataset: {
+                    'url': '/datasets/%s.json' % dataset,
+                    'format': {'type': 'json'}
+                }
+                for dataset in spec.get('datasets', {})
+            })
+            for name, spec in specs.items()
+        }
+
+    @functools.cached_property
+    def datasets(self):
+        '''
+        dict, dataset name to inline values, of every compiled figure
+        '''
+
+        return {
+            name: values
+            for spec in self.compiled.values()
+            for name, values in spec.get('datasets', {}).items()
+        }
+
+    def build_response(self, path, query):
+        '''
+        Build the response to a request, cached per path and query.
+
+        Args:
+            path: str, request path, e.g. '/data/age.json'
+            query: tuple, sorted (parameter, value) pairs
+
+        Returns:
+            tuple, (content type, body bytes, ETag)
+        '''
+
+        for route, pattern in ROUTES.items():
+            match = pattern.fullmatch(path)
+
+            if match is not None:
+                break
+        else:
+            raise KeyError(path)
+
+        name = match.groupdict().get('name')
+
+        if route == 'page':
+            html = alt.utils.html.spec_to_html(
+                self.specs['dashboard'],
+                mode='vega-lite',
+                vega_version=alt.VEGA_VERSION,
+                vegalite_version=alt.VEGALITE_VERSION,
+                vegaembed_version=alt.VEGAEMBED_VERSION
+            )
+            content_type, body = HTML_TYPE, html.encode('utf-8')
+        elif route == 'spec':
+            body = json.dumps(self.specs[name], separators=(',', ':'))
+            content_type, body = JSON_TYPE, body.encode('utf-8')
+        elif route == 'dataset':
+            body = json.dumps(self.datasets[name], separators=(',', ':'))
+            content_type, body = JSON_TYPE, body.encode('utf-8')
+        else:
+            params = dict(query)
+            year = params.get('year')
+
+            if year is not None and not year.isdigit():
+                raise ValueError('Year %s must be a number.' % year)
+
+            df_slice = data_slice(
+                self.chart_frames[name],
+                year=None if year is None else int(year),
+                group=params.get('group'),
+                metric=params.get('metric')
+            )
+            content_type = JSON_TYPE
+            body = df_slice.to_json(orient='records').encode('utf-8')
+
+        return content_type, body, etag(body)
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    '''
+    Request handler of DashboardServer, answering GET and HEAD requests:
+        - /: the dashboard page
+        - /specs/NAME.json: spec of a figure, or of the 'dashboard'
+        - /datasets/NAME.json: dataset referenced by the specs
+        - /data/STREAM.json: chart rows of 'age' or 'sexrace', filtered by
+          the optional year, group and metric parameters
+    '''
+
+    def send_cached(self, send_body=True):
+        '''
+        Answer the current request from the server's response cache.
+
+        Args:
+            send_body: bool, False to send the headers only (HEAD)
+
+        No return value. Response is written to the client.
+        '''
+
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        query = tuple(sorted(
+            (param, values[-1]) for param, values in params.items()
+        ))
+
+        try:
+            content_type, body, tag = self.server.response(url.path, query)
+        except KeyError:
+            self.send_error(404, 'Not found: %s' % url.path)
+            return
+        except ValueError as error:
+            self.send_error(400, str(error))
+            return
+
+        # unchanged content, the client's copy is still valid
+        if etag_matches(tag, self.headers.get('If-None-Match', '')):
+            self.send_response(304)
+            self.send_header('ETag', tag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', tag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_cached()
+
+    def do_HEAD(self):
+        self.send_cached(send_body=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--host',
+        default=HOST,
+        help='address to listen on'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=PORT,
+        help='port to listen on'
+    )
+    args = parser.parse_args()
+
+    # retrieve and process data once, reusing cached frames
+    df_age_cleaned = cache.load_stream(
+        'age',
+        generate.DATA_PATH_AGE,
+        generate.DATA_PATH_LAW
+    )
+    df_sex_cleaned = cache.load_stream(
+        'sexrace',
+        generate.DATA_PATH_SEX,
+        generate.DATA_PATH_LAW
+    )
+
+    server = DashboardServer(
+        (args.host, args.port),
+        df_age_cleaned,
+        df_sex_cleaned,
+        cache_dir=generate.CHART_CACHE_PATH
+    )
+    print('Dashboard served, location: http://%s:%d/.' % (
+        args.host,
+        server.server_port
+    ))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,392 @@
+''' CODE TO GENERATE SYNTHETIC CENSUS-SHAPED DATA FOR SCALE TESTING '''
+
+import argparse
+import os
+import sys
+
+# run as a script from the package folder
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath('..'))
+
+from voter_suppression_analysis import processing
+from voter_suppression_analysis.lazy import lazy_import
+
+# imported on first use
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+
+# default folder of generated year files
+SYNTHETIC_PATH = os.path.join('data', 'synthetic')
+
+# data streams and their raw column layouts
+STREAM_COLUMNS = {
+    'age': processing.AGE_COLUMNS,
+    'sexrace': processing.SEX_COLUMNS
+}
+
+# first election year generated, and years between elections
+START_YEAR = 2000
+YEAR_STEP = 2
+
+# raw group labels of each stream, as spelled in different years of the
+# Census tables, with each group's typical share of the total population
+AGE_LAYOUTS = [
+    {
+        'Total': 1.0, '18 to 24': 0.13, '25 to 44': 0.38, '45 to 64': 0.33,
+        '65 to 74': 0.09, '75+': 0.07
+    },
+    {
+        'Total': 1.0, '18 to 25': 0.14, '25 to 35': 0.17, '35 to 45': 0.18,
+        '45 to 55': 0.19, '55 to 65': 0.15, '65 to 75': 0.09, '75+': 0.08
+    },
+    {
+        'Total': 1.0, '18 to 24': 0.12, '25 to 34': 0.17, '35 to 44': 0.16,
+        '45 to 64': 0.34, '65+': 0.21
+    }
+]
+
+SEX_LAYOUTS = [
+    {
+        'Total': 1.0, 'Male': 0.48, 'Female': 0.52, 'N-H White': 0.7,
+        'N-H Black': 0.12, 'API': 0.04, 'Hispanic': 0.1
+    },
+    {
+        'Total': 1.0, 'Male': 0.48, 'Female': 0.52,
+        'Non-Hispanic White': 0.68, 'Non-Hispanic Black': 0.12,
+        'Asian and Pacific Islander': 0.045, 'Hispanic (of any race)': 0.11
+    },
+    {
+        'Total': 1.0, 'Male': 0.48, 'Female': 0.52, 'White alone': 0.78,
+        'White non-Hispanic alone': 0.64, 'Black alone': 0.12,
+        'Asian alone': 0.06, 'Hispanic (of any race)': 0.15
+    }
+]
+
+STREAM_LAYOUTS = {'age': AGE_LAYOUTS, 'sexrace': SEX_LAYOUTS}
+
+# spellings of the nationwide rows found in the Census tables
+NATIONAL_SPELLINGS = ['US', 'UNITED STATES', 'United States']
+
+# name of sub-state areas, e.g. 'ALABAMA COUNTY 2'
+AREA_NAME = '%s COUNTY %d'
+
+# first ID of sub-state areas, past those of the states, see area_places()
+AREA_ID_START = 1000
+
+# label of groups beyond the layout, e.g. 'Other group 1'
+EXTRA_GROUP_NAME = 'Other group %d'
+EXTRA_GROUP_SHARE = 0.02
+
+# typical state population in thousands, and its spread (log scale)
+STATE_POPULATION = 4500
+STATE_SPREAD = 1.0
+
+# markers of empty counts, and of percentages on too small a base
+MISSING_COUNT = '-'
+SMALL_BASE = '(B)'
+SMALL_BASE_LIMIT = 75
+
+
+def year_style(rng, stream):
+    '''
+    Draw the spelling conventions of one year file, which vary from year to
+    year in the Census tables.
+
+    Args:
+        rng: np.random.Generator, the file's random generator
+        stream: str, 'age' or 'sexrace'
+
+    Returns:
+        dict, layout (group labels to shares), national spelling, and
+        whether labels carry leading dots, counts carry thousands
+        separators and state names are upper case
+    '''
+
+    layouts = STREAM_LAYOUTS[stream]
+
+    return {
+        'layout': layouts[rng.integers(len(layouts))],
+        'national': NATIONAL_SPELLINGS[rng.integers(len(NATIONAL_SPELLINGS))],
+        'dots': bool(rng.integers(2)),
+        'commas': bool(rng.integers(2)),
+        'upper': bool(rng.integers(2))
+    }
+
+
+def format_counts(counts, commas):
+    '''
+    Write counts the way the Census tables do, empty counts as a dash.
+
+    Args:
+        counts: np.ndarray of int, counts in thousands
+        commas: bool, whether to use thousands separators
+
+    Returns:
+        list of str, formatted counts
+    '''
+
+    spec = '{:,}' if commas else '{}'
+    return [spec.format(count) if count else MISSING_COUNT
+            for count in counts.tolist()]
+
+
+def format_percents(numerators, bases, rng):
+    '''
+    Write percentages and their confidence intervals, both withheld when
+    the base is too small, as in the Census tables.
+
+    Args:
+        numerators: np.ndarray of int, counts in thousands
+        bases: np.ndarray of int, base counts in thousands
+        rng: np.random.Generator, the file's random generator
+
+    Returns:
+        tuple, (list of str percentages, list of str intervals)
+    '''
+
+    small = bases < SMALL_BASE_LIMIT
+    percents = np.round(100 * numerators / np.maximum(bases, 1), 1)
+    intervals = np.round(
+        np.clip(60 / np.sqrt(np.maximum(bases, 1)), 0.2, 9.9)
+        * rng.uniform(0.8, 1.2, len(bases)),
+        1
+    )
+
+    return (
+        [SMALL_BASE if withheld else str(value)
+         for withheld, value in zip(small.tolist(), percents.tolist())],
+        [SMALL_BASE if withheld else str(value)
+         for withheld, value in zip(small.tolist(), intervals.tolist())]
+    )
+
+
+def area_places(areas):
+    '''
+    Name and number the sub-state areas of synthetic data, e.g. for
+    processing.known_places(). IDs follow on from AREA_ID_START, state by
+    state, and fit the compact 'id' dtype of processing.COMPACT_DTYPES.
+
+    Args:
+        areas: int, sub-state areas per state
+
+    Returns:
+        list of (str, int) pairs, upper-case name and ID of each area
+    '''
+
+    names = [AREA_NAME % (state, num)
+             for state in processing.STATE_NAMES[:-1]
+             for num in range(1, areas + 1)]
+
+    return list(zip(names, range(AREA_ID_START, AREA_ID_START + len(names))))
+
+
+def synthetic_frame(stream, year, seed=0, areas=0, extra_groups=0):
+    '''
+    Generate one year of Census-shaped data, as raw strings in the layout
+    of the stream's CSV files. The year's spelling conventions are drawn
+    at random, see year_style(). Rows are the nation, then every state,
+    each followed by its sub-state areas, with every group of the year's
+    layout plus any extra groups. The nation sums its states.
+
+    Processing only knows states and the groups of SEX_GROUPS and
+    AGE_BRACKETS: areas and extra groups stress loading and combining,
+    and are dropped (or, for age areas, kept as unknown states) later,
+    unless the areas are made known, see area_places().
+
+    Args:
+        stream: str, 'age' or 'sexrace'
+        year: int, election year
+        seed: int, seed of the random numbers, the same seed, year and
+            sizes always give the same data
+        areas: int, sub-state areas (e.g. counties) per state
+        extra_groups: int, groups beyond the year's layout
+
+    Returns:
+        pd.DataFrame, raw year data with columns STREAM_COLUMNS[stream]
+    '''
+
+    if stream not in STREAM_COLUMNS:
+        raise ValueError('Stream %s must be age/sexrace.' % stream)
+
+    if areas < 0 or extra_groups < 0:
+        raise ValueError('Areas %s and extra groups %s must not be '
+                         'negative.' % (areas, extra_groups))
+
+    rng = np.random.default_rng([seed, year])
+    style = year_style(rng, stream)
+
+    groups = list(style['layout']) + [
+        EXTRA_GROUP_NAME % num for num in range(1, extra_groups + 1)
+    ]
+    shares = np.array(list(style['layout'].values()) +
+                      [EXTRA_GROUP_SHARE] * extra_groups)
+
+    # states, each followed by its areas, then the nation on top
+    states = processing.STATE_NAMES[:-1]
+    names, populations = [], []
+
+    for state, population in zip(states, np.round(rng.lognormal(
+            np.log(STATE_POPULATION), STATE_SPREAD, len(states))) + 1):
+        area_populations = np.round(
+            population / max(areas, 1) * rng.lognormal(0, 0.5, areas)
+        ) + 1
+
+        names += [state] + [AREA_NAME % (state, num)
+                            for num in range(1, areas + 1)]
+        populations += [population] + area_populations.tolist()
+
+    if not style['upper']:
+        names = [name.title() for name in names]
+
+    # group totals of every place, varying around the typical shares
+    noise = rng.lognormal(0, 0.25, (len(names), len(groups)))
+    noise[:, 0] = 1
+    population = np.round(np.outer(populations, shares) * noise)
+    citizen = np.round(population * rng.uniform(0.85, 1, population.shape))
+    registered = np.round(citizen * rng.uniform(0.55, 0.8, population.shape))
+    voted = np.round(registered * rng.uniform(0.6, 0.9, population.shape))
+
+    state_set = set(states)
+    is_state = np.array([name.upper() in state_set for name in names])
+    counts = {
+        label: np.vstack([values[is_state].sum(axis=0), values])
+        .astype(int).ravel()
+        for label, values in [('population', population),
+                              ('citizen', citizen),
+                              ('registered', registered),
+                              ('voted', voted)]
+    }
+
+    # labels as spelled this year, totals lead undotted
+    labels = [('.' + group if style['dots'] and num else group)
+              for num, group in enumerate(groups)]
+
+    df_out = pd.DataFrame({
+        'STATE': np.repeat([style['national']] + names, len(groups)),
+        'Group': labels * (len(names) + 1)
+    })
+
+    percent_reg, ci_reg = format_percents(
+        counts['registered'], counts['citizen'], rng
+    )
+    percent_voted, ci_voted = format_percents(
+        counts['voted'], counts['citizen'], rng
+    )
+
+    if stream == 'sexrace':
+        percent_citizen, ci_citizen = format_percents(
+            counts['citizen'], counts['population'], rng
+        )
+        df_out['Population (18+)'] = format_counts(
+            counts['population'], style['commas']
+        )
+        df_out['Total Citizen'] = format_counts(
+            counts['citizen'], style['commas']
+        )
+        df_out['Percent Citizen'] = percent_citizen
+        df_out['CI Citizen'] = ci_citizen
+    else:
+        df_out['Total'] = format_counts(counts['citizen'], style['commas'])
+
+    df_out['Total Registered'] = format_counts(
+        counts['registered'], style['commas']
+    )
+    df_out['Percent Registered'] = percent_reg
+    df_out['CI Registered'] = ci_reg
+    df_out['Total Voted'] = format_counts(counts['voted'], style['commas'])
+    df_out['Percent Voted'] = percent_voted
+    df_out['CI Voted'] = ci_voted
+    df_out['Year'] = str(year)
+
+    df_out.columns = STREAM_COLUMNS[stream]
+    return df_out
+
+
+def write_synthetic_data(output_dir=SYNTHETIC_PATH, streams=STREAM_COLUMNS,
+                         years=10, areas=0, extra_groups=0, seed=0):
+    '''
+    Write year files of synthetic Census-shaped data, named like the real
+    files (e.g. '2000_age.csv'), every YEAR_STEP years from START_YEAR.
+    Each year is generated on its own, so adding years or streams leaves
+    the files of the others unchanged.
+
+    Args:
+        output_dir: str, folder receiving the year files
+        streams: list of str, 'age' and/or 'sexrace'
+        years: int, number of election years
+        areas: int, sub-state areas per state, see synthetic_frame()
+        extra_groups: int, groups beyond each year's layout
+        seed: int, seed of the random numbers
+
+    Returns:
+        dict, stream to glob pattern of its year files, e.g. for
+        processing.combine_age_data()
+    '''
+
+    os.makedirs(output_dir, exist_ok=True)
+    expressions = {}
+
+    for stream in streams:
+        for num in range(years):
+            year = START_YEAR + num * YEAR_STEP
+            df_year = synthetic_frame(stream, year, seed, areas, extra_groups)
+            df_year.to_csv(
+                os.path.join(output_dir, '%d_%s.csv' % (year, stream)),
+                index=False
+            )
+
+        expressions[stream] = os.path.join(output_dir, '*_%s.csv' % stream)
+
+    return expressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--output',
+        default=SYNTHETIC_PATH,
+        help='folder receiving the year files'
+    )
+    parser.add_argument(
+        '--streams',
+        nargs='+',
+        choices=list(STREAM_COLUMNS),
+        default=list(STREAM_COLUMNS),
+        help='data streams to generate'
+    )
+    parser.add_argument(
+        '--years',
+        type=int,
+        default=10,
+        help='number of election years'
+    )
+    parser.add_argument(
+        '--areas',
+        type=int,
+        default=0,
+        help='sub-state areas (e.g. counties) per state'
+    )
+    parser.add_argument(
+        '--groups',
+        type=int,
+        default=0,
+        help='groups beyond those of the Census tables'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='seed of the random numbers'
+    )
+    args = parser.parse_args()
+
+    write_synthetic_data(
+        args.output,
+        args.streams,
+        years=args.years,
+        areas=args.areas,
+        extra_groups=args.groups,
+        seed=args.seed
+    )
+    print('Synthetic data generated, location: %s.' % args.output)
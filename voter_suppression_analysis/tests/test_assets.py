@@ -0,0 +1,104 @@
+''' CODE TO TEST OFFLINE MAP GEOMETRY AND VEGA LIBRARIES '''
+
+import json
+import os
+
+import altair as alt
+import pandas as pd
+
+from voter_suppression_analysis.assets import \
+    GEOMETRY_PATH, quantize_topology, ring_area, states_topology, save_html
+
+
+def test_quantize_topology():
+    '''
+    Test the following conditions for quantize_topology():
+        - coarser grids give smaller topologies over the same extent
+        - every state is kept, and no ring turns inside out
+    '''
+
+    with open(GEOMETRY_PATH) as file:
+        topology = json.load(file)
+
+    coarse = quantize_topology(topology, 1000)
+
+    # check size shrinks while the covered extent stays the same
+    assert len(json.dumps(coarse)) < len(json.dumps(topology))
+    assert coarse['transform']['translate'] == \
+        topology['transform']['translate']
+
+    # check states and the orientation of outer rings
+    states = coarse['objects']['states']['geometries']
+    assert len(states) == len(topology['objects']['states']['geometries'])
+
+    arc_points = []
+    for arc in coarse['arcs']:
+        x_pos, y_pos, points = 0, 0, []
+        for x_delta, y_delta in arc:
+            x_pos, y_pos = x_pos + x_delta, y_pos + y_delta
+            points.append((x_pos, y_pos))
+        arc_points.append(points)
+
+    for state in states:
+        polygons = state['arcs'] if state['type'] == 'MultiPolygon' \
+            else [state['arcs']]
+        assert polygons
+        for rings in polygons:
+            assert ring_area(arc_points, rings[0]) != 0
+
+
+def test_states_topology(tmp_path):
+    '''
+    Test the following conditions for states_topology():
+        - re-quantized geometry is cached once per precision
+        - cached geometry is identical to freshly computed geometry
+    '''
+
+    cache_dir = str(tmp_path)
+
+    first = states_topology(2000, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    second = states_topology(2000, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    assert first == second
+
+    # check full precision reads the bundled file without caching
+    assert states_topology(cache_dir=cache_dir)['transform'] != \
+        first['transform']
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_save_html(tmp_path):
+    '''
+    Test the following conditions for save_html():
+        - embedded pages load no scripts from elsewhere
+        - side-loaded pages reference library copies next to them
+    '''
+
+    chart = alt.Chart(pd.DataFrame({'x': [1, 2]})).mark_point().encode(x='x')
+    spec = chart.to_dict()
+
+    # check embedded page
+    embed_path = os.path.join(tmp_path, 'embed.html')
+    save_html(spec, embed_path, 'embed')
+
+    with open(embed_path) as file:
+        html = file.read()
+
+    assert '<script type="text/javascript" src=' not in html
+    assert html.count('<script type="text/javascript">') == 3
+
+    # check side-loaded page
+    side_dir = os.path.join(tmp_path, 'side')
+    os.makedirs(side_dir)
+    side_path = os.path.join(side_dir, 'side.html')
+    save_html(spec, side_path, 'sideload')
+
+    with open(side_path) as file:
+        html = file.read()
+
+    vendor_files = os.listdir(os.path.join(side_dir, 'vendor'))
+    assert len(vendor_files) == 3
+    for file_name in vendor_files:
+        assert 'src="vendor/%s"' % file_name in html
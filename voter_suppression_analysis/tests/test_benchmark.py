@@ -0,0 +1,112 @@
+''' CODE TO TEST PIPELINE BENCHMARKING FUNCTIONALITY '''
+
+import glob
+import os
+from pathlib import Path
+
+from voter_suppression_analysis.processing import \
+    STATE_NAMES, SEX_GROUP_ORDER, combine_age_data, combine_sexrace_data, \
+    homogenize_age_data, homogenize_sexrace_data, known_places, load_laws
+from voter_suppression_analysis.synthetic import area_places
+
+from voter_suppression_analysis.benchmark import \
+    compare_results, run_suite, scale_inputs, SCALES
+
+
+# useful file locations
+CWD = Path(__file__).parent
+data_folder = os.path.join('..', 'data')
+
+EXAMPLE_DIR_AGE = os.path.join(CWD, data_folder, 'samples', 'example_age_folder', '*.csv')
+EXAMPLE_DIR_SEX = os.path.join(CWD, data_folder, 'samples', 'example_sex_folder', '*.csv')
+EXAMPLE_FILE_LAW = os.path.join(CWD, data_folder, 'samples', 'law_01.csv')
+LAW_PATH = os.path.join(CWD, data_folder, 'clean', 'suppression.csv')
+
+
+def test_scale_inputs(tmp_path):
+    '''
+    Test the following conditions for scale_inputs():
+        - every year of the scale is written for both streams
+        - areas inherit the laws of their state
+        - extra groups reach the combined data only
+        - processing keeps every known state and area (with laws, for
+          sexrace) and group, each with an ID
+        - unknown scales raise an error
+    '''
+
+    # smoke test
+    age_expression, sex_expression, law_path = \
+        scale_inputs(str(tmp_path), 10, LAW_PATH)
+    years, areas, extra_groups = SCALES[10]
+
+    # check year files
+    assert len(glob.glob(age_expression)) == len(glob.glob(sex_expression)) \
+        == years
+
+    # check area laws
+    df_laws = load_laws(law_path)
+    assert len(df_laws) == len(load_laws(LAW_PATH)) * (areas + 1)
+    assert df_laws.loc['ALABAMA COUNTY 1'].equals(df_laws.loc['ALABAMA'])
+
+    # check processed data
+    with known_places(area_places(areas)):
+        df_sex_raw = combine_sexrace_data(sex_expression, law_path)
+        df_age = homogenize_age_data(combine_age_data(age_expression,
+                                                      law_path))
+        df_sex = homogenize_sexrace_data(df_sex_raw)
+
+    assert 'Other group %d' % extra_groups in set(df_sex_raw.Group)
+
+    assert set(STATE_NAMES) < set(df_age.STATE)
+    assert df_age.STATE.nunique() == len(STATE_NAMES) * (areas + 1) - areas
+    assert df_age.id.notna().all()
+    assert set(df_sex.STATE) == set(df_laws.index)
+    assert set(df_sex.Group) == set(SEX_GROUP_ORDER)
+
+    # check for unknown scale
+    invalid_scale_caught = False
+    try:
+        scale_inputs(str(tmp_path), 3)
+    except ValueError:
+        invalid_scale_caught = True
+    assert invalid_scale_caught
+
+
+def test_run_suite():
+    '''
+    Test the following conditions for run_suite() and compare_results():
+        - every scale and requested benchmark is measured
+        - the rows of each scale are recorded, and grow with the scale
+        - results compared with themselves have a ratio of 1
+    '''
+
+    # smoke test
+    benchmarks = ['get_age_df', 'homogenize_sexrace_data']
+    suite = run_suite(EXAMPLE_DIR_AGE, EXAMPLE_DIR_SEX, EXAMPLE_FILE_LAW,
+                      scales=[10], benchmarks=benchmarks, repeat=1)
+
+    # check results
+    assert list(suite['results']) == ['real', '10x']
+    for measures in suite['results'].values():
+        assert list(measures) == benchmarks
+        assert all(result['seconds'] > 0 and result['peak_mb'] > 0
+                   for result in measures.values())
+
+    # check rows
+    for stream in ['age', 'sexrace']:
+        assert suite['rows']['10x'][stream]['combined'] > \
+            suite['rows']['real'][stream]['combined']
+
+    # check comparison
+    df_compared = compare_results(suite, suite)
+    assert len(df_compared) == 4
+    assert (df_compared.ratio == 1).all()
+
+    # check for unknown benchmark
+    invalid_benchmark_caught = False
+    try:
+        run_suite(EXAMPLE_DIR_AGE, EXAMPLE_DIR_SEX, EXAMPLE_FILE_LAW,
+                  scales=[], benchmarks=['plot'])
+    except ValueError:
+        invalid_benchmark_caught = True
+    assert invalid_benchmark_caught
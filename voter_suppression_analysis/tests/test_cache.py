@@ -0,0 +1,80 @@
+''' CODE TO TEST ON-DISK CACHING FUNCTIONALITY '''
+
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from voter_suppression_analysis.cache import \
+    cache_key, read_cached, write_cached, load_stream
+
+from voter_suppression_analysis.processing import \
+    combine_age_data, homogenize_age_data
+
+
+# useful constants for file locations
+CWD = Path(__file__).parent
+data_folder = os.path.join('..', 'data')
+
+EXAMPLE_FOLDER_AGE = os.path.join(CWD, data_folder, 'samples', 'example_age_folder')
+EXAMPLE_PATH_LAW = os.path.join(CWD, data_folder, 'samples', 'law_01.csv')
+
+
+def test_write_cached(tmp_path):
+    '''
+        Test the following conditions for write_cached()/read_cached():
+            - missing keys return None
+            - frames round-trip unchanged
+            - frames the columnar formats cannot hold fall back to pickle
+    '''
+
+    cache_dir = str(tmp_path)
+
+    # check empty cache
+    assert read_cached(cache_dir, cache_key('missing')) is None
+
+    # a mixed-type column cannot be stored by Arrow-based formats
+    df_mixed = pd.DataFrame({'STATE': ['ALABAMA', 'ALASKA'], 'CI': [1.5, '-']})
+    key = cache_key('mixed')
+    write_cached(cache_dir, key, df_mixed)
+
+    # check frame is intact and stored as pickle
+    assert read_cached(cache_dir, key).equals(df_mixed)
+    assert os.path.isfile(os.path.join(cache_dir, key + '.pkl'))
+
+
+def test_load_stream(tmp_path):
+    '''
+        Test the following conditions for load_stream():
+            - result matches uncached combine + homogenize
+            - repeated loads are served from the cache
+            - changing one year file only rebuilds what depends on it
+    '''
+
+    # work on a copy of the sample files so they can be edited
+    work_dir = str(tmp_path)
+    cache_dir = os.path.join(work_dir, 'cache')
+    shutil.copytree(EXAMPLE_FOLDER_AGE, os.path.join(work_dir, 'age'))
+    file_expression = os.path.join(work_dir, 'age', '*.csv')
+
+    # smoke test
+    df_cached = load_stream('age', file_expression, EXAMPLE_PATH_LAW, cache_dir)
+    df_direct = homogenize_age_data(
+        combine_age_data(file_expression, EXAMPLE_PATH_LAW)
+    )
+
+    # check cached result is identical, two files + combined + homogenized
+    assert df_cached.equals(df_direct)
+    assert len(os.listdir(cache_dir)) == 4
+
+    # check repeated load adds no entries
+    load_stream('age', file_expression, EXAMPLE_PATH_LAW, cache_dir)
+    assert len(os.listdir(cache_dir)) == 4
+
+    # check changed year adds one file entry + combined + homogenized
+    with open(os.path.join(work_dir, 'age', '2_age.csv'), 'a') as file:
+        file.write('US,75+,186000,100000,63.9,0.3,110826,54.7,0.3,2000\n')
+
+    load_stream('age', file_expression, EXAMPLE_PATH_LAW, cache_dir)
+    assert len(os.listdir(cache_dir)) == 7
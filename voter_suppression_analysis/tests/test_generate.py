@@ -1,17 +1,21 @@
 ''' CODE TO TEST DASHBOARD GENERATING FUNCTIONALITY '''
 
+import json
 import os
 
 from pathlib import Path
 
 import altair as alt
+import pandas as pd
 
 from voter_suppression_analysis.generate import \
-    generate_map, generate_chart, generate_html
+    generate_map, generate_maps, generate_chart, generate_html, \
+    prepare_chart_data, generate_specs, compose_dashboard, CHART_COLUMNS, \
+    PERCENT_COLUMNS, PERCENT_DECIMALS
 
 from voter_suppression_analysis.processing import \
     combine_age_data, combine_sexrace_data, \
-    homogenize_age_data, homogenize_sexrace_data
+    homogenize_age_data, homogenize_sexrace_data, compact_frame
 
 
 # useful file locations
@@ -57,6 +61,106 @@ def test_generate_map():
     assert isinstance(map_obj, EXPECTED_MAP_TYPE)
 
 
+def test_generate_maps():
+    '''
+    Test the following conditions for generate_maps():
+        - one map per measure
+        - all maps share a single lookup dataset
+        - each map draws its own measure
+        - mismatched titles raise an error
+    '''
+
+    measures = ['Percent Voted', 'Percent Registered']
+
+    # smoke test
+    maps = generate_maps(DF_AGE, measures, ['X', 'Y'])
+    specs = [map_obj.to_dict() for map_obj in maps]
+
+    # check types and shared data
+    assert len(maps) == 2
+    assert all(isinstance(map_obj, EXPECTED_MAP_TYPE) for map_obj in maps)
+    assert specs[0]['datasets'] == specs[1]['datasets']
+    assert len(specs[0]['datasets']) == 1
+
+    # check each map folds the columns of its own measure
+    national = DF_AGE.loc[(DF_AGE.STATE == 'NATIONAL') &
+                          (DF_AGE.Group == 'Total')].set_index('Year')
+
+    for measure, spec in zip(measures, specs):
+        rows = list(spec['datasets'].values())[0]
+        row = [row for row in rows if row['STATE'] == 'NATIONAL'][0]
+        fold = [step['fold'] for step in spec['transform']
+                if 'fold' in step][0]
+
+        for field in fold:
+            year = int(field[:4])
+            if row[field] is not None:
+                assert abs(row[field] - national.loc[year, measure]) < 1e-4
+
+    # check for mismatched titles
+    invalid_titles_caught = False
+    try:
+        generate_maps(DF_AGE, measures, ['X'])
+    except ValueError:
+        invalid_titles_caught = True
+    assert invalid_titles_caught
+
+
+def test_generate_maps_groups():
+    '''
+    Test the following conditions for generate_maps() with map_groups:
+        - maps of two groups share a single lookup dataset
+        - each map draws its own group
+        - mismatched groups raise an error
+    '''
+
+    groups = ['Male', 'Female']
+
+    # sample data has totals only, give each group its own turnout
+    df_groups = pd.concat([
+        DF_SEX.assign(Group=group, **{'Percent Voted': turnout})
+        for group, turnout in zip(groups + ['Total'], [0.5, 0.6, 0.7])
+    ], ignore_index=True)
+
+    # smoke test
+    maps = generate_maps(df_groups, ['Percent Voted'] * 2, groups,
+                         map_groups=groups)
+    specs = [map_obj.to_dict() for map_obj in maps]
+
+    # check shared data
+    assert specs[0]['datasets'] == specs[1]['datasets']
+    assert len(specs[0]['datasets']) == 1
+
+    # check each map folds the columns of its own group
+    rows = list(specs[0]['datasets'].values())[0]
+    row = [row for row in rows if row['STATE'] == 'NATIONAL'][0]
+    checked = 0
+
+    for group, spec in zip(groups, specs):
+        national = df_groups.loc[(df_groups.STATE == 'NATIONAL') &
+                                 (df_groups.Group == group)].set_index('Year')
+        fold = [step['fold'] for step in spec['transform']
+                if 'fold' in step][0]
+
+        for field in fold:
+            year = int(field[:4])
+            if row[field] is not None:
+                assert abs(row[field] -
+                           national.loc[year, 'Percent Voted']) < 1e-4
+                checked += 1
+
+    assert checked == 2 * DF_SEX.Year.nunique()
+
+    # check for mismatched groups
+    invalid_groups_caught = False
+    try:
+        generate_maps(df_groups, ['Percent Voted'] * 2, groups,
+                      map_groups=['Male'])
+    except ValueError:
+        invalid_groups_caught = True
+    assert invalid_groups_caught
+
+
 def test_generate_chart():
     '''
     Test generate_chart(). Again, attribute value-tests are excluded.
@@ -90,3 +194,139 @@ def test_generate_html():
     file = Path(OUTPUT_FILE_PATH)
     assert file.is_file()
     assert file.stat().st_size != 0
+
+
+def test_generate_compact():
+    '''
+    Test generate_map() and generate_chart() accept compact frames.
+    '''
+
+    # smoke test
+    map_obj = generate_map(
+        compact_frame(DF_AGE),
+        map_type='Percent Registered',
+        map_title='X'
+    )
+
+    chart = generate_chart(
+        df_in=compact_frame(DF_AGE),
+        x='Percent Registered:Q',
+        y='Percent Voted:Q',
+        x_lbl='% Registered',
+        y_lbl='% Voted',
+        title='Age Groups',
+        clr_setting='restrictive_id_laws:N',
+        chart_type='age'
+    )
+
+    # type check, and both serialize
+    assert isinstance(map_obj, EXPECTED_MAP_TYPE)
+    assert isinstance(chart, EXPECTED_CHART_TYPE)
+    assert map_obj.to_dict() and chart.to_dict()
+
+
+def test_generate_html_external(tmp_path):
+    '''
+    Test generate_html() with sidecar data files instead of inline data.
+    '''
+
+    output_path = os.path.join(tmp_path, 'dashboard.html')
+
+    # smoke test
+    generate_html(DF_AGE, DF_SEX, output_path, external_data=True)
+
+    # check every dataset is written to a file the page references by URL
+    data_files = os.listdir(os.path.join(tmp_path, 'dashboard_data'))
+    html = Path(output_path).read_text()
+
+    assert len(data_files) > 0
+    for file_name in data_files:
+        assert 'dashboard_data/' + file_name in html
+
+    # check a rebuild replaces rather than accumulates datasets
+    generate_html(DF_AGE, DF_SEX, output_path, external_data=True)
+    assert len(os.listdir(os.path.join(tmp_path, 'dashboard_data'))) == \
+        len(data_files)
+
+
+def test_prepare_chart_data():
+    '''
+    Test prepare_chart_data() keeps only plotted rows and encoded columns.
+    '''
+
+    # sample data is nationwide only, plot it once as a state as well
+    df_state = DF_AGE.loc[DF_AGE.STATE == 'NATIONAL'].assign(STATE='ALABAMA')
+    df_in = pd.concat([DF_AGE, df_state], ignore_index=True)
+
+    df_chart = prepare_chart_data(df_in)
+
+    # check columns, and that no national or unreachable rows are left
+    assert list(df_chart.columns) == CHART_COLUMNS
+    assert set(df_chart.STATE) == {'ALABAMA'}
+    assert df_chart.Year.notna().all() and df_chart.Group.notna().all()
+    assert len(df_chart) == len(df_state.dropna(subset=['Year', 'Group']))
+
+    # check values are unchanged up to rounding
+    merged = df_chart.merge(df_state, on=['STATE', 'Year', 'Group'])
+    assert (merged['Total Voted_x'] == merged['Total Voted_y']).all()
+    assert ((merged['Percent Voted_x'] - merged['Percent Voted_y']).abs()
+            < 1e-4).all()
+
+
+def test_prepare_chart_data_compact():
+    '''
+    Test prepare_chart_data() trims percents of compact frames, including
+    32-bit ones, to PERCENT_DECIMALS when serialized.
+    '''
+
+    # sample data is nationwide only, plot it as a state
+    df_state = DF_SEX.assign(STATE='ALABAMA')
+    df_compact = compact_frame(df_state)
+    df_single = df_compact.astype({col: 'float32' for col in PERCENT_COLUMNS})
+
+    for df_in in [df_compact, df_single]:
+        df_chart = prepare_chart_data(df_in)
+        records = json.loads(json.dumps(
+            df_chart[PERCENT_COLUMNS].dropna().to_dict('records')
+        ))
+
+        # check every serialized percent has at most PERCENT_DECIMALS digits
+        assert len(records) > 0
+        for record in records:
+            for value in record.values():
+                assert len(repr(value).split('.')[-1]) <= PERCENT_DECIMALS
+
+
+def test_generate_specs(tmp_path):
+    '''
+    Test the following conditions for generate_specs():
+        - cached specs match freshly compiled ones
+        - repeated builds are served from the cache
+        - changing one stream only recompiles the figures drawing it
+    '''
+
+    cache_dir = str(tmp_path)
+
+    # smoke test
+    specs = generate_specs(DF_AGE, DF_SEX, cache_dir=cache_dir)
+    assert specs == generate_specs(DF_AGE, DF_SEX)
+    assert len(os.listdir(cache_dir)) == 4
+
+    # check repeated build adds no entries, and composes the dashboard
+    dashboard = compose_dashboard(generate_specs(DF_AGE, DF_SEX,
+                                                 cache_dir=cache_dir))
+    assert len(os.listdir(cache_dir)) == 4
+    assert len(dashboard['hconcat']) == 3
+    assert len(dashboard['datasets']) == len(
+        {name for spec in specs.values() for name in spec['datasets']}
+    )
+
+    # check changed sexrace data only adds its chart, the sample data is
+    # nationwide only so plot it once as a state as well
+    df_state = DF_SEX.loc[DF_SEX.STATE == 'NATIONAL'].assign(STATE='ALABAMA')
+    df_sex = pd.concat([DF_SEX, df_state], ignore_index=True)
+    new_specs = generate_specs(DF_AGE, df_sex, cache_dir=cache_dir)
+
+    assert len(os.listdir(cache_dir)) == 5
+    assert new_specs['age'] == specs['age']
+    assert new_specs['sexrace'] != specs['sexrace']
@@ -0,0 +1,183 @@
+''' CODE TO TEST BUILD STAGE INSTRUMENTATION '''
+
+import glob
+import json
+import os
+import threading
+import warnings
+from pathlib import Path
+
+from voter_suppression_analysis import instrument
+from voter_suppression_analysis.instrument import \
+    instrumented, stage, write_report, STAGES
+
+from voter_suppression_analysis.processing import \
+    attach_laws, combine_sexrace_data, concat_frames, get_sexrace_df, \
+    homogenize_sexrace_data, load_files
+
+
+# useful file locations
+CWD = Path(__file__).parent
+data_path = os.path.join('..', 'data')
+
+EXAMPLE_DIR_SEX = os.path.join(CWD, data_path, 'samples', 'example_sex_folder', '*.csv')
+EXAMPLE_FILE_LAW = os.path.join(CWD, data_path, 'samples', 'law_01.csv')
+
+
+def test_stage():
+    '''
+    Test the following conditions for stage() and instrumented():
+        - stages are not recorded outside an instrumented run
+        - nested stages are recorded with their depth, rows and memory
+        - unknown stages and nested runs raise an error
+    '''
+
+    # check nothing is recorded while off
+    with stage('load') as record:
+        record['rows_out'] = 1
+    assert instrument.ACTIVE_RUN is None
+
+    # smoke test
+    with instrumented() as run:
+        with stage('homogenize', 10, 'outer') as outer:
+            with stage('pivot', 10, 'inner') as inner:
+                values = list(range(100000))
+                inner['rows_out'] = 5
+            outer['rows_out'] = len(values) // 10000
+
+    # check records
+    report = run.report()
+    assert [record['label'] for record in report['stages']] == \
+        ['outer', 'inner']
+    assert [record['depth'] for record in report['stages']] == [0, 1]
+    assert report['totals']['pivot']['rows_out'] == 5
+    assert report['totals']['homogenize']['rows_out'] == 10
+
+    outer_record, inner_record = report['stages']
+    assert inner_record['peak_mb'] > 0
+    assert outer_record['peak_mb'] >= inner_record['peak_mb']
+    assert outer_record['seconds'] >= inner_record['seconds']
+
+    # check for unknown stage
+    invalid_stage_caught = False
+    try:
+        with instrumented():
+            with stage('plot'):
+                pass
+    except ValueError:
+        invalid_stage_caught = True
+    assert invalid_stage_caught
+
+    # check for nested runs
+    nested_run_caught = False
+    try:
+        with instrumented():
+            with instrumented():
+                pass
+    except ValueError:
+        nested_run_caught = True
+    assert nested_run_caught
+    assert instrument.ACTIVE_RUN is None
+
+
+def test_stage_threads():
+    '''
+    Test that stages of worker threads are recorded without a traced memory
+    peak, which only main thread stages measure.
+    '''
+
+    def work():
+        with stage('load', 1, 'worker') as record:
+            record['rows_out'] = len(list(range(100000)))
+
+    # smoke test
+    with instrumented() as run:
+        with stage('concat', 1, 'main') as record:
+            worker = threading.Thread(target=work)
+            worker.start()
+            worker.join()
+            record['rows_out'] = 1
+
+    # check records
+    records = {record['label']: record for record in run.report()['stages']}
+    assert records['worker']['rows_out'] == 100000
+    assert records['worker'].get('peak_mb') is None
+    assert records['main']['peak_mb'] > 0
+
+
+def test_staged_keywords():
+    '''
+    Test that a staged function called with keyword arguments only counts
+    the rows of its first argument.
+    '''
+
+    combined = concat_frames(
+        load_files(sorted(glob.glob(EXAMPLE_DIR_SEX)), get_sexrace_df)
+    )
+
+    # smoke test
+    with instrumented(trace_memory=False) as run:
+        df_law = attach_laws(combined=combined,
+                             law_filepath=EXAMPLE_FILE_LAW)
+
+    # check rows
+    totals = run.report()['totals']['law merge']
+    assert totals['calls'] == 1
+    assert totals['rows_in'] == len(combined)
+    assert totals['rows_out'] == len(df_law)
+
+
+def test_instrumented_processing(tmp_path):
+    '''
+    Test the following conditions for an instrumented processing run:
+        - every processing stage is recorded, in pipeline order
+        - rows handed between stages add up
+        - each stage is profiled, and the report is saved as JSON
+    '''
+
+    # smoke test
+    profile_dir = os.path.join(str(tmp_path), 'profiles')
+    with instrumented(profile_dir) as run:
+        df_sex = homogenize_sexrace_data(
+            combine_sexrace_data(EXAMPLE_DIR_SEX, EXAMPLE_FILE_LAW)
+        )
+
+    # check stages and rows
+    report = run.report()
+    totals = report['totals']
+    assert list(totals) == [name for name in STAGES if name in totals]
+    assert list(totals) == [
+        'load', 'clean', 'concat', 'law merge', 'homogenize', 'pivot'
+    ]
+    assert totals['load']['calls'] == 2
+    assert totals['load']['rows_out'] == totals['concat']['rows_in']
+    assert totals['homogenize']['rows_out'] == len(df_sex)
+
+    # check profiles and report
+    assert all(os.path.isfile(record['profile'])
+               for record in report['stages'])
+
+    report_path = os.path.join(str(tmp_path), 'report.json')
+    write_report(report, report_path)
+    with open(report_path) as file:
+        assert json.load(file)['totals'] == totals
+
+
+def test_instrumented_process_pool():
+    '''
+    Test that loading files in worker processes under instrumentation warns
+    that their stages are missing from the report.
+    '''
+
+    # smoke test
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+
+        with instrumented(trace_memory=False) as run:
+            combine_sexrace_data(EXAMPLE_DIR_SEX, EXAMPLE_FILE_LAW,
+                                 executor='process', max_workers=2)
+
+    # check the warning, and that loading went unrecorded
+    assert any(issubclass(warning.category, RuntimeWarning)
+               for warning in caught)
+    assert 'load' not in run.report()['totals']
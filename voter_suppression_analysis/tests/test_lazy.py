@@ -0,0 +1,95 @@
+''' CODE TO TEST DEFERRED IMPORTS AND IMPORT TIMES '''
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from voter_suppression_analysis.lazy import lazy_import
+
+
+# useful constants for file locations
+CWD = Path(__file__).parent
+PACKAGE_PARENT = os.path.join(CWD, '..', '..')
+
+# dependencies only imported once data is processed or charts are built
+HEAVY_MODULES = ['pandas', 'numpy', 'altair', 'altair_viewer', 'vl_convert']
+
+# modules that must import without the heavy dependencies
+LIGHT_MODULES = [
+    'voter_suppression_analysis.processing',
+    'voter_suppression_analysis.cache',
+    'voter_suppression_analysis.generate'
+]
+
+# share of the time pandas takes to import that each module may take,
+# relative so that a loaded or slow machine slows both alike
+IMPORT_BUDGET = 0.5
+
+
+def import_report(module):
+    '''
+    Import a module in a fresh interpreter.
+
+    Args:
+        module: str, full module name
+
+    Returns:
+        tuple, (seconds taken, list of HEAVY_MODULES imported along)
+    '''
+
+    code = (
+        'import sys, time\n'
+        'start = time.perf_counter()\n'
+        'import %s\n'
+        'print(time.perf_counter() - start)\n'
+        'print(",".join(name for name in %r if name in sys.modules))\n'
+    ) % (module, HEAVY_MODULES)
+
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(PACKAGE_PARENT))
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env
+    )
+
+    seconds, loaded = result.stdout.splitlines()
+    return float(seconds), [name for name in loaded.split(',') if name]
+
+
+def test_lazy_import():
+    '''
+    Test the following conditions for lazy_import():
+        - attributes of the module are available
+        - missing modules raise an error right away
+    '''
+
+    # smoke test
+    json_module = lazy_import('json')
+    assert json_module.loads('[1]') == [1]
+
+    # check for missing module
+    missing_module_caught = False
+    try:
+        lazy_import('no_such_module_vsa')
+    except ImportError:
+        missing_module_caught = True
+    assert missing_module_caught
+
+
+def test_import_budgets():
+    '''
+    Test that importing the data and chart modules loads none of the heavy
+    dependencies, and takes a fraction of the time pandas takes.
+    '''
+
+    pandas_seconds, _ = import_report('pandas')
+
+    for module in LIGHT_MODULES:
+        seconds, loaded = import_report(module)
+
+        assert loaded == [], '%s imported %s' % (module, loaded)
+        assert seconds < IMPORT_BUDGET * pandas_seconds, \
+            '%s took %.2fs, pandas %.2fs' % (module, seconds, pandas_seconds)
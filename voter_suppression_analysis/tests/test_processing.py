@@ -2,14 +2,20 @@
 
 import random
 import os
+import shutil
 import sys
 from pathlib import Path
 
+import pandas as pd
+
 #sys.path.insert(0, os.path.abspath('..'))
 from voter_suppression_analysis.processing import \
-    get_age_df, get_sexrace_df, \
+    AGE_SCHEMA, read_census_file, get_age_df, get_sexrace_df, sort_by_year, \
     combine_age_data, combine_sexrace_data, \
-    homogenize_age_data, homogenize_sexrace_data
+    homogenize_age_data, homogenize_sexrace_data, update_age_data, \
+    read_age_brackets, compact_frame, normalize_states, state_ids, known_places, \
+    load_laws, attach_laws, law_regimes, stream_age_data, stream_sexrace_data, \
+    engine_aggregate, AGE_BRACKETS
 
 
 # useful constants for file locations
@@ -22,12 +28,19 @@ EXAMPLE_PATH_AGE = os.path.join(CWD, data_folder, 'samples', 'age_01.csv')
 EXAMPLE_PATH_SEX = os.path.join(CWD, data_folder, 'samples', 'sex_01.csv')
 #EXAMPLE_PATH_LAW = CWD / '../data/samples/law_01.csv'
 EXAMPLE_PATH_LAW = os.path.join(CWD, data_folder, 'samples', 'law_01.csv')
+EXAMPLE_PATH_LAW_VERSIONED = os.path.join(
+    CWD, data_folder, 'samples', 'law_versioned_01.csv'
+)
 
+EXAMPLE_FOLDER_AGE = os.path.join(CWD, data_folder, 'samples', 'example_age_folder')
 #EXAMPLE_DIR_AGE = str(CWD / '../*data*/*samples*/*example_age_folder*/*')
 EXAMPLE_DIR_AGE = os.path.join(CWD, data_folder, 'samples', 'example_age_folder', '*.csv')
 #EXAMPLE_DIR_SEX = str(CWD / '../*data*/*samples*/*example_sex_folder*/*')
 EXAMPLE_DIR_SEX = os.path.join(CWD, data_folder, 'samples', 'example_sex_folder', '*.csv')
 
+CLEAN_DIR_AGE = os.path.join(CWD, data_folder, 'clean', '*_age.csv')
+CLEAN_DIR_SEX = os.path.join(CWD, data_folder, 'clean', '*_sexrace.csv')
+
 GARBAGE_PATH = str(random.randint(0, 9))
 
 # useful constants for expected column names
@@ -66,6 +79,36 @@ STATE_NAMES = [
 ]
 
 
+def test_read_census_file(tmp_path):
+    '''
+        Test the following conditions for read_census_file():
+            - thousands separators are stripped from counts
+            - counts are numeric, unparseable counts become NaN
+            - other columns are left as read
+    '''
+
+    # write a small file with formatted counts
+    file_path = tmp_path / '2000_age.csv'
+    file_path.write_text(
+        ','.join(EXPECTED_AGE_COLUMNS) + '\n'
+        'Alabama,.Total,"3,290",2453,74.6,1.4,"1,987",60.4,1.5,2000\n'
+        'Alabama,.18 to 24,-,214,55.0,4.6,151,38.8,4.5,2000\n'
+    )
+
+    # smoke test
+    df_age = read_census_file(str(file_path), AGE_SCHEMA)
+
+    # check counts were converted
+    assert df_age['Total'][0] == 3290
+    assert df_age['Total Voted'][0] == 1987
+    assert df_age['Total'].isna()[1]
+
+    # check labels and untouched columns
+    assert df_age['STATE'][0] == 'ALABAMA'
+    assert df_age['Age'][1] == '18 to 24'
+    assert df_age['Year'][0] == '2000'
+
+
 def test_get_age_df():
     '''
         Test the following conditions for get_age_df():
@@ -209,6 +252,44 @@ def test_homogenize_age_data():
     assert any(df_standardized['STATE'].unique() == STATE_NAMES)
 
 
+def test_read_age_brackets(tmp_path):
+    '''
+        Test conditions for read_age_brackets():
+            - new label spellings are added to the default brackets
+            - homogenize_age_data() picks up the extended mapping
+            - unknown target brackets are rejected
+    '''
+
+    # the sample '44 to 45' label is not a known spelling
+    file_path = tmp_path / 'brackets.csv'
+    file_path.write_text('label,bracket\n44 to 45,45 to 65\n')
+
+    # smoke test
+    brackets = read_age_brackets(str(file_path))
+    assert brackets['44 to 45'] == '45 to 65'
+    assert brackets['75+'] == '65+'
+
+    # test the new spelling now produces a bracket
+    df_combined = combine_age_data(EXAMPLE_DIR_AGE, EXAMPLE_PATH_LAW)
+    df_default = homogenize_age_data(df_combined)
+    df_extended = homogenize_age_data(df_combined, brackets)
+
+    national = df_extended.loc[df_extended.STATE == 'NATIONAL']
+    assert national['Total'].sum() > \
+        df_default.loc[df_default.STATE == 'NATIONAL', 'Total'].sum()
+
+    # check invalid brackets are caught
+    file_path.write_text('label,bracket\n44 to 45,44 to 45\n')
+    invalid_bracket_caught = False
+
+    try:
+        read_age_brackets(str(file_path))
+    except ValueError:
+        invalid_bracket_caught = True
+
+    assert invalid_bracket_caught
+
+
 def test_homogenize_sexrace_data():
     '''
         Test conditions for homogenize_age_data():
@@ -225,3 +306,354 @@ def test_homogenize_sexrace_data():
     # test the state IDs and labels are present
     assert any(df_standardized['id'].unique() == STATE_NUMS)
     assert any(df_standardized['STATE'].unique() == STATE_NAMES)
+
+
+def test_combine_executors():
+    '''
+        Test conditions for combine_age_data() executor modes:
+            - thread and process pools match serial loading
+            - files are combined in year order
+            - unknown executor modes are rejected
+    '''
+
+    # smoke test
+    df_serial = combine_age_data(EXAMPLE_DIR_AGE, EXAMPLE_PATH_LAW)
+
+    # test pooled loading gives identical frames
+    for mode in ['thread', 'process']:
+        df_pooled = combine_age_data(
+            EXAMPLE_DIR_AGE,
+            EXAMPLE_PATH_LAW,
+            executor=mode,
+            max_workers=2
+        )
+        assert df_pooled.equals(df_serial)
+
+    # test files are ordered by the number in their name
+    shuffled = ['b/2010_age.csv', 'a/2000_age.csv', 'notes.csv', '2_age.csv']
+    assert sort_by_year(shuffled) == [
+        '2_age.csv', 'a/2000_age.csv', 'b/2010_age.csv', 'notes.csv'
+    ]
+
+    # test invalid executor mode is caught
+    invalid_mode_caught = False
+
+    try:
+        combine_age_data(EXAMPLE_DIR_AGE, EXAMPLE_PATH_LAW, executor='gpu')
+    except ValueError:
+        invalid_mode_caught = True
+
+    assert invalid_mode_caught
+
+
+def test_update_age_data(tmp_path):
+    '''
+        Test conditions for update_age_data():
+            - first run matches a full homogenize run
+            - a new year file is merged into the previous output
+            - unchanged inputs return the materialized output
+    '''
+
+    # start with one of the two sample years
+    age_dir = tmp_path / 'age'
+    age_dir.mkdir()
+    shutil.copy(os.path.join(EXAMPLE_FOLDER_AGE, '1_age.csv'), age_dir)
+
+    file_expression = str(age_dir / '*.csv')
+    output_path = str(tmp_path / 'age.pkl')
+
+    # smoke test
+    df_first = update_age_data(file_expression, output_path, EXAMPLE_PATH_LAW)
+    assert len(df_first) == 3
+
+    # add the second year and update
+    shutil.copy(os.path.join(EXAMPLE_FOLDER_AGE, '2_age.csv'), age_dir)
+    df_updated = update_age_data(
+        file_expression,
+        output_path,
+        EXAMPLE_PATH_LAW
+    )
+
+    # compare against a full run, less its placeholder rows
+    df_full = homogenize_age_data(
+        combine_age_data(file_expression, EXAMPLE_PATH_LAW)
+    )
+    df_full = df_full.loc[df_full.Year.notna()]
+
+    columns = ['Year', 'Group', 'Total', 'Total Voted']
+    assert df_updated[columns].values.tolist() == \
+        df_full[columns].values.tolist()
+
+    # check unchanged inputs reuse the stored output
+    df_again = update_age_data(file_expression, output_path, EXAMPLE_PATH_LAW)
+    assert df_again.equals(df_updated)
+
+
+def test_homogenize_sexrace_totals():
+    '''
+        Test conditions for homogenize_sexrace_data() against values
+        recorded from the original per-column pivot and merge version:
+            - Total is recomputed as Male + Female for every measure
+            - every state gets a row for every group seen in the data
+            - counts are rounded and percentages follow from them
+            - groups are relabeled into a categorical, unknown ones dropped
+    '''
+
+    rows = [
+        ('ALABAMA', 'Total', 3300, 2400, 2000, 1, 4),
+        ('ALABAMA', 'Male', 1500, 1100, 900, 1, 4),
+        ('ALABAMA', 'Female', 1750, 1300, 1050, 1, 4),
+        ('ALABAMA', 'N-H White', 2365, 1800, 1500, 1, 4),
+        ('ALABAMA', 'Hispanic (of any race)', 15, 5, None, 1, 4),
+        ('ALASKA', 'Total', 440, 320, 270, 0, 3),
+        ('ALASKA', 'Male', 221, 160, 134.6, 0, 3),
+        ('ALASKA', 'Female', 219, 161, 136, 0, 3),
+        ('ALASKA', 'Asian alone', 20, 12, 9, 0, 3),
+        ('ALASKA', 'Two or more races', 8, 5, 4, 0, 3)
+    ]
+
+    df_in = pd.DataFrame(rows, columns=[
+        'STATE', 'Group', 'Total Citizen', 'Total Registered', 'Total Voted',
+        'restrictive_id_laws', 'felony_disenfranchisement'
+    ])
+    df_in['Year'] = '2016'
+
+    # smoke test
+    df_out = homogenize_sexrace_data(df_in)
+
+    # test group labels
+    assert df_out['Group'].dtype == 'category'
+    assert set(df_out['Group']) == {
+        'Total', 'Male', 'Female', 'White', 'Asian & Pacific Islander',
+        'Hispanic'
+    }
+
+    df_out = df_out.set_index(['STATE', 'Group'])
+
+    # test shape, 2 states x 6 groups
+    assert len(df_out) == 12
+
+    # test gender-wide totals replace reported totals
+    measures = ['Total', 'Total Registered', 'Total Voted']
+    assert df_out.loc[('ALABAMA', 'Total'), measures].tolist() == \
+        [3250, 2400, 1950]
+    assert df_out.loc[('ALASKA', 'Total'), measures].tolist() == \
+        [440, 321, 271]
+
+    # test rounding, missing groups and missing values
+    assert df_out.loc[('ALASKA', 'Male'), 'Total Voted'] == 135
+    assert df_out.loc[('ALASKA', 'White'), measures].isna().all()
+    assert df_out.loc[('ALABAMA', 'Hispanic'), 'Percent Registered'] == 5 / 15
+    assert pd.isna(df_out.loc[('ALABAMA', 'Hispanic'), 'Total Voted'])
+
+
+def test_compact_frame():
+    '''
+        Test conditions for compact_frame() and the compact option:
+            - labels, laws, years, IDs and counts use compact dtypes
+            - percentages stay float64, and values are unchanged
+    '''
+
+    # smoke test
+    df_combined = combine_sexrace_data(EXAMPLE_DIR_SEX, EXAMPLE_PATH_LAW)
+    df_full = homogenize_sexrace_data(df_combined)
+    df_compact = homogenize_sexrace_data(df_combined, compact=True)
+
+    # test dtypes
+    assert df_compact['STATE'].dtype == 'category'
+    assert df_compact['restrictive_id_laws'].dtype == 'category'
+    assert df_compact['Year'].dtype == 'int16'
+    assert df_compact['id'].dtype == 'int16'
+    assert df_compact['Total Voted'].dtype == 'Int32'
+    assert df_compact['Percent Voted'].dtype == 'float64'
+
+    # test values
+    assert compact_frame(df_full).equals(df_compact)
+    assert df_compact['Total Voted'].tolist() == df_full['Total Voted'].tolist()
+
+    # age placeholder rows have no year, so Year falls back to nullable
+    df_age = combine_age_data(EXAMPLE_DIR_AGE, EXAMPLE_PATH_LAW)
+    df_age = homogenize_age_data(df_age, compact=True)
+    assert df_age['Year'].dtype == 'Int16'
+
+
+def test_state_index():
+    '''
+        Test conditions for normalize_states() and state_ids():
+            - full names, abbreviations and nationwide aliases are matched
+            - case and surrounding spaces are ignored
+            - unknown labels are kept and get no ID
+            - known_places() adds places for the block only
+    '''
+
+    states = pd.Series([
+        'Alabama', 'DC', 'US', 'UNITED STATES', ' wyoming ', 'TENNESEE'
+    ])
+
+    canonical = normalize_states(states)
+    assert canonical.tolist() == [
+        'ALABAMA', 'DISTRICT OF COLUMBIA', 'NATIONAL', 'NATIONAL',
+        'WYOMING', 'TENNESEE'
+    ]
+
+    ids = state_ids(canonical)
+    assert ids[:5].tolist() == [1, 11, 0, 0, 56]
+    assert pd.isna(ids[5])
+
+    places = pd.Series(['ALABAMA COUNTY 1', 'ALABAMA'])
+    with known_places([('ALABAMA COUNTY 1', 1000)]):
+        assert normalize_states(places).tolist() == places.tolist()
+        assert state_ids(places).tolist() == [1000, 1]
+    assert pd.isna(state_ids(places)[0])
+
+
+def test_load_laws(tmp_path):
+    '''
+        Test conditions for load_laws() and attach_laws():
+            - repeated loads share one table indexed on canonical state
+            - an edited law file is read again
+            - laws attach by state, states without turnout data are kept
+    '''
+
+    law_path = os.path.join(tmp_path, 'laws.csv')
+    shutil.copy(EXAMPLE_PATH_LAW, law_path)
+
+    df_laws = load_laws(law_path)
+    assert load_laws(law_path) is df_laws
+    assert 'NATIONAL' in df_laws.index
+
+    # editing the file changes its size, so the table is rebuilt
+    with open(law_path, 'a') as file:
+        file.write('Wyoming,1,2\n')
+
+    df_edited = load_laws(law_path)
+    assert df_edited is not df_laws
+    assert df_edited.loc['WYOMING', 'felony_disenfranchisement'] == 2
+
+    combined = pd.DataFrame({'STATE': ['US', 'Wyoming'], 'Year': ['2000'] * 2})
+    df_result = attach_laws(combined, law_path)
+
+    assert df_result['restrictive_id_laws'][:2].tolist() == \
+        df_edited.loc[['NATIONAL', 'WYOMING'], 'restrictive_id_laws'].tolist()
+    assert set(df_result['STATE']) == set(df_edited.index)
+
+
+def test_attach_law_regimes():
+    '''
+        Test conditions for time-versioned law tables:
+            - each election year gets the laws in force that year
+            - ended laws and years before any regime get no value
+            - rows keep their order
+            - states without turnout data get their latest regime
+            - tables missing version columns are rejected
+    '''
+
+    combined = pd.DataFrame({
+        'STATE': ['Alabama', 'ALABAMA', 'AL', 'Alabama', 'Alaska', 'Alaska'],
+        'Year': ['2010', '2000', '2011', '2012', '2002', '2006']
+    })
+
+    df_result = attach_laws(combined, EXAMPLE_PATH_LAW_VERSIONED,
+                            keep_missing=False)
+
+    assert df_result['Year'].tolist() == combined['Year'].tolist()
+    assert df_result['restrictive_id_laws'].tolist()[:2] == [0, 0]
+    assert pd.isna(df_result['restrictive_id_laws'][2])
+    assert df_result['restrictive_id_laws'][3] == 1
+    assert pd.isna(df_result['restrictive_id_laws'][4])
+    assert df_result['felony_disenfranchisement'].tolist()[4:] == [3, 2]
+
+    # test the nation, without turnout data, is kept as with flat tables
+    df_kept = attach_laws(combined, EXAMPLE_PATH_LAW_VERSIONED)
+
+    assert df_kept.iloc[:len(combined)].equals(df_result)
+    assert df_kept['STATE'].tolist()[len(combined):] == ['NATIONAL']
+    assert df_kept['restrictive_id_laws'].iloc[-1] == 1
+    assert pd.isna(df_kept['Year'].iloc[-1])
+
+    # law_regimes should throw ValueError if version columns are missing
+    invalid_table_caught = False
+
+    try:
+        law_regimes(pd.DataFrame({'STATE': ['ALABAMA'], 'law': ['x']}))
+    except ValueError:
+        invalid_table_caught = True
+
+    assert invalid_table_caught
+
+
+def test_stream_data():
+    '''
+        Test conditions for stream_age_data() and stream_sexrace_data():
+            - chunked results match combining, then homogenizing
+            - time-versioned law tables stream alike
+            - inputs without rows are rejected
+    '''
+
+    # test chunks smaller than a year file give identical frames
+    for law_path in [EXAMPLE_PATH_LAW, EXAMPLE_PATH_LAW_VERSIONED]:
+        pd.testing.assert_frame_equal(
+            stream_age_data(CLEAN_DIR_AGE, law_path, chunksize=100),
+            homogenize_age_data(combine_age_data(CLEAN_DIR_AGE, law_path))
+        )
+        pd.testing.assert_frame_equal(
+            stream_sexrace_data(CLEAN_DIR_SEX, law_path, chunksize=100),
+            homogenize_sexrace_data(combine_sexrace_data(CLEAN_DIR_SEX,
+                                                         law_path))
+        )
+
+    # stream_age_data should throw ValueError if there are no files
+    no_rows_caught = False
+
+    try:
+        stream_age_data(GARBAGE_PATH, EXAMPLE_PATH_LAW)
+    except ValueError:
+        no_rows_caught = True
+
+    assert no_rows_caught
+
+
+def test_homogenize_backends():
+    '''
+        Test conditions for the backends of homogenize_*_data():
+            - duckdb results match the pandas path, schema and values
+            - time-versioned law tables homogenize alike
+            - unknown backends are rejected
+    '''
+
+    # test the engine gives identical frames
+    for law_path in [EXAMPLE_PATH_LAW, EXAMPLE_PATH_LAW_VERSIONED]:
+        df_age = combine_age_data(CLEAN_DIR_AGE, law_path)
+        pd.testing.assert_frame_equal(
+            homogenize_age_data(df_age, backend='duckdb'),
+            homogenize_age_data(df_age),
+            check_exact=True
+        )
+
+        df_sex = combine_sexrace_data(CLEAN_DIR_SEX, law_path)
+        pd.testing.assert_frame_equal(
+            homogenize_sexrace_data(df_sex, compact=True, backend='duckdb'),
+            homogenize_sexrace_data(df_sex, compact=True),
+            check_exact=True
+        )
+
+    # homogenize_age_data should throw ValueError for an unknown backend
+    invalid_backend_caught = False
+
+    try:
+        homogenize_age_data(df_age, backend=GARBAGE_PATH)
+    except ValueError:
+        invalid_backend_caught = True
+
+    assert invalid_backend_caught
+
+    # engine_aggregate should throw ValueError for the pandas backend
+    pandas_backend_caught = False
+
+    try:
+        engine_aggregate(df_age, ['STATE', 'Year', 'Age'], AGE_BRACKETS,
+                         ['Total'], backend='pandas')
+    except ValueError:
+        pandas_backend_caught = True
+
+    assert pandas_backend_caught
@@ -0,0 +1,111 @@
+''' CODE TO TEST RAW CENSUS SPREADSHEET INGESTION '''
+
+import os
+from pathlib import Path
+
+from voter_suppression_analysis.processing import get_age_df, SEX_COLUMNS
+from voter_suppression_analysis.raw import \
+    read_raw_file, raw_file_paths, combine_raw_data
+
+
+# useful constants for file locations
+CWD = Path(__file__).parent
+data_folder = os.path.join('..', 'data')
+
+RAW_PATH_AGE = os.path.join(CWD, data_folder, 'raw', 'turnout_2018_age.csv')
+CLEAN_PATH_AGE = os.path.join(CWD, data_folder, 'clean', '2018_age.csv')
+EXAMPLE_PATH_LAW = os.path.join(CWD, data_folder, 'samples', 'law_01.csv')
+
+# minimal sheet in the published layout: title rows, a two-row header,
+# state section rows and dotted group labels
+RAW_SEXRACE_SHEET = '\n'.join([
+    'Table 4b. Reported Voting and Registration by Sex and Race,,,,,,,,',
+    '[numbers in thousands],,,,,,,,',
+    ',,Total,Total citizen,Registered,,Voted,,',
+    'State,Sex and race,population,population,Total,Percent,'
+    'Total,Percent,Margin of error',
+    'ALABAMA,Total,"3,500","3,400","2,400",68.6,"1,900",54.3,2.5',
+    ',Male,"1,700","1,650","1,100",64.7,850,50.0,3.0',
+    ',.White alone,"2,400","2,350","1,700",70.8,"1,350",56.3,2.9',
+    ',,,,,,,,',
+    'ALASKA,Total,500,480,330,66.0,260,52.0,3.1',
+    ',Female,250,240,170,68.0,135,54.0,3.3',
+])
+
+
+def test_read_raw_file(tmp_path):
+    '''
+        Test the following conditions for read_raw_file():
+            - title rows and multi-row headers are skipped
+            - section rows set the state, dotted labels are stripped
+            - counts come out numeric in the clean layout
+            - parsed frames are cached under cache_dir
+    '''
+
+    file_path = os.path.join(tmp_path, 'turnout_2016_sexrace.csv')
+    with open(file_path, 'w') as file:
+        file.write(RAW_SEXRACE_SHEET + '\n')
+
+    cache_dir = os.path.join(tmp_path, 'cache')
+    df_raw = read_raw_file(file_path, 'sexrace', cache_dir=cache_dir)
+
+    # check layout and parsed values
+    assert list(df_raw.columns) == SEX_COLUMNS
+    assert df_raw['STATE'].tolist() == ['ALABAMA'] * 3 + ['ALASKA'] * 2
+    assert df_raw['Group'].tolist() == \
+        ['Total', 'Male', 'White alone', 'Total', 'Female']
+    assert df_raw['Total Citizen'].tolist() == [3400, 1650, 2350, 480, 240]
+    assert df_raw['Total Voted'].tolist() == [1900, 850, 1350, 260, 135]
+    assert (df_raw['Year'] == '2016').all()
+
+    # check one cache entry, reused on the next read
+    assert len(os.listdir(cache_dir)) == 1
+    assert read_raw_file(file_path, 'sexrace', cache_dir=cache_dir) \
+        .equals(df_raw)
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_raw_matches_clean():
+    '''
+        Test the following conditions for read_raw_file():
+            - counts parsed from a raw sheet match its hand-cleaned version
+    '''
+
+    counts = ['Total', 'Total Registered', 'Total Voted']
+    keys = ['STATE', 'Age']
+
+    df_raw = read_raw_file(RAW_PATH_AGE, 'age', cache_dir=None)
+    df_clean = get_age_df(CLEAN_PATH_AGE)
+
+    merged = df_clean.merge(df_raw, on=keys, suffixes=('', '_raw'))
+
+    # check every clean row has a raw counterpart with equal counts
+    assert len(merged) == len(df_clean)
+    for col in counts:
+        assert (merged[col] == merged[col + '_raw']).all()
+
+
+def test_combine_raw_data(tmp_path):
+    '''
+        Test the following conditions for combine_raw_data():
+            - one file is kept per year when several formats exist
+            - law columns are attached as in the clean pipeline
+    '''
+
+    for extension in ['.csv', '.ods']:
+        file_path = os.path.join(tmp_path, 'turnout_2016_sexrace' + extension)
+        with open(file_path, 'w') as file:
+            file.write(RAW_SEXRACE_SHEET + '\n')
+
+    file_expression = os.path.join(tmp_path, 'turnout_*_sexrace.*')
+
+    # check csv copy is preferred over the ods copy
+    assert raw_file_paths(file_expression) == \
+        [os.path.join(tmp_path, 'turnout_2016_sexrace.csv')]
+
+    combined = combine_raw_data(
+        'sexrace', file_expression, EXAMPLE_PATH_LAW, cache_dir=None
+    )
+
+    assert 'restrictive_id_laws' in combined.columns
+    assert set(combined['STATE'].dropna()) >= {'ALABAMA', 'ALASKA'}
@@ -0,0 +1,66 @@
+''' CODE TO TEST STATIC SNAPSHOT RENDERING '''
+
+import os
+from pathlib import Path
+
+from voter_suppression_analysis.generate import generate_charts
+from voter_suppression_analysis.processing import \
+    combine_age_data, combine_sexrace_data, \
+    homogenize_age_data, homogenize_sexrace_data
+from voter_suppression_analysis.render import \
+    render_snapshots, set_selection_state, snapshot_name
+
+
+# useful file locations
+CWD = Path(__file__).parent
+data_path = os.path.join('..', 'data')
+
+EXAMPLE_DIR_AGE = os.path.join(CWD, data_path, 'samples', 'example_age_folder', '*.csv')
+EXAMPLE_DIR_SEX = os.path.join(CWD, data_path, 'samples', 'example_sex_folder', '*.csv')
+EXAMPLE_FILE_LAW = os.path.join(CWD, data_path, 'samples', 'law_01.csv')
+
+# making test DataFrames
+DF_AGE = homogenize_age_data(combine_age_data(EXAMPLE_DIR_AGE, EXAMPLE_FILE_LAW))
+DF_SEX = homogenize_sexrace_data(
+    combine_sexrace_data(EXAMPLE_DIR_SEX, EXAMPLE_FILE_LAW)
+)
+
+
+def test_set_selection_state():
+    '''
+    Test set_selection_state() reaches selections in nested views.
+    '''
+
+    spec = generate_charts(DF_AGE, DF_SEX)['age'].to_dict()
+    set_selection_state(spec, {
+        'SelectorName': {'Year': 2012},
+        'Age': {'Group': '65+'}
+    })
+
+    selections = spec['vconcat'][0]['selection']
+    assert selections['SelectorName']['init'] == {'Year': 2012}
+    assert selections['Age']['init'] == {'Group': '65+'}
+
+
+def test_render_snapshots(tmp_path):
+    '''
+    Test render_snapshots() writes one image per figure, year and group.
+    '''
+
+    # smoke test
+    file_paths = render_snapshots(
+        DF_AGE,
+        DF_SEX,
+        str(tmp_path),
+        fmt='svg',
+        years=[2000],
+        max_workers=2
+    )
+
+    # age and sexrace groups, plus one image for each map
+    assert len(file_paths) == 4 + 7 + 1 + 1
+    assert os.path.join(tmp_path, 'age_2000_65_plus.svg') in file_paths
+    assert snapshot_name('voted', 2000, None, 'svg') == 'voted_2000.svg'
+
+    for file_path in file_paths:
+        assert Path(file_path).read_text().startswith('<svg')
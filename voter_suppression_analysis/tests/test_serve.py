@@ -0,0 +1,165 @@
+''' CODE TO TEST DASHBOARD SERVING FUNCTIONALITY '''
+
+import json
+import os
+import re
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pandas as pd
+
+from voter_suppression_analysis.generate import prepare_chart_data
+
+from voter_suppression_analysis.processing import \
+    combine_age_data, combine_sexrace_data, \
+    homogenize_age_data, homogenize_sexrace_data
+
+from voter_suppression_analysis.serve import \
+    data_slice, etag, etag_matches, DashboardServer, SLICE_KEY_COLUMNS
+
+
+# useful file locations
+CWD = Path(__file__).parent
+data_path = os.path.join('..', 'data')
+
+EXAMPLE_DIR_AGE = os.path.join(CWD, data_path, 'samples', 'example_age_folder', '*.csv')
+EXAMPLE_DIR_SEX = os.path.join(CWD, data_path, 'samples', 'example_sex_folder', '*.csv')
+EXAMPLE_FILE_LAW = os.path.join(CWD, data_path, 'samples', 'law_01.csv')
+
+# making test DataFrames, the sample data is nationwide only, so it is
+# served once as a state as well
+DF_AGE = homogenize_age_data(
+    combine_age_data(EXAMPLE_DIR_AGE, EXAMPLE_FILE_LAW)
+)
+DF_AGE = pd.concat([
+    DF_AGE,
+    DF_AGE.loc[DF_AGE.STATE == 'NATIONAL'].assign(STATE='ALABAMA')
+], ignore_index=True)
+
+DF_SEX = homogenize_sexrace_data(
+    combine_sexrace_data(EXAMPLE_DIR_SEX, EXAMPLE_FILE_LAW)
+)
+
+
+def fetch(url, etag=None):
+    '''
+    Request a URL, returning (status, headers, body) for errors as well.
+    '''
+
+    request = urllib.request.Request(url)
+
+    if etag is not None:
+        request.add_header('If-None-Match', etag)
+
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.headers, error.read()
+
+
+def test_data_slice():
+    '''
+    Test the following conditions for data_slice():
+        - rows are limited to the requested year and group
+        - a requested metric is the only column besides the keys
+        - unknown metrics raise an error
+    '''
+
+    df_chart = prepare_chart_data(DF_AGE)
+    year = df_chart.Year.iloc[0]
+
+    # smoke test
+    df_slice = data_slice(df_chart, year, 'Total', 'Percent Voted')
+
+    # check rows and columns
+    assert list(df_slice.columns) == SLICE_KEY_COLUMNS + ['Percent Voted']
+    assert len(df_slice) == ((df_chart.Year == year) &
+                             (df_chart.Group == 'Total')).sum()
+    assert len(df_slice) > 0
+
+    # check unfiltered slice keeps everything
+    assert len(data_slice(df_chart)) == len(df_chart)
+
+    # check for unknown metric
+    invalid_metric_caught = False
+    try:
+        data_slice(df_chart, metric='STATE')
+    except ValueError:
+        invalid_metric_caught = True
+    assert invalid_metric_caught
+
+
+def test_etag_matches():
+    '''
+    Test the following conditions for etag_matches():
+        - tags in a list match exactly, weak or strong
+        - '*' matches any tag
+        - parts of a tag or of the header do not match
+    '''
+
+    tag = etag(b'body')
+    other = etag(b'other')
+
+    # check lists, weak tags and wildcards
+    assert etag_matches(tag, tag)
+    assert etag_matches(tag, '%s, W/%s' % (other, tag))
+    assert etag_matches(tag, ' * ')
+
+    # check partial and missing tags
+    assert not etag_matches(tag, '')
+    assert not etag_matches(tag, other)
+    assert not etag_matches(tag, tag[:10] + '"')
+    assert not etag_matches(tag[:10] + '"', tag)
+    assert not etag_matches(tag, tag.strip('"'))
+
+
+def test_dashboard_server(tmp_path):
+    '''
+    Test the following conditions for DashboardServer:
+        - the page, specs, datasets and slices are served
+        - unchanged content is revalidated with its ETag
+        - bad requests and unknown paths are refused
+    '''
+
+    server = DashboardServer(('127.0.0.1', 0), DF_AGE, DF_SEX, str(tmp_path))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = 'http://127.0.0.1:%d' % server.server_port
+
+    try:
+        # check page is served, then revalidated
+        status, headers, body = fetch(base_url + '/')
+        assert status == 200 and b'vegaEmbed' in body
+        assert fetch(base_url + '/', headers['ETag'])[0] == 304
+        assert fetch(base_url + '/', '*')[0] == 304
+        assert fetch(base_url + '/', headers['ETag'][:-2] + '"')[0] == 200
+
+        # check dashboard spec links every dataset, and they are served
+        status, _, body = fetch(base_url + '/specs/dashboard.json')
+        spec = json.loads(body)
+        assert status == 200 and 'datasets' not in spec
+
+        dataset_urls = set(re.findall(r'/datasets/[\w-]+\.json',
+                                      body.decode()))
+        assert len(dataset_urls) > 0
+        for url in dataset_urls:
+            assert fetch(base_url + url)[0] == 200
+
+        # check slice of one year, group and metric
+        query = '?year=%d&group=Total&metric=Percent+Voted' % DF_AGE.Year.max()
+        status, _, body = fetch(base_url + '/data/age.json' + query)
+        rows = json.loads(body)
+        assert status == 200 and len(rows) > 0
+        assert set(rows[0]) == set(SLICE_KEY_COLUMNS + ['Percent Voted'])
+
+        # check refused requests
+        assert fetch(base_url + '/data/age.json?year=x')[0] == 400
+        assert fetch(base_url + '/data/age.json?metric=x')[0] == 400
+        assert fetch(base_url + '/data/county.json')[0] == 404
+        assert fetch(base_url + '/specs/missing.json')[0] == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,112 @@
+''' CODE TO TEST SYNTHETIC DATA GENERATION '''
+
+import glob
+import os
+from pathlib import Path
+
+from voter_suppression_analysis.processing import \
+    AGE_BRACKET_ORDER, SEX_GROUP_ORDER, SEX_COLUMNS, STATE_NAMES, \
+    combine_age_data, combine_sexrace_data, \
+    homogenize_age_data, homogenize_sexrace_data
+
+from voter_suppression_analysis.synthetic import \
+    area_places, synthetic_frame, write_synthetic_data, \
+    AREA_ID_START, NATIONAL_SPELLINGS, START_YEAR, YEAR_STEP
+
+
+# useful file locations
+CWD = Path(__file__).parent
+data_folder = os.path.join('..', 'data')
+
+LAW_PATH = os.path.join(CWD, data_folder, 'clean', 'suppression.csv')
+
+
+def test_synthetic_frame():
+    '''
+    Test the following conditions for synthetic_frame():
+        - the same seed gives the same data, another seed other data
+        - rows cover the nation, states, areas and extra groups
+        - columns follow the raw layout of the stream
+        - unknown streams raise an error
+    '''
+
+    # smoke test
+    df_year = synthetic_frame('sexrace', 2016, seed=1, areas=2,
+                              extra_groups=3)
+
+    # check determinism
+    assert df_year.equals(synthetic_frame('sexrace', 2016, 1, 2, 3))
+    assert not df_year.equals(synthetic_frame('sexrace', 2016, 2, 2, 3))
+
+    # check rows and columns
+    places = 1 + (len(STATE_NAMES) - 1) * 3
+    assert len(df_year) % places == 0
+    assert df_year.STATE.iloc[0] in NATIONAL_SPELLINGS
+    assert df_year.STATE.nunique() == places
+    assert df_year.Group.str.startswith('Other group').sum() == places * 3
+    assert list(df_year.columns) == SEX_COLUMNS
+    assert (df_year.Year == '2016').all()
+
+    # check for unknown stream
+    invalid_stream_caught = False
+    try:
+        synthetic_frame('county', 2016)
+    except ValueError:
+        invalid_stream_caught = True
+    assert invalid_stream_caught
+
+
+def test_area_places():
+    '''
+    Test that area_places() names the areas of synthetic_frame(), each
+    with its own ID from AREA_ID_START.
+    '''
+
+    # smoke test
+    places = area_places(2)
+
+    # check names and IDs
+    df_year = synthetic_frame('age', 2016, areas=2)
+    names, ids = zip(*places)
+    assert set(names) == set(df_year.STATE.str.upper()) - \
+        set(STATE_NAMES) - {spelling.upper() for spelling in NATIONAL_SPELLINGS}
+    assert list(ids) == list(range(AREA_ID_START,
+                                   AREA_ID_START + len(places)))
+    assert len(places) == (len(STATE_NAMES) - 1) * 2
+    assert area_places(0) == []
+
+
+def test_write_synthetic_data(tmp_path):
+    '''
+    Test the following conditions for write_synthetic_data():
+        - year files are named like the real files
+        - the raw spelling variants all show up across years
+        - processing reads them into every known state and group
+    '''
+
+    # smoke test
+    expressions = write_synthetic_data(str(tmp_path), years=12, seed=0)
+
+    # check file names
+    age_files = sorted(glob.glob(expressions['age']))
+    assert len(age_files) == 12
+    assert os.path.basename(age_files[0]) == '%d_age.csv' % START_YEAR
+    assert os.path.basename(age_files[-1]) == \
+        '%d_age.csv' % (START_YEAR + 11 * YEAR_STEP)
+
+    # check spelling variants
+    contents = ''.join(Path(path).read_text() for path in
+                       glob.glob(os.path.join(str(tmp_path), '*.csv')))
+    for spelling in NATIONAL_SPELLINGS + ['.Male', '"1,', '(B)']:
+        assert spelling in contents
+
+    # check processed data
+    df_age = homogenize_age_data(combine_age_data(expressions['age'],
+                                                  LAW_PATH))
+    df_sex = homogenize_sexrace_data(combine_sexrace_data(
+        expressions['sexrace'], LAW_PATH))
+
+    assert set(df_age.STATE) == set(STATE_NAMES)
+    assert list(df_age.Group.dropna().unique()) == AGE_BRACKET_ORDER
+    assert set(df_sex.Group) == set(SEX_GROUP_ORDER)
+    assert df_age.Year.nunique() == df_sex.Year.nunique() == 12